@@ -0,0 +1,127 @@
+"""Asyncio access to resource modules without blocking the event loop
+
+Importing a large resource module, and decompressing its data on
+first access, are synchronous and can take a while, these
+helpers do both in an executor (by default the loop's):
+
+    from resourcepackage import aio
+    data = await aio.get_data( 'mypackage.resources.report_pdf' )
+    async for chunk in aio.iter_data( 'mypackage.resources.big_html' ):
+        await response.write( chunk )
+
+Concurrent first loads of the same resource share a single
+executor job, and resources already loaded are returned without
+one.  iter_data decompresses (or reads shards) a chunk at a time
+in the executor where the module offers iter_data, so large
+payloads are streamed without being held in memory whole.
+
+Resources are named by their full module name, for bundled
+packages (see the bundle module) the package's __getattr__ is
+used when there is no such module.  Unlike the generated modules,
+these helpers need resourcepackage at run-time.
+"""
+import sys, asyncio, importlib
+
+# size of the chunks yielded by iter_data
+CHUNK_SIZE = 65536
+
+# {(loop, key): asyncio.Future} of executor jobs in progress
+_pending = {}
+
+def import_resource( name ):
+    """Import (synchronously) and return the named resource's module"""
+    try:
+        return importlib.import_module( name )
+    except ImportError:
+        package, sep, attribute = name.rpartition( '.' )
+        if not package:
+            raise
+        module = getattr( importlib.import_module( package ), attribute, None )
+        if module is None:
+            raise
+        return module
+
+def load_data( name ):
+    """Import (synchronously) the named resource and get its (decompressed) data"""
+    return import_resource( name ).data
+
+def open_chunks( name, chunkSize=CHUNK_SIZE ):
+    """Import (synchronously) the named resource and start iterating its data
+
+    returns the module's iter_data( chunkSize ) iterator, or None
+    if its data is already loaded or it has no iter_data
+    """
+    module = import_resource( name )
+    # looking iter_data up on a dedupe alias imports its shared module
+    if 'data' in vars( module ) or not hasattr( module, 'iter_data' ):
+        return None
+    return module.iter_data( chunkSize )
+
+def next_chunk( chunks, default=None ):
+    """Get (synchronously) the next chunk from chunks as bytes, or default"""
+    chunk = next( chunks, default )
+    if chunk is default or type( chunk ) is bytes:
+        return chunk
+    return bytes( chunk )
+
+def get_loaded( name ):
+    """Get the named resource's module if its data is already loaded, or None"""
+    module = sys.modules.get( name )
+    if module is not None and 'data' in vars( module ):
+        return module
+    return None
+
+def shared( key, function, *arguments, executor=None ):
+    """Run function( *arguments ) in executor, once for concurrent callers with key
+
+    returns an awaitable for the result, cancelling it doesn't
+    cancel the job the other callers are waiting for
+    """
+    loop = asyncio.get_running_loop()
+    future = _pending.get( (loop, key) )
+    if future is None:
+        future = _pending[(loop, key)] = loop.run_in_executor( executor, function, *arguments )
+        future.add_done_callback( lambda future: _pending.pop( (loop, key), None ))
+    return asyncio.shield( future )
+
+async def load( name, executor=None ):
+    """Get the named resource's module, importing it in executor
+
+    The module's data isn't accessed, for compressed modules it
+    is decompressed on first access, see get_data.
+    """
+    module = sys.modules.get( name )
+    if module is not None:
+        return module
+    return await shared( ('module', name), import_resource, name, executor=executor )
+
+async def get_data( name, executor=None ):
+    """Get the named resource's data, importing and decompressing it in executor"""
+    module = get_loaded( name )
+    if module is not None:
+        return module.data
+    return await shared( ('data', name), load_data, name, executor=executor )
+
+async def iter_data( name, chunkSize=CHUNK_SIZE, executor=None ):
+    """Yield the named resource's data as bytes, in chunks of at most chunkSize
+
+    Where the module offers iter_data (compressed and sharded
+    modules) and its data isn't already loaded, each chunk is
+    produced in executor, without loading the whole data,
+    otherwise the data is loaded as for get_data and yielded
+    in slices.
+    """
+    if get_loaded( name ) is None:
+        loop = asyncio.get_running_loop()
+        chunks = await loop.run_in_executor( executor, open_chunks, name, chunkSize )
+        if chunks is not None:
+            done = object()
+            while True:
+                chunk = await loop.run_in_executor( executor, next_chunk, chunks, done )
+                if chunk is done:
+                    return
+                yield chunk
+    data = await get_data( name, executor )
+    view = memoryview( data )
+    for offset in range( 0, len(view), chunkSize ):
+        yield bytes( view[offset:offset+chunkSize] )
@@ -0,0 +1,133 @@
+"""Atomic replacement of generated and extracted files
+
+Files are written to a temporary file in the destination's
+directory and moved into place with os.replace, so readers
+never see a partially-written file.  If the new content is
+byte-identical to the existing file, the temporary is
+discarded and the existing file (and its mtime, and thus any
+compiled .pyc) is left untouched.
+"""
+import os, time, filecmp, tempfile
+from resourcepackage import stats
+
+# suffix of the temporary files, ignored by Package.isResource
+SUFFIX = '.rptmp'
+
+def get_mode( destination ):
+    """Get the permission bits for the file replacing destination
+
+    mkstemp creates files readable only by their owner, we want
+    the permissions destination has, or for a new file, those
+    of its directory without the execute (and special) bits,
+    a directory created under the same umask giving what open()
+    would.  The umask itself is only readable by changing it,
+    which would race with other threads creating files.
+    """
+    try:
+        return os.stat( destination ).st_mode & 0o7777
+    except OSError:
+        pass
+    try:
+        return os.stat( os.path.dirname( destination ) or '.' ).st_mode & 0o666
+    except OSError:
+        return 0o644
+
+class AtomicFile:
+    """Write to a temporary file which replaces destination on commit
+
+    Usable as a context manager, which returns the open
+    temporary file and commits on success or aborts if an
+    exception is raised:
+
+        with AtomicFile( destination, 'wb' ) as fh:
+            fh.write( data )
+
+    destination -- full path of the file to (re)place
+    mode -- 'w' or 'wb'
+    fsync -- if true, the file (and directory, where supported)
+        are flushed to disk before/after the replace
+    """
+    replaced = None
+    def __init__( self, destination, mode='w', fsync=0 ):
+        self.destination = destination
+        self.fsync = fsync
+        directory, name = os.path.split( destination )
+        handle, self.temporary = tempfile.mkstemp(
+            prefix = '.' + name + '.',
+            suffix = SUFFIX,
+            dir = directory or '.',
+        )
+        self.file = os.fdopen( handle, mode )
+    def __repr__( self ):
+        return """%s (%s)"""%( self.__class__.__name__, self.destination)
+    def __enter__( self ):
+        return stats.timed_file( self.file )
+    def __exit__( self, excType, excValue, traceback ):
+        if excType is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+    def commit( self ):
+        """Close the temporary and move it into place if it differs
+
+        returns boolean indicating whether destination was replaced
+        """
+        timings = stats.current()
+        if timings is not None:
+            start = time.perf_counter()
+            try:
+                return self.commitUntimed()
+            finally:
+                timings.write += time.perf_counter() - start
+        return self.commitUntimed()
+    def commitUntimed( self ):
+        """Commit without recording the time taken, see commit"""
+        self.file.flush()
+        if self.fsync:
+            os.fsync( self.file.fileno() )
+        self.file.close()
+        if os.path.isfile( self.destination ) and filecmp.cmp(
+            self.temporary, self.destination, shallow=False,
+        ):
+            os.remove( self.temporary )
+            self.replaced = 0
+            return self.replaced
+        os.chmod( self.temporary, get_mode( self.destination ))
+        os.replace( self.temporary, self.destination )
+        if self.fsync:
+            fsync_directory( os.path.dirname( self.destination ))
+        self.replaced = 1
+        return self.replaced
+    def abort( self ):
+        """Discard the temporary, leaving destination untouched"""
+        self.file.close()
+        try:
+            os.remove( self.temporary )
+        except OSError:
+            pass
+
+def fsync_directory( directory ):
+    """Flush directory entries to disk, where the platform allows"""
+    try:
+        handle = os.open( directory or '.', os.O_RDONLY )
+    except OSError:
+        return
+    try:
+        os.fsync( handle )
+    except OSError:
+        # e.g. Windows can't fsync directories
+        pass
+    finally:
+        os.close( handle )
+
+def write_file( destination, data, fsync=0 ):
+    """Atomically write the bytes data to destination
+
+    returns boolean indicating whether destination was replaced
+    """
+    writer = AtomicFile( destination, 'wb', fsync )
+    with writer as fh:
+        fh.write( data )
+    return writer.replaced
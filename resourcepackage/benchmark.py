@@ -0,0 +1,447 @@
+#!/usr/bin/env python
+"""Benchmarks for the data-as-code encodings and resource packages
+
+The encodings suite compares the generated-module size and the
+import-time cost of each of the defaultgenerators.ENCODINGS.
+
+    encode -- generation of the module source
+    cold -- parse and compile of the generated source
+        followed by execution, i.e. first import with no
+        usable .pyc
+    warm -- unmarshal of the compiled code followed by
+        execution, i.e. import from a valid .pyc
+
+The packages suite builds synthetic resource packages in a
+temporary directory (see LAYOUTS) and, for each of GENERATORS,
+runs each of PHASES in a fresh interpreter, so that the peak
+RSS reported is that of the phase alone.
+
+    scan -- forced scan of the package
+    rescan -- scan with everything up to date
+    cold -- import of every resource module (and access to its
+        data) with no __pycache__
+    warm -- the same import with __pycache__ populated
+    extract -- forced extraction of every resource module
+
+Results are available as JSON (-j, -o) for comparison between
+releases.
+"""
+
+usage = """benchmark.py [-s suite] [-g generators] [-x scale] [-j] [-o file] [filenames, ...]
+
+-s suite -- "encodings", "packages" or "all" (the default)
+-g generators -- comma-separated names from GENERATORS to run
+    in the packages suite, default is all of them
+-x scale -- multiplier for the synthetic payload sizes
+-j -- print the results as JSON rather than tables
+-o file -- also write the JSON results to file
+
+filenames -- optional list of files to use as the payload
+    for the encodings suite, otherwise synthetic compressible
+    and incompressible payloads are generated.
+"""
+import os, sys, time, json, shutil, marshal, platform, tempfile, subprocess
+try:
+    import resource
+except ImportError:
+    resource = None
+import resourcepackage
+from resourcepackage import defaultgenerators, package
+
+def synthetic_payloads( size=64*1024 ):
+    """Build (name, data) tuples for synthetic test payloads"""
+    text = b''.join([
+        b'<p>Line %d of a compressible text resource</p>\n'%(i,)
+        for i in range( size // 40 )
+    ])[:size]
+    return [
+        ('compressible', text),
+        ('incompressible', os.urandom( size )),
+    ]
+
+def best_of( function, repeat=3 ):
+    """Return the best wall-time of repeat calls to function"""
+    best = None
+    for i in range( repeat ):
+        start = time.perf_counter()
+        function()
+        duration = time.perf_counter() - start
+        if best is None or duration < best:
+            best = duration
+    return best
+
+def throughput( size, seconds ):
+    """Get MB/s for processing size bytes in seconds"""
+    if not seconds:
+        return None
+    return size / (1024.0*1024.0) / seconds
+
+def measure_encoding( data, encoding, repeat=3 ):
+    """Measure size and import cost for a single encoding of data
+
+    returns dictionary of results, with "error" set if the
+    encoded module could not be compiled (the "repr" encoding
+    exceeds the compiler's recursion limit for large payloads)
+    """
+    source = """import base64\ndata = %s\n"""%(
+        defaultgenerators.encode_data( data, encoding ),
+    )
+    try:
+        code = compile( source, '<benchmark>', 'exec' )
+    except (RecursionError, MemoryError) as err:
+        return {
+            'encoding': encoding,
+            'payload': len(data),
+            'source': len(source),
+            'error': '%s: %s'%( err.__class__.__name__, err ),
+        }
+    def encode():
+        defaultgenerators.encode_data( data, encoding )
+    def cold():
+        code = compile( source, '<benchmark>', 'exec' )
+        exec( code, {} )
+    pyc = marshal.dumps( code )
+    def warm():
+        exec( marshal.loads( pyc ), {} )
+    namespace = {}
+    exec( code, namespace )
+    assert namespace['data'] == data, """Encoding %r did not round-trip"""%( encoding, )
+    encodeTime = best_of( encode, repeat )
+    return {
+        'encoding': encoding,
+        'payload': len(data),
+        'source': len(source),
+        'pyc': len(pyc),
+        'ratio': float(len(source))/(len(data) or 1),
+        'encode': encodeTime,
+        'throughput': throughput( len(data), encodeTime ),
+        'cold': best_of( cold, repeat ),
+        'warm': best_of( warm, repeat ),
+    }
+
+def compare_encodings( payloads, encodings=None, repeat=3 ):
+    """Measure each encoding for each (name, data) payload
+
+    returns list of result dictionaries with a "name" key added
+    """
+    if encodings is None:
+        encodings = sorted( defaultgenerators.ENCODINGS )
+    results = []
+    for name, data in payloads:
+        for encoding in encodings:
+            result = measure_encoding( data, encoding, repeat )
+            result['name'] = name
+            results.append( result )
+    return results
+
+def format_results( results ):
+    """Format results as a plain-text table"""
+    lines = [
+        '%-16s %-8s %12s %12s %12s %7s %9s %9s %9s'%(
+            'payload','encoding','bytes','source','pyc','ratio','MB/s','cold(ms)','warm(ms)',
+        ),
+    ]
+    for result in results:
+        if 'error' in result:
+            lines.append( '%-16s %-8s %12d %12d %s'%(
+                result['name'][:16], result['encoding'], result['payload'],
+                result['source'], result['error'],
+            ))
+            continue
+        lines.append( '%-16s %-8s %12d %12d %12d %7.2f %9.1f %9.2f %9.2f'%(
+            result['name'][:16], result['encoding'], result['payload'],
+            result['source'], result['pyc'], result['ratio'],
+            result['throughput'] or 0.0, result['cold']*1000, result['warm']*1000,
+        ))
+    return '\n'.join( lines )
+
+
+# name: (defaultgenerators attribute, Package.bytecode mode)
+GENERATORS = {
+    'simple': ('SIMPLE', None),
+    'compressed': ('COMPRESSED', None),
+    'mapped': ('MAPPED', None),
+    'auto': ('AUTO', None),
+    'sourceless': ('SIMPLE', 'sourceless'),
+}
+# name: (file count, file size at scale 1)
+LAYOUTS = {
+    'small': (200, 4*1024),
+    'large': (2, 4*1024*1024),
+}
+PHASES = ('scan', 'rescan', 'cold', 'warm', 'extract')
+
+def synthetic_data( size, compressible ):
+    """Get size bytes of compressible (text) or incompressible data"""
+    if not compressible:
+        return os.urandom( size )
+    line = b'<p>A line of a compressible text resource</p>\n'
+    return (line * (size // len(line) + 1))[:size]
+
+def build_package( directory, packageName, count, size ):
+    """Create a package of count resources of size bytes each
+
+    Alternate resources are compressible and incompressible,
+    the __init__.py is a dummy, so nothing is scanned on import.
+
+    returns the full path of the package directory
+    """
+    packageDirectory = os.path.join( directory, packageName )
+    os.mkdir( packageDirectory )
+    with open( os.path.join( packageDirectory, '__init__.py' ), 'w' ) as fh:
+        fh.write( '' )
+    for index in range( count ):
+        compressible = not index % 2
+        name = 'resource%04d.%s'%( index, compressible and 'txt' or 'dat' )
+        with open( os.path.join( packageDirectory, name ), 'wb' ) as fh:
+            fh.write( synthetic_data( size, compressible ))
+    return packageDirectory
+
+def get_package( directory, packageName, generatorName ):
+    """Get the Package for a benchmark package using the named generator"""
+    attribute, mode = GENERATORS[generatorName]
+    packageObject = package.Package(
+        packageName, directory,
+        generators = {'': getattr( defaultgenerators, attribute )},
+    )
+    packageObject.bytecode = mode
+    return packageObject
+
+def resource_files( packageObject ):
+    """Get [(filename, module base name)] for packageObject's resources"""
+    result = []
+    for file in sorted( os.listdir( packageObject.directory )):
+        base, ext = packageObject.sourceToName( file )
+        if packageObject.isResource( file, ext ):
+            result.append( (file, base) )
+    return result
+
+def directory_size( directory, extensions ):
+    """Total size of the files in directory with one of extensions"""
+    total = 0
+    for file in os.listdir( directory ):
+        if os.path.splitext( file )[1] in extensions:
+            total += os.path.getsize( os.path.join( directory, file ))
+    return total
+
+def peak_rss( ):
+    """Get this process' peak resident set size in bytes, or None"""
+    if resource is None:
+        return None
+    usage = resource.getrusage( resource.RUSAGE_SELF ).ru_maxrss
+    if sys.platform == 'darwin':
+        return usage
+    return usage * 1024
+
+def run_phase( phase, directory, packageName, generatorName ):
+    """Run a single phase in this process
+
+    directory -- the package directory, its parent must be
+        on sys.path for the import phases
+
+    returns dictionary of results
+    """
+    packageObject = get_package( directory, packageName, generatorName )
+    files = resource_files( packageObject )
+    size = sum([
+        os.path.getsize( os.path.join( directory, file ))
+        for file, base in files
+    ])
+    start = time.perf_counter()
+    if phase == 'scan':
+        packageObject.scan( force=1 )
+    elif phase == 'rescan':
+        packageObject.scan()
+    elif phase in ('cold','warm'):
+        import importlib
+        for file, base in files:
+            module = importlib.import_module( packageName + '.' + base )
+            len( module.data )
+    elif phase == 'extract':
+        results = packageObject.extract( force=1 ) or {}
+        # extract logs failures rather than raising them
+        failed = sorted([module for module, result in results.items() if result is None])
+        if failed:
+            raise RuntimeError( """Failed to extract %s of %s modules: %s"""%(
+                len(failed), len(results), ', '.join( failed[:5] ),
+            ))
+    else:
+        raise ValueError( """Unknown benchmark phase %r"""%( phase, ))
+    seconds = time.perf_counter() - start
+    return {
+        'files': len(files),
+        'bytes': size,
+        'seconds': seconds,
+        'throughput': throughput( size, seconds ),
+        'rss': peak_rss(),
+    }
+
+def spawn_phase( phase, directory, packageName, generatorName ):
+    """Run a single phase in a fresh interpreter
+
+    returns dictionary of results, with "error" set if the
+    phase failed
+    """
+    environment = dict( os.environ )
+    environment['PYTHONPATH'] = os.pathsep.join([
+        os.path.dirname( directory ),
+        os.path.dirname( os.path.dirname( os.path.abspath( resourcepackage.__file__ ))),
+    ] + [path for path in [environment.get( 'PYTHONPATH' )] if path])
+    process = subprocess.run(
+        [
+            sys.executable, '-m', 'resourcepackage.benchmark',
+            '--phase', phase, directory, packageName, generatorName,
+        ],
+        stdout = subprocess.PIPE, stderr = subprocess.PIPE,
+        env = environment, universal_newlines = True,
+    )
+    if process.returncode:
+        lines = process.stderr.strip().splitlines() or ['exit status %s'%( process.returncode, )]
+        return {'error': lines[-1]}
+    return json.loads( process.stdout.strip().splitlines()[-1] )
+
+def benchmark_packages( generators=None, layouts=None, scale=1.0 ):
+    """Run each of PHASES for each generator on each layout
+
+    returns list of result dictionaries with "layout",
+    "generator" and "phase" keys, scan results also record the
+    total "size" of the generated files
+    """
+    if generators is None:
+        generators = sorted( GENERATORS )
+    if layouts is None:
+        layouts = sorted( LAYOUTS )
+    results = []
+    directory = tempfile.mkdtemp( prefix='rpbenchmark' )
+    try:
+        for layout in layouts:
+            count, size = LAYOUTS[layout]
+            size = max( int( size * scale ), 1 )
+            for generatorName in generators:
+                packageName = 'rpbench_%s_%s'%( layout, generatorName )
+                packageDirectory = build_package( directory, packageName, count, size )
+                for phase in PHASES:
+                    if phase == 'cold':
+                        shutil.rmtree(
+                            os.path.join( packageDirectory, '__pycache__' ),
+                            ignore_errors = True,
+                        )
+                    result = spawn_phase( phase, packageDirectory, packageName, generatorName )
+                    result.update({
+                        'layout': layout,
+                        'generator': generatorName,
+                        'phase': phase,
+                    })
+                    if phase == 'scan':
+                        result['size'] = directory_size(
+                            packageDirectory, ('.py','.pyc','.rpblob'),
+                        )
+                    results.append( result )
+                shutil.rmtree( packageDirectory, ignore_errors = True )
+    finally:
+        shutil.rmtree( directory, ignore_errors = True )
+    return results
+
+def format_package_results( results ):
+    """Format package suite results as a plain-text table"""
+    lines = [
+        '%-6s %-11s %-8s %6s %12s %12s %9s %9s %9s'%(
+            'layout','generator','phase','files','bytes','size','MB/s','wall(ms)','rss(MB)',
+        ),
+    ]
+    for result in results:
+        if 'error' in result:
+            lines.append( '%-6s %-11s %-8s %s'%(
+                result['layout'], result['generator'], result['phase'], result['error'],
+            ))
+            continue
+        size = result.get( 'size' )
+        rss = result.get( 'rss' )
+        lines.append( '%-6s %-11s %-8s %6d %12d %12s %9.1f %9.1f %9s'%(
+            result['layout'], result['generator'], result['phase'],
+            result['files'], result['bytes'],
+            size is not None and size or '',
+            result['throughput'] or 0.0, result['seconds']*1000,
+            rss is not None and '%.1f'%( rss/(1024.0*1024.0), ) or '',
+        ))
+    return '\n'.join( lines )
+
+def environment_description( ):
+    """Describe the benchmarking environment for the JSON results"""
+    return {
+        'resourcepackage': '.'.join( map( str, resourcepackage.__version__ )),
+        'encodingVersion': defaultgenerators.ENCODING_VERSION,
+        'python': platform.python_version(),
+        'implementation': platform.python_implementation(),
+        'platform': platform.platform(),
+        'time': time.strftime( '%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+def main( filenames=(), suite='all', generators=None, scale=1.0, asJSON=0, output=None ):
+    """Run the requested suites and print/write the results"""
+    results = {'environment': environment_description()}
+    if suite in ('all','encodings'):
+        if filenames:
+            payloads = []
+            for filename in filenames:
+                with open( filename, 'rb' ) as fh:
+                    payloads.append( (os.path.basename(filename), fh.read()) )
+        else:
+            payloads = synthetic_payloads( max( int( 64*1024*scale ), 1 ))
+        results['encodings'] = compare_encodings( payloads )
+        if not asJSON:
+            print( format_results( results['encodings'] ))
+    if suite in ('all','packages'):
+        results['packages'] = benchmark_packages( generators, scale=scale )
+        if not asJSON:
+            print( format_package_results( results['packages'] ))
+    if asJSON:
+        print( json.dumps( results, indent=1, sort_keys=True ))
+    if output:
+        with open( output, 'w' ) as fh:
+            json.dump( results, fh, indent=1, sort_keys=True )
+    return results
+
+if __name__ == "__main__":
+    import getopt
+    arguments = sys.argv[1:]
+    if arguments[:1] == ['--phase']:
+        # internal, a single phase run by spawn_phase
+        phase, directory, packageName, generatorName = arguments[1:5]
+        print( json.dumps( run_phase( phase, directory, packageName, generatorName )))
+        sys.exit( 0 )
+    try:
+        options, arguments = getopt.getopt( arguments, 'hs:g:x:jo:', ['help'] )
+    except getopt.GetoptError as err:
+        print(usage)
+        print('ERR:', err)
+        sys.exit( 1 )
+    suite = 'all'
+    generators = None
+    scale = 1.0
+    asJSON = 0
+    output = None
+    for option, value in options:
+        if option in ('-h','--help'):
+            print(usage)
+            sys.exit( 0 )
+        elif option == '-s':
+            if value not in ('all','encodings','packages'):
+                print(usage)
+                print('ERR: unknown suite', value)
+                sys.exit( 1 )
+            suite = value
+        elif option == '-g':
+            generators = [name for name in value.split(',') if name]
+            for name in generators:
+                if name not in GENERATORS:
+                    print(usage)
+                    print('ERR: unknown generator', name)
+                    sys.exit( 1 )
+        elif option == '-x':
+            scale = float( value )
+        elif option == '-j':
+            asJSON = 1
+        elif option == '-o':
+            output = value
+    main( arguments, suite, generators, scale, asJSON, output )
@@ -0,0 +1,132 @@
+"""Single-archive storage of all of a package's resources
+
+Rather than one module per resource, a bundled package has a
+single index module (_rp_bundle.py) and a binary blob holding
+every resource's payload (_rp_bundle.rpblob).  The package's
+__init__.py makes the resources available as attributes with:
+
+    from ._rp_bundle import __getattr__, __dir__
+
+after which "from mypackage.resources import open_ico" works
+as with per-resource modules, only the requested resource is
+read from the blob and decoded.
+"""
+import os
+from resourcepackage import defaultgenerators, atomic, reproducible
+
+BUNDLE_MODULE = '_rp_bundle'
+BUNDLE_BLOB = '_rp_bundle.rpblob'
+
+HEADER = '''# -*- coding: ISO-8859-1 -*-
+"""Resource bundle for package %(packagen)s"""
+# written by resourcepackage: %(resourcepackagev)r
+package = %(packagen)r
+blob = %(blob)r
+'''
+
+BODY = '''import os, sys, types
+def _decoders():
+    %(imports)s
+    return {
+        None: bytes,
+        %(decoders)s
+    }
+def read( name ):
+    """Get the stored (possibly compressed) payload for the named resource"""
+    source, offset, length, codec = index[name]
+    filename = os.path.join( os.path.dirname( __file__ ), blob )
+    try:
+        fh = open( filename, 'rb' )
+    except (IOError, OSError):
+        # e.g. zip-imported, fall back to the loader
+        return __loader__.get_data( filename )[offset:offset+length]
+    try:
+        fh.seek( offset )
+        return fh.read( length )
+    finally:
+        fh.close()
+def load( name ):
+    """Get the decoded data for the named resource"""
+    codec = index[name][3]
+    return _decoders()[codec]( read( name ))
+def getModule( name ):
+    """Get (creating on first access) the module for the named resource"""
+    fullName = package + '.' + name
+    module = sys.modules.get( fullName )
+    if module is None:
+        if name not in index:
+            raise AttributeError( "module %%r has no attribute %%r"%%( package, name ))
+        module = types.ModuleType( fullName, "Resource %%s (from file %%s)"%%( name, index[name][0] ))
+        module.source = index[name][0]
+        module.package = package
+        module.data = load( name )
+        sys.modules[fullName] = module
+    return module
+def __getattr__( name ):
+    """Package-level attribute access to the bundled resource modules"""
+    return getModule( name )
+def __dir__( ):
+    """List the bundled resource names along with the package's attributes"""
+    names = set( index )
+    module = sys.modules.get( package )
+    if module is not None:
+        names.update( vars( module ))
+    return sorted( names )
+### end
+'''
+
+def write_bundle( directory, packageName, resources, fsync=0, dedupe=0, deterministic=0 ):
+    """Write the bundle index module and blob into directory
+
+    directory -- the package directory
+    packageName -- dotted name of the package
+    resources -- sequence of (module name, source filename,
+        payload, codec) for each resource, written in the
+        given order
+    fsync -- whether to flush the files to disk
+    dedupe -- if true, identical payloads (with identical
+        codecs) are written to the blob once and share an offset
+    deterministic -- whether to omit the resourcepackage
+        release from the index, see the reproducible module
+
+    returns full path of the index module
+    """
+    blob = BUNDLE_BLOB
+    packagen = packageName
+    resourcepackagev = reproducible.get_version( deterministic )
+    index = []
+    codecs = set()
+    offset = 0
+    written = {}
+    fullBlob = os.path.join( directory, blob )
+    with atomic.AtomicFile( fullBlob, 'wb', fsync ) as fh:
+        for name, source, payload, codec in resources:
+            if codec is not None:
+                defaultgenerators.get_codec( codec )
+            start = None
+            if dedupe:
+                start = written.get( (codec, payload) )
+            if start is None:
+                start = offset
+                fh.write( payload )
+                offset += len( payload )
+                if dedupe:
+                    written[(codec, payload)] = start
+            index.append( '    %r: (%r, %d, %d, %r),\n'%( name, source, start, len(payload), codec ))
+            codecs.add( codec )
+    codecs.discard( None )
+    codecs = [defaultgenerators.get_codec( codec ) for codec in sorted( codecs )]
+    imports = '; '.join([
+        'import %s'%( codec.module, ) for codec in codecs
+    ]) or 'pass'
+    decoders = '\n        '.join([
+        '%r: %s,'%( codec.name, codec.decompress ) for codec in codecs
+    ])
+    fullModule = os.path.join( directory, BUNDLE_MODULE + '.py' )
+    with atomic.AtomicFile( fullModule, 'w', fsync ) as fh:
+        fh.write( HEADER % locals() )
+        fh.write( '# module name: (source filename, offset, length, codec)\nindex = {\n' )
+        fh.write( ''.join( index ))
+        fh.write( '}\n' )
+        fh.write( BODY % locals() )
+    return fullModule
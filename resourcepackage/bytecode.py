@@ -0,0 +1,82 @@
+"""Build-time emission of compiled (.pyc) resource modules
+
+Generated modules are pure data, so there is little point in
+having every fresh environment parse and compile (possibly
+multi-megabyte) module source on first import.  Package.bytecode
+selects one of the MODES:
+
+    sourceless -- write only base.pyc (no .py) in the package
+        directory, imported by the sourceless loader, with the
+        payload held as a single bytes constant
+    both -- write base.py as usual, plus its compiled form in
+        __pycache__, so the first import needn't compile
+"""
+import os, io, copy, struct, marshal, py_compile
+from importlib import util
+from resourcepackage import atomic
+
+MODES = ('sourceless', 'both')
+
+def compile_module( text, filename, deterministic=0 ):
+    """Compile generated module text as it would be on import
+
+    deterministic -- if true, only the base of filename is
+        recorded in the code, so the compiled module doesn't
+        depend on the directory it was generated in
+    """
+    if deterministic:
+        filename = os.path.basename( filename )
+    return compile( text, filename, 'exec', dont_inherit=True )
+
+def pyc_data( code, mtime=0, size=0 ):
+    """Get the content of a timestamp-based .pyc file for code (PEP 552)"""
+    return util.MAGIC_NUMBER + struct.pack(
+        '<III', 0, int(mtime) & 0xFFFFFFFF, size & 0xFFFFFFFF,
+    ) + marshal.dumps( code )
+
+def write_sourceless( generator, source, destination, package=None, fsync=0 ):
+    """Write the sourceless compiled module for source to destination
+
+    generator -- the generator for source, a copy using the
+        single-literal "bytes" encoding generates the code, as
+        there is no source whose size matters, and the payload
+        then compiles to a single constant
+    source -- full path of the resource file
+    destination -- full path of the .pyc file to write
+
+    returns boolean indicating whether destination was replaced
+    """
+    if generator.encoding != 'bytes':
+        generator = copy.copy( generator )
+        generator.encoding = 'bytes'
+    generator.writeSupport( source, destination, package )
+    file = io.StringIO()
+    moduleSource = os.path.splitext( destination )[0] + '.py'
+    generator.write( file, source, moduleSource, package )
+    code = compile_module( file.getvalue(), moduleSource, getattr( package, 'deterministic', 0 ))
+    return atomic.write_file( destination, pyc_data( code ), fsync )
+
+def cache_path( moduleSource ):
+    """Get the __pycache__ path of the compiled form of moduleSource"""
+    return util.cache_from_source( moduleSource )
+
+def write_cached( moduleSource, deterministic=0 ):
+    """Compile the module at moduleSource into its __pycache__ file
+
+    deterministic -- if true, the compiled file is validated
+        against the source's hash rather than its timestamp (PEP
+        552) and only the base of moduleSource is recorded in it
+
+    returns the full path of the compiled file
+    """
+    invalidation, display = py_compile.PycInvalidationMode.TIMESTAMP, None
+    if deterministic:
+        invalidation = py_compile.PycInvalidationMode.CHECKED_HASH
+        display = os.path.basename( moduleSource )
+    return py_compile.compile(
+        moduleSource,
+        cfile = cache_path( moduleSource ),
+        dfile = display,
+        doraise = True,
+        invalidation_mode = invalidation,
+    )
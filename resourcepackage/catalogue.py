@@ -0,0 +1,98 @@
+"""Generated catalogue of a package's resources
+
+Each scan which changes a package, or finds its _rp_catalogue
+module out of date, (re)writes the module, and Package.scanFile
+updates the entry of the resource it regenerates.  It describes
+every resource without importing any of them:
+
+    from mypackage.resources import _rp_catalogue
+    for name in _rp_catalogue.names():
+        info = _rp_catalogue.info( name )
+        # info['source'], info['size'], info['stored'], ...
+
+so registries (of icons, themes, etc.) can be built from the
+metadata alone.  get(name) imports (only) the named resource's
+module and open(name) returns a binary file object reading its
+data.
+
+Resource names are module names relative to the package, so
+subpackages' resources (see Package.recursive) are named like
+"icons._16.open_png".
+"""
+import os, pprint
+from resourcepackage import subpackages, reproducible, extraction, bundle as bundlemodule
+
+CATALOGUE_MODULE = '_rp_catalogue'
+
+CATALOGUE = '''# -*- coding: utf-8 -*-
+"""Catalogue of the resources of %(packagen)s"""
+# written by resourcepackage: %(resourcepackagev)r
+import io, importlib
+package = %(packagen)r
+# the bundle module holding the resources, None if not bundled
+bundle = %(bundle)r
+# resource name: {
+#     module -- full name of the resource's module
+#     source -- resource filename, relative to the package
+#     size -- bytes in the resource
+#     stored -- bytes in the generated module (and support files)
+#     codec -- compression applied to the stored data or None
+#     hash -- sha256 of the resource's content (None if unknown)
+# }
+resources = %(resources)s
+def names( ):
+    """Get the sorted names of the resources"""
+    return sorted( resources )
+def info( name ):
+    """Get the metadata for the named resource, without importing it"""
+    return resources[name]
+def get( name ):
+    """Import (if necessary) and return the named resource's module"""
+    if bundle:
+        return importlib.import_module( package + '.' + bundle ).getModule( name )
+    return importlib.import_module( resources[name]['module'] )
+def open( name ):
+    """Get a binary file object reading the named resource's data"""
+    return io.BytesIO( get( name ).data )
+'''
+
+def read_catalogue( directory, packageName ):
+    """Get the resources recorded in the package's catalogue module
+
+    The module is executed in isolation, see the extraction
+    module.
+
+    returns {resource name: metadata dictionary}, or None if
+    there is no catalogue module (or it can't be read)
+    """
+    filename = os.path.join( directory, CATALOGUE_MODULE + '.py' )
+    if not os.path.isfile( filename ):
+        return None
+    try:
+        resources = extraction.load_isolated( filename, packageName + '.' + CATALOGUE_MODULE )['resources']
+    except (OSError, SyntaxError, ValueError, KeyError):
+        return None
+    if not isinstance( resources, dict ):
+        return None
+    return resources
+
+def write_catalogue( directory, packageName, resources, bundled=0, fsync=0, deterministic=0 ):
+    """Write the catalogue module into the package directory
+
+    resources -- {resource name: metadata dictionary}, see the
+        comment in the CATALOGUE template for the keys
+    bundled -- whether the package is bundled, see the bundle
+        module
+    deterministic -- whether to omit the resourcepackage
+        release from the module, see the reproducible module
+
+    returns boolean indicating whether the module was written
+    """
+    packagen = packageName
+    resourcepackagev = reproducible.get_version( deterministic )
+    resources = pprint.pformat( resources )
+    bundle = bundled and bundlemodule.BUNDLE_MODULE or None
+    return subpackages.write_text(
+        os.path.join( directory, CATALOGUE_MODULE + '.py' ),
+        CATALOGUE % locals(), fsync,
+    )
@@ -0,0 +1,106 @@
+"""Content-addressed sharing of identical resources
+
+With Package.dedupe set, resources whose content (and
+generator) are identical are stored once, in a shared module
+named from their content hash (_rp_blob_<hash>) at the top of
+the package.  Each resource's own module is then a small alias
+whose data (and any other attributes, such as iter_data) come
+from the shared module on first access:
+
+    from mypackage.resources import open_ico
+    open_ico.data  # imports and returns _rp_blob_....data
+
+so the payload is both stored and loaded only once.
+"""
+import os, hashlib
+from resourcepackage import atomic, bytecode, reproducible
+
+BLOB_PREFIX = '_rp_blob_'
+
+ALIAS = '''# -*- coding: ISO-8859-1 -*-
+"""Resource %(module)s (from file %(source)s)"""
+# written by resourcepackage: %(resourcepackagev)r
+source = %(source)r
+package = %(packagen)r
+# the data is stored once, in the module shared by the
+# resources with identical content
+shared = %(shared)r
+def __getattr__( name ):
+    """Get data (and the other attributes) from the shared module"""
+    if name.startswith( '__' ):
+        raise AttributeError( "module %%r has no attribute %%r"%%( __name__, name ))
+    import importlib
+    return getattr( importlib.import_module( shared ), name )
+'''
+
+def blob_name( hash, identity ):
+    """Get the shared module base name for content hash and generator identity"""
+    key = hashlib.sha256( ('%s\n%s'%( hash, identity )).encode( 'utf-8' )).hexdigest()
+    return BLOB_PREFIX + key[:20]
+
+def is_blob( name ):
+    """Determine whether the (file)name is that of a shared module or its sidecar"""
+    return os.path.basename( name ).startswith( BLOB_PREFIX )
+
+def group( entries ):
+    """Group resources with identical content and generator
+
+    entries -- {resource filename: manifest entry}, the entries
+        must have their "hash" set
+
+    returns {resource filename: shared module base name} for
+    those resources with at least one identical resource
+    """
+    groups = {}
+    for file, entry in sorted( entries.items()):
+        key = blob_name( entry['hash'], entry['generator'] )
+        groups.setdefault( key, [] ).append( file )
+    shared = {}
+    for key, files in groups.items():
+        if len(files) > 1:
+            for file in files:
+                shared[file] = key
+    return shared
+
+def write_alias( source, destination, package, shared, fsync=0, compiled=0 ):
+    """Write the alias module for source to destination
+
+    source -- the resource's filename
+    destination -- full path of the module file to write
+    package -- the Package (or subpackage) the module is in
+    shared -- full dotted name of the shared module
+    compiled -- if true, destination is written as a sourceless
+        .pyc, see the bytecode module
+
+    returns boolean indicating whether destination was replaced
+    """
+    module = os.path.splitext( os.path.basename( destination ))[0]
+    source = os.path.basename( source )
+    packagen = package.packageName
+    resourcepackagev = reproducible.get_version( getattr( package, 'deterministic', 0 ))
+    text = ALIAS % locals()
+    if compiled:
+        moduleSource = os.path.splitext( destination )[0] + '.py'
+        data = bytecode.pyc_data( bytecode.compile_module(
+            text, moduleSource, getattr( package, 'deterministic', 0 ),
+        ))
+    else:
+        data = text.encode( 'latin-1' )
+    return atomic.write_file( destination, data, fsync )
+
+def savings( groups, sizes ):
+    """Calculate the bytes saved by sharing
+
+    groups -- {shared module base name: [alias module sizes]}
+    sizes -- {shared module base name: size of its files}
+
+    Without sharing, each resource would have had a module the
+    size of the shared one.
+
+    returns (resources, shared modules, bytes saved)
+    """
+    resources = saved = 0
+    for key, aliases in groups.items():
+        resources += len( aliases )
+        saved += (len(aliases) - 1) * sizes.get( key, 0 ) - sum( aliases )
+    return resources, len(groups), saved
@@ -1,11 +1,15 @@
 """Objects for doing generic data-as-code encoding"""
-import zlib, os
+import zlib, os, io, time, base64
 try:
     unicode
 except NameError:
     unicode=str 
     xrange = range
-import resourcepackage
+from resourcepackage import atomic, stats, reproducible
+
+# bump when the generated code for a given generator/encoding
+# changes, so that manifests regenerate existing modules
+ENCODING_VERSION = 6
 
 HEADER = '''# -*- coding: ISO-8859-1 -*-
 """Resource %(module)s (from file %(source)s)"""
@@ -14,39 +18,107 @@ source = %(source)r
 package = %(packagen)r
 '''
 class SimpleGenerator:
-    """Simplistic generator"""
+    """Simplistic generator
+
+    encoding -- one of the ENCODINGS keys, determines how
+        the data is written into the Python module, the
+        default "repr" is the original chained-literal format
+    """
+    encoding = 'repr'
+    # name of the compression applied by getData, if any
+    codec = None
+    # size of the blocks read from the source when streaming
+    blockSize = 1024*1024
+    # whether our work mostly releases the GIL, so that scans
+    # without workers run it in threads, see Package.scanThreaded
+    threaded = 0
+    # size of each of the samples encoded by estimateSize
+    sampleSize = 64*1024
+    def __init__( self, encoding=None ):
+        """Initialise the generator with an optional encoding"""
+        if encoding is not None:
+            if encoding not in ENCODINGS:
+                raise ValueError( """Unknown encoding %r, expected one of %s"""%( encoding, sorted(ENCODINGS)))
+            self.encoding = encoding
     def __repr__( self ):
-        return "%s (singleton)"%( self.__class__.__name__)
+        return "%s (encoding=%r)"%( self.__class__.__name__, self.encoding)
+    def getIdentity( self ):
+        """Get a stable string identifying the output of this generator
+
+        Recorded in the package manifest, a change in identity
+        causes resources to be re-generated.
+        """
+        return "%s.%s(encoding=%r)"%(
+            self.__class__.__module__, self.__class__.__name__, self.encoding,
+        )
     def __call__( self, source, destination, package=None ):
-        """Encode source in destination for package"""
+        """Encode source in destination for package
+
+        The module is written to a temporary file which then
+        replaces destination, unless the content is unchanged,
+        see the atomic module.  If package has a true fsync
+        attribute, the write is flushed to disk.
+
+        returns boolean indicating whether destination was replaced
+        """
+        self.writeSupport( source, destination, package )
+        writer = atomic.AtomicFile( destination, 'w', getattr( package, 'fsync', 0 ))
+        with writer as file:
+            self.write( file, source, destination, package )
+        return writer.replaced
+
+    def writeSupport( self, source, destination, package=None ):
+        """Write any files the module for source needs beside destination"""
+
+    def write( self, file, source, destination, package=None ):
+        """Write the module for source to the open (text) file
+
+        The data is read, encoded and written in blocks, so
+        memory use is bounded by blockSize rather than the
+        size of the resource, unless a subclass overrides
+        getData or getDataRepr.
+        """
         header = self.getHeader( source, destination, package )
         assert isinstance( header, str), """Generator %s didn't return a str, returned %r"""%( self, header )
-        data = self.getDataRepr( source, destination, package )
-        assert isinstance( data, str ), """Generator %s didn't return a str, returned %r"""%( self, data )
+        file.write( header )
+        self.writeDataRepr( file, source, destination, package )
         footer = self.getFooter( source, destination, package )
         assert isinstance( footer, str ), """Generator %s didn't return a str, returned %r"""%( self, footer )
-        
-        file = open(destination,'w')
-        try:
-            file.write( header )
+        file.write( footer )
+
+    def writeDataRepr( self, file, source, destination, package=None ):
+        """Write getDataRepr's code to file, streaming where possible"""
+        if self.__class__.getDataRepr is not SimpleGenerator.getDataRepr:
+            data = self.getDataRepr( source, destination, package )
+            assert isinstance( data, str ), """Generator %s didn't return a str, returned %r"""%( self, data )
             file.write( data )
-            file.write( footer )
-        finally:
-            file.close()
+            return
+        file.write( """data = """ )
+        for piece in iter_encoded( self.iterData( source, package ), self.encoding ):
+            file.write( piece )
+        file.write( """\n""" )
 
     def getHeader( self, source, destination, package=None ):
         """Get the header, written before the data variable"""
         source = os.path.basename( source )
         module = os.path.splitext(os.path.basename( destination ))[0]
-        resourcepackagev = resourcepackage.__version__
+        resourcepackagev = reproducible.get_version( getattr( package, 'deterministic', 0 ))
         packagen = package.packageName
-        return HEADER % locals()
+        return HEADER % locals() + self.getEncodingImports()
+
+    def getEncodingImports( self ):
+        """Get import statements required to decode our encoding"""
+        imports = ENCODINGS[self.encoding][1]
+        if imports:
+            return """import %s\n"""%( imports )
+        return ""
         
     def getDataRepr( self, source, destination, package=None ):
         """data as Python code assigning a value to variable "data" """
         return """data = %s\n"""%(
-            crunch_data(
-                self.getData(source)
+            encode_data(
+                self.getData(source),
+                self.encoding,
             )
         )
 
@@ -57,25 +129,341 @@ class SimpleGenerator:
     def getData( self, source, package=None ):
         """Get the data to be encoded in the package"""
         return open(source,'rb').read()
+
+    def iterData( self, source, package=None ):
+        """Yield the data to be encoded in blocks of at most blockSize bytes
+
+        Subclasses which override only getData have its
+        result yielded as a single block.
+        """
+        if self.__class__.getData is not SimpleGenerator.getData:
+            yield self.getData( source, package )
+            return
+        for block in iter_file( source, self.blockSize ):
+            yield block
+
+    def getPayload( self, source, package=None ):
+        """Get (data, codec) for storing source outside a module
+
+        Used by the bundle writer, codec is the name of the
+        compression applied to data or None
+        """
+        return self.getData( source, package ), self.codec
+    def getStorage( self, destination ):
+        """Get (bytes stored, codec) for the module we generated at destination
+
+        Used by the package catalogue, bytes stored counts the
+        module and any support files, codec is the name of the
+        compression applied or None
+        """
+        return os.path.getsize( destination ), self.codec
+    def estimateSize( self, source, package=None ):
+        """Estimate the bytes of encoded data we would generate for source
+
+        Used by Package.plan, only samples of source (see
+        read_samples) are encoded, so this is much cheaper than
+        generating the module, but approximate, and it doesn't
+        count the module's fixed header and footer.  Subclasses
+        which transform the data (overriding getData) are
+        estimated from the untransformed samples.
+        """
+        size = os.path.getsize( source )
+        sample = read_samples( source, self.sampleSize )
+        if not sample:
+            return 0
+        return int( size * float( len( self.encodeSample( sample )))/len( sample ))
+    def encodeSample( self, sample ):
+        """Get the code we would generate for sample's bytes"""
+        return encode_data( sample, self.encoding )
         
 
+COMPRESSED_DATA = '''# drop data cached by a previous load when reloaded
+globals().pop( 'data', None )
+def __getattr__( name ):
+    """Decompress the data on first access, then cache it"""
+    if name == 'data':
+        data = globals()['data'] = %(decompress)s( compressed )
+        return data
+    raise AttributeError( "module %%r has no attribute %%r"%%( __name__, name ))
+'''
+STREAMING_ITER = '''def iter_data( chunkSize=65536 ):
+    """Yield the decompressed data in chunks of at most chunkSize bytes
+
+    Does not build (or cache) the whole decompressed buffer.
+    """
+    decompressor = %(decompressor)s
+    view = memoryview( compressed )
+    for offset in range( 0, len(view), chunkSize ):
+        pending = view[offset:offset+chunkSize]
+        while True:
+            chunk = decompressor.decompress( pending, chunkSize )
+            if chunk:
+                yield chunk
+            # zlib holds back unused input in unconsumed_tail, lzma
+            # and bz2 buffer it internally until needs_input is set
+            pending = getattr( decompressor, 'unconsumed_tail', b'' )
+            if not pending and (decompressor.eof or getattr( decompressor, 'needs_input', True )):
+                break
+    flush = getattr( decompressor, 'flush', None )
+    if flush is not None:
+        chunk = flush()
+        if chunk:
+            yield chunk
+'''
+BUFFERED_ITER = '''def iter_data( chunkSize=65536 ):
+    """Yield the decompressed data in chunks of at most chunkSize bytes
+
+    The %(codec)s codec can't decompress incrementally, so this
+    decompresses (without caching) the whole buffer.
+    """
+    view = memoryview( %(decompress)s( compressed ))
+    for offset in range( 0, len(view), chunkSize ):
+        yield bytes( view[offset:offset+chunkSize] )
+'''
+
 class CompressedGenerator( SimpleGenerator ):
-    """Adds Zlib compression and decompression to generator"""
-    def getDataRepr( self, source, destination, package=None ):
-        """data as Python code assigning a value to variable "data" """
-        return """data = zlib.decompress(%s)\n"""%(
-            crunch_data(
-                self.getData(source)
-            )
+    """Adds compression and decompression to generator
+
+    codec -- one of the CODECS keys, by default "zlib"
+
+    The generated module holds the compressed payload as
+    "compressed", data is decompressed on first access and
+    iter_data() streams the decompressed data in chunks.
+    """
+    codec = 'zlib'
+    def __init__( self, encoding=None, codec=None ):
+        """Initialise the generator with optional encoding and codec"""
+        SimpleGenerator.__init__( self, encoding )
+        if codec is not None:
+            get_codec( codec )
+            self.codec = codec
+    def __repr__( self ):
+        return "%s (encoding=%r, codec=%r)"%( self.__class__.__name__, self.encoding, self.codec)
+    def getIdentity( self ):
+        """Get a stable string identifying the output of this generator"""
+        return "%s.%s(encoding=%r, codec=%r)"%(
+            self.__class__.__module__, self.__class__.__name__, self.encoding, self.codec,
         )
+    def getDataRepr( self, source, destination, package=None ):
+        """data as Python code decompressing "compressed" on first access"""
+        return self.getCompressedRepr( self.getData(source), self.codec )
+    def writeDataRepr( self, file, source, destination, package=None ):
+        """Write the compressed data's code to file, streaming where possible"""
+        if self.__class__.getDataRepr is not CompressedGenerator.getDataRepr:
+            return SimpleGenerator.writeDataRepr( self, file, source, destination, package )
+        self.writeCompressedRepr( file, self.iterData( source, package ), self.codec )
+    def getCompressedRepr( self, payload, codec ):
+        """Python code holding payload compressed with codec"""
+        file = io.StringIO()
+        self.writeCompressedRepr( file, [payload], codec )
+        return file.getvalue()
+    def writeCompressedRepr( self, file, blocks, codec ):
+        """Write Python code holding the blocks compressed with codec to file"""
+        codecObject = get_codec( codec )
+        decompress = codecObject.decompress
+        decompressor = codecObject.decompressor
+        file.write( """codec = %r\ncompressed = """%( codec, ))
+        for piece in iter_encoded( blocks, self.encoding ):
+            file.write( piece )
+        file.write( """\n""" )
+        if decompressor:
+            iterate = STREAMING_ITER
+        else:
+            iterate = BUFFERED_ITER
+        file.write( (COMPRESSED_DATA + iterate) % locals() )
     def getData( self, source, package=None ):
         """Get the data to be encoded in the package"""
         data = SimpleGenerator.getData( self, source, package )
-        return zlib.compress( data, 9 )
+        return get_codec( self.codec ).compress( data )
+    def iterData( self, source, package=None ):
+        """Yield the compressed data in blocks, compressing incrementally
+
+        Subclasses which override only getData, and codecs
+        without an incremental compressor, have the whole
+        compressed data yielded as a single block.
+        """
+        codec = get_codec( self.codec )
+        if self.__class__.getData is not CompressedGenerator.getData or codec.compressor is None:
+            yield self.getData( source, package )
+            return
+        compressor = codec.compressor()
+        for block in iter_file( source, self.blockSize ):
+            block = compressor.compress( block )
+            if block:
+                yield block
+        block = compressor.flush()
+        if block:
+            yield block
     def getHeader( self, source, destination, package=None ):
         """Get the header, written before the data variable"""
         base = SimpleGenerator.getHeader( self, source, destination, package )
-        return base + """\nimport zlib\n"""
+        return base + """\nimport %s\n"""%( get_codec( self.codec ).module, )
+    def encodeSample( self, sample ):
+        """Get the code we would generate for sample's bytes, compressed"""
+        return encode_data( get_codec( self.codec ).compress( sample ), self.encoding )
+
+class AutoGenerator( CompressedGenerator ):
+    """Compresses with whichever codec gives the smallest output
+
+    candidates -- CODECS keys to try, None for all available
+    threshold -- the compressed size must be at most this
+        fraction of the original size, otherwise the data is
+        stored uncompressed (as with SimpleGenerator)
+    smallSize -- data smaller than this many bytes isn't tried
+        with the slow candidates (see Codec), unless they are
+        the only ones
+
+    Every candidate compresses the whole file, so this is
+    considerably slower to scan than a fixed codec.  The
+    chosen codec and compression ratio are recorded at the
+    top of the generated data section.
+    """
+    codec = None
+    candidates = None
+    threshold = 0.9
+    smallSize = 16*1024
+    def __init__( self, encoding=None, candidates=None, threshold=None ):
+        """Initialise the generator with optional encoding, candidates and threshold"""
+        SimpleGenerator.__init__( self, encoding )
+        if candidates is not None:
+            for codec in candidates:
+                get_codec( codec )
+            self.candidates = tuple( candidates )
+        if threshold is not None:
+            self.threshold = threshold
+    def __repr__( self ):
+        return "%s (encoding=%r, candidates=%r)"%( self.__class__.__name__, self.encoding, self.getCandidates())
+    def getIdentity( self ):
+        """Get a stable string identifying the output of this generator"""
+        return "%s.%s(encoding=%r, candidates=%r, threshold=%r, smallSize=%r)"%(
+            self.__class__.__module__, self.__class__.__name__,
+            self.encoding, self.getCandidates(), self.threshold, self.smallSize,
+        )
+    def getCandidates( self ):
+        """Get the names of the codecs we will try"""
+        if self.candidates is None:
+            return tuple( sorted( CODECS ))
+        return self.candidates
+    def choose( self, data ):
+        """Choose the best encoding for data
+
+        returns (payload, codec) where codec is None if no
+        candidate beat the threshold and payload is data
+        """
+        best, bestCodec = None, None
+        candidates = self.getCandidates()
+        if len(data) < self.smallSize:
+            candidates = [name for name in candidates if not get_codec( name ).slow] or candidates
+        for name in candidates:
+            compressed = get_codec( name ).compress( data )
+            if best is None or len(compressed) < len(best):
+                best, bestCodec = compressed, name
+        if best is None or len(best) > len(data) * self.threshold:
+            return data, None
+        return best, bestCodec
+    def getHeader( self, source, destination, package=None ):
+        """Get the header, written before the data variable"""
+        return SimpleGenerator.getHeader( self, source, destination, package )
+    def getDataRepr( self, source, destination, package=None ):
+        """data as Python code, compressed by the best codec if any"""
+        data = SimpleGenerator.getData( self, source, package )
+        payload, codec = self.choose( data )
+        summary = """# codec: %s, %d -> %d bytes (ratio %.3f)\n"""%(
+            codec, len(data), len(payload), float(len(payload))/(len(data) or 1),
+        )
+        if codec is None:
+            return summary + """data = %s\n"""%(
+                encode_data( payload, self.encoding ),
+            )
+        return summary + """import %s\n"""%( get_codec( codec ).module, ) + self.getCompressedRepr(
+            payload, codec,
+        )
+    def getData( self, source, package=None ):
+        """Get the payload to be encoded, compressed by the best codec if any"""
+        return self.getPayload( source, package )[0]
+    def iterData( self, source, package=None ):
+        """Yield the payload as a single block, choosing requires all the data"""
+        yield self.getData( source, package )
+    def getPayload( self, source, package=None ):
+        """Get (data, codec) with the best codec for source"""
+        return self.choose( SimpleGenerator.getData( self, source, package ))
+    def encodeSample( self, sample ):
+        """Get the code we would generate for sample's bytes, with the best codec"""
+        return encode_data( self.choose( sample )[0], self.encoding )
+    def getStorage( self, destination, lines=20 ):
+        """Get (bytes stored, codec) with the codec recorded in the module
+
+        The codec is read from the summary at the top of the
+        data section, it is None for compiled (sourceless)
+        modules, whose summary is not available.
+        """
+        codec = None
+        if os.path.splitext( destination )[1] == '.py':
+            with open( destination, 'r', encoding='latin-1' ) as fh:
+                for index in range( lines ):
+                    line = fh.readline()
+                    if line.startswith( '# codec: ' ):
+                        codec = line[len('# codec: '):].split( ',' )[0]
+                        if codec == 'None':
+                            codec = None
+                        break
+        return os.path.getsize( destination ), codec
+
+MAPPED_DATA = '''payload = %(payload)r
+import os, mmap
+# drop data mapped by a previous load when reloaded
+globals().pop( 'data', None )
+def _map( ):
+    """Map the payload file read-only, falling back to reading it"""
+    filename = os.path.join( os.path.dirname( __file__ ), payload )
+    try:
+        fh = open( filename, 'rb' )
+    except (IOError, OSError):
+        # e.g. zip-imported, there is no file to map
+        return memoryview( __loader__.get_data( filename ))
+    try:
+        if not os.fstat( fh.fileno() ).st_size:
+            # zero-length files can't be mapped
+            return memoryview( b'' )
+        return memoryview( mmap.mmap( fh.fileno(), 0, access=mmap.ACCESS_READ ))
+    finally:
+        fh.close()
+def __getattr__( name ):
+    """Map the payload on first access to data"""
+    if name == 'data':
+        data = globals()['data'] = _map()
+        return data
+    raise AttributeError( "module %%r has no attribute %%r"%%( __name__, name ))
+'''
+
+class MappedGenerator( SimpleGenerator ):
+    """Stores the raw data in a sidecar file mapped on first access
+
+    The generated module's data attribute is a read-only
+    memoryview over an mmap of the sidecar (base.rpblob),
+    so processes importing the resource share the page-cache
+    pages rather than each holding a private copy.
+    """
+    def writeSupport( self, source, destination, package=None ):
+        """Write the sidecar payload for the module destination"""
+        payload = self.getPayloadName( destination )
+        with atomic.AtomicFile( payload, 'wb', getattr( package, 'fsync', 0 )) as fh:
+            for block in self.iterData( source, package ):
+                fh.write( block )
+    def getPayloadName( self, destination ):
+        """Get the full path of the sidecar file for destination"""
+        return os.path.splitext( destination )[0] + '.rpblob'
+    def getStorage( self, destination ):
+        """Get (bytes stored, codec), counting the sidecar with the module"""
+        size, codec = SimpleGenerator.getStorage( self, destination )
+        return size + os.path.getsize( self.getPayloadName( destination )), codec
+    def estimateSize( self, source, package=None ):
+        """Estimate the bytes we would store for source, its sidecar's size"""
+        return os.path.getsize( source )
+    def getDataRepr( self, source, destination, package=None ):
+        """data as Python code mapping the sidecar on first access"""
+        payload = os.path.basename( self.getPayloadName( destination ))
+        return MAPPED_DATA % locals()
 
 
 _char_map = {
@@ -85,6 +473,26 @@ for c in range(32):
 _char_map['"'] = '\\"'
 _char_map['\\'] = '\\\\'
 
+def read_samples( filename, sampleSize=64*1024, count=3 ):
+    """Read samples of filename, spread from its start to its end
+
+    Files of at most count*sampleSize bytes are read whole,
+    otherwise count samples of sampleSize bytes are read from
+    evenly spaced offsets, the first at the start and the last
+    at the end of the file.
+
+    returns the concatenated samples
+    """
+    size = os.path.getsize( filename )
+    with open( filename, 'rb' ) as fh:
+        if size <= count * sampleSize:
+            return fh.read()
+        samples = []
+        for index in range( count ):
+            fh.seek( (size - sampleSize) * index // max( count - 1, 1 ))
+            samples.append( fh.read( sampleSize ))
+        return b''.join( samples )
+
 def crunch_data(source, chunkSize=60, charMap = _char_map ):
     """Try to get a minimal representation of a binary as Python code
 
@@ -106,8 +514,276 @@ def crunch_data(source, chunkSize=60, charMap = _char_map ):
         result.append(base)
     return '(%s)'%'\n+'.join(result)
 
+def single_literal( source ):
+    """Represent source as a single bytes literal
+
+    This is larger than the base-N encodings for binary
+    data, but for mostly-ASCII data is close to the
+    size of the original and needs no decoding at all.
+    """
+    base = repr(bytes(source))
+    if not base.startswith('b'):
+        base = 'b'+base
+    return base
+
+def base64_literal( source ):
+    """Represent source as a single base64-decoded literal"""
+    return 'base64.b64decode(%s)'%( single_literal(base64.b64encode(source)), )
+
+def base85_literal( source ):
+    """Represent source as a single base85-decoded literal"""
+    return 'base64.b85decode(%s)'%( single_literal(base64.b85encode(source)), )
+
+def iter_file( filename, blockSize=1024*1024 ):
+    """Yield the content of filename in blocks of at most blockSize bytes
+
+    Reads are timed when there are stats.current() Timings.
+    """
+    timings = stats.current()
+    fh = open( filename, 'rb' )
+    try:
+        while True:
+            if timings is not None:
+                start = time.perf_counter()
+                block = fh.read( blockSize )
+                timings.read += time.perf_counter() - start
+                timings.bytesRead += len( block )
+            else:
+                block = fh.read( blockSize )
+            if not block:
+                break
+            yield block
+    finally:
+        fh.close()
+
+def rechunk( blocks, size ):
+    """Re-split the concatenated blocks into size-byte pieces
+
+    The final piece may be shorter, no empty pieces are yielded.
+    """
+    pending = bytearray()
+    for block in blocks:
+        pending.extend( block )
+        if len(pending) >= size:
+            whole = len(pending) - len(pending) % size
+            for offset in xrange( 0, whole, size ):
+                yield bytes( pending[offset:offset+size] )
+            del pending[:whole]
+    if pending:
+        yield bytes( pending )
+
+def stream_crunch_data( blocks, chunkSize=60 ):
+    """Streaming version of crunch_data, yields pieces of the expression"""
+    yield '('
+    separator = ''
+    for piece in rechunk( blocks, chunkSize ):
+        yield separator + single_literal( piece )
+        separator = '\n+'
+    yield ')'
+
+def stream_literals( blocks ):
+    """Yield blocks as adjacent bytes literals
+
+    The compiler joins adjacent literals into a single
+    constant, so this is equivalent to single_literal.
+    """
+    literals = (single_literal( block ) for block in blocks if block)
+    first = next( literals, None )
+    if first is None:
+        yield "b''"
+        return
+    second = next( literals, None )
+    if second is None:
+        yield first
+        return
+    yield '(' + first
+    yield '\n' + second
+    for literal in literals:
+        yield '\n' + literal
+    yield ')'
+
+def stream_single_literal( blocks, blockSize=1024*1024 ):
+    """Streaming version of single_literal, yields pieces of the expression"""
+    return stream_literals( rechunk( blocks, blockSize ))
+
+def stream_base64_literal( blocks, blockSize=3*256*1024 ):
+    """Streaming version of base64_literal, yields pieces of the expression"""
+    yield 'base64.b64decode('
+    for piece in stream_literals(
+        base64.b64encode( block ) for block in rechunk( blocks, blockSize )
+    ):
+        yield piece
+    yield ')'
+
+def stream_base85_literal( blocks, blockSize=4*256*1024 ):
+    """Streaming version of base85_literal, yields pieces of the expression"""
+    yield 'base64.b85decode('
+    for piece in stream_literals(
+        base64.b85encode( block ) for block in rechunk( blocks, blockSize )
+    ):
+        yield piece
+    yield ')'
+
+# encoding name: (encoding function, module to import in generated code,
+#   streaming encoding function)
+ENCODINGS = {
+    'repr': (crunch_data, None, stream_crunch_data),
+    'bytes': (single_literal, None, stream_single_literal),
+    'base64': (base64_literal, 'base64', stream_base64_literal),
+    'base85': (base85_literal, 'base64', stream_base85_literal),
+}
+
+def encode_data( source, encoding='repr' ):
+    """Encode source as a Python expression using the given encoding
+
+    repr -- original format, chained 60-byte literals, large and
+        slow to import, but byte-for-byte compatible with older
+        releases
+    bytes -- a single bytes literal, no decoding at import
+    base64 -- a single base64 literal, decoded at import
+    base85 -- a single base85 literal, decoded at import, the
+        most compact representation for binary data
+
+    returns Python expression evaluating to the source bytes
+    """
+    try:
+        function = ENCODINGS[encoding][0]
+    except KeyError:
+        raise ValueError( """Unknown encoding %r, expected one of %s"""%( encoding, sorted(ENCODINGS)))
+    return function( source )
+
+def iter_encoded( blocks, encoding='repr' ):
+    """Encode the concatenated blocks as a Python expression, in pieces
+
+    Only one block (and its encoding) is held in memory at
+    a time, see encode_data for the encodings.
+
+    yields strings which together form the expression
+    """
+    try:
+        function = ENCODINGS[encoding][2]
+    except KeyError:
+        raise ValueError( """Unknown encoding %r, expected one of %s"""%( encoding, sorted(ENCODINGS)))
+    return function( blocks )
+
+class Codec:
+    """A compression scheme usable by the generators
+
+    name -- registry key, recorded in generated modules
+    module -- name of the module the generated code imports
+    compress -- function( data ) returning compressed data,
+        called at scan time
+    decompress -- Python expression (in the generated code)
+        for a function( compressed ) returning the data
+    decompressor -- Python expression (in the generated code)
+        creating an incremental decompressor whose decompress
+        method accepts a max_length, or None if the codec
+        can't decompress incrementally
+    compressor -- function() returning an incremental
+        compressor with compress and flush methods, producing
+        the same format as compress, or None
+    slow -- whether compress has a high fixed cost, so that
+        AutoGenerator doesn't try it on small data
+    """
+    def __init__( self, name, module, compress, decompress, decompressor=None, compressor=None, slow=0 ):
+        self.name = name
+        self.module = module
+        self.compress = compress
+        self.decompress = decompress
+        self.decompressor = decompressor
+        self.compressor = compressor
+        self.slow = slow
+    def __repr__( self ):
+        return "%s (%s)"%( self.__class__.__name__, self.name)
+
+CODECS = {}
+
+def register_codec( codec ):
+    """Make codec available to the generators by name"""
+    CODECS[codec.name] = codec
+    return codec
+
+def get_codec( name ):
+    """Get the registered codec with the given name"""
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError( """Unknown codec %r, expected one of %s"""%( name, sorted(CODECS)))
+
+def zlib_compress( data ):
+    """Compress data with zlib at the maximum level"""
+    return zlib.compress( data, 9 )
+def zlib_compressor( ):
+    """Get an incremental zlib compressor at the maximum level"""
+    return zlib.compressobj( 9 )
+register_codec( Codec(
+    'zlib', 'zlib', zlib_compress, 'zlib.decompress', 'zlib.decompressobj()',
+    zlib_compressor,
+))
+try:
+    import lzma
+except ImportError:
+    pass
+else:
+    # lzma's default, higher presets mostly just use (much) more
+    # memory for larger dictionaries
+    LZMA_PRESET = 6
+    def lzma_compress( data ):
+        """Compress data with lzma (xz container) at LZMA_PRESET"""
+        return lzma.compress( data, preset=LZMA_PRESET )
+    def lzma_compressor( ):
+        """Get an incremental lzma compressor at LZMA_PRESET"""
+        return lzma.LZMACompressor( preset=LZMA_PRESET )
+    register_codec( Codec(
+        'lzma', 'lzma', lzma_compress, 'lzma.decompress', 'lzma.LZMADecompressor()',
+        lzma_compressor, slow=1,
+    ))
+try:
+    import bz2
+except ImportError:
+    pass
+else:
+    def bz2_compress( data ):
+        """Compress data with bz2 at the maximum level"""
+        return bz2.compress( data, 9 )
+    def bz2_compressor( ):
+        """Get an incremental bz2 compressor at the maximum level"""
+        return bz2.BZ2Compressor( 9 )
+    register_codec( Codec(
+        'bz2', 'bz2', bz2_compress, 'bz2.decompress', 'bz2.BZ2Decompressor()',
+        bz2_compressor,
+    ))
+# optional third-party codecs, note that the generated modules
+# then require the codec's package at run-time as well
+try:
+    import zstandard
+except ImportError:
+    pass
+else:
+    def zstd_compress( data ):
+        """Compress data with zstandard at a high level"""
+        return zstandard.ZstdCompressor( level=19 ).compress( data )
+    register_codec( Codec(
+        'zstd', 'zstandard', zstd_compress, 'zstandard.ZstdDecompressor().decompress',
+        slow=1,
+    ))
+try:
+    import brotli
+except ImportError:
+    pass
+else:
+    def brotli_compress( data ):
+        """Compress data with brotli at the maximum quality"""
+        return brotli.compress( data, quality=11 )
+    register_codec( Codec(
+        'brotli', 'brotli', brotli_compress, 'brotli.decompress',
+        slow=1,
+    ))
+
 SIMPLE = SimpleGenerator()
 COMPRESSED = CompressedGenerator()
+MAPPED = MappedGenerator()
+AUTO = AutoGenerator()
 
 generators = {
     "": SIMPLE,
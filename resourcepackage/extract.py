@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 """Script for extracting resources from a resource package"""
 
-usage = """extract.py [-f] packageName [modules, ...]
+usage = """extract.py [-f] [-j workers] [--stats format] packageName [modules, ...]
 
 packageName -- dotted python package name for the package
     which holds the resource to be extracted.  The package
@@ -9,15 +9,22 @@ packageName -- dotted python package name for the package
     "package".  If not, a new default package instance will
     be created for the given package.
     
-modules -- optional list of individual modules to be
-    extracted, otherwise scans the package directory
-    to determine the modules to extract.
+modules -- optional list of individual module files (e.g.
+    open_ico.py) to be extracted, otherwise scans the package
+    directory to determine the modules to extract.
 
 -f -- flag to signal that extraction should be "forced",
     that is, that the relative dates of the module and any
     existing resource file should be ignored, and the
     extraction should always occur.
 
+-j workers -- number of worker processes across which the
+    modules are extracted, by default all are extracted in
+    the extracting process.
+
+--stats format -- report per-file bytes, timings and skip
+    reasons once finished, format is "table" or "json"
+
 Note:
     Because the extraction process needs to import the
     package, any automatic scanning done by your __init__.py
@@ -31,13 +38,14 @@ Note:
     files you would like to extract before running extract.py
 
 """
-import os, string
+import os, getopt
+from resourcepackage import stats
 
-def main( packageName, modules=(), force=0):
+def main( packageName, modules=(), force=0, workers=None, statsFormat=None):
     """Perform the actual extraction"""
     packageModule = __import__(
         packageName, {}, {},
-        string.split(packageName, '.')
+        packageName.split('.')
     )
     if not hasattr( packageModule, 'package' ):
         # build the default package object...
@@ -48,11 +56,23 @@ def main( packageName, modules=(), force=0):
         )
     else:
         packageObject = packageModule.package
-    if modules:
-        for module in modules:
-            packageObject.extractFile( module, force )
-    else:
-        packageObject.extract( force )
+    if statsFormat is not None:
+        packageObject.stats = stats.Stats()
+    try:
+        if modules:
+            if statsFormat is not None:
+                packageObject.stats.begin( 'extract' )
+            try:
+                for module in modules:
+                    packageObject.extractFile( module, force )
+            finally:
+                if statsFormat is not None:
+                    packageObject.stats.end()
+        else:
+            packageObject.extract( force, workers )
+    finally:
+        if statsFormat is not None:
+            print( stats.FORMATS[statsFormat]( packageObject.stats ))
 
 if __name__ == "__main__":
     import sys
@@ -65,21 +85,29 @@ if __name__ == "__main__":
         logging.basicConfig()
     except ImportError:
         log = None
+    try:
+        options, arguments = getopt.getopt( arguments, 'fj:', ['stats='] )
+    except getopt.GetoptError as err:
+        print(usage)
+        print('ERR:', err)
+        sys.exit( 1 )
+    force = 0
+    workers = None
+    statsFormat = None
+    for option, value in options:
+        if option == '-f':
+            force = 1
+        elif option == '-j':
+            workers = int( value )
+        elif option == '--stats':
+            if value not in stats.FORMATS:
+                print(usage)
+                print('ERR: unknown stats format', value)
+                sys.exit( 1 )
+            statsFormat = value
     if arguments:
-        # do we have a force...
-        force = arguments[0] == '-f'
-        if force:
-            del arguments[0]
-        if arguments:
-            packageName = arguments[0]
-            modules = arguments[1:]
-            main( packageName, modules, force=force )
-        else:
-            print(usage)
-            print('ERR: arguments received', sys.argv[1:])
+        packageName = arguments[0]
+        modules = arguments[1:]
+        main( packageName, modules, force=force, workers=workers, statsFormat=statsFormat )
     else:
         print(usage)
-            
-    
-
-        
\ No newline at end of file
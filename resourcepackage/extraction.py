@@ -0,0 +1,112 @@
+"""Extraction of resources from generated modules in isolation
+
+Rather than importing each generated module (which registers
+it in sys.modules, keeping its data alive for the life of the
+process), the module's code is compiled (or, for sourceless
+modules, unmarshalled) and executed in a private namespace
+which is discarded once the resource has been written.
+
+Where the module offers iter_data (compressed modules) the
+resource is decompressed and written a chunk at a time, other
+data is written in blocks straight from the module's constant
+or memory map, so memory use doesn't grow with the number of
+resources extracted.
+"""
+import os, ast, marshal
+from importlib import util
+from resourcepackage import atomic
+
+# size of the chunks written to the extracted file
+BLOCK_SIZE = 1024*1024
+
+class IsolatedLoader:
+    """Minimal __loader__ for isolated modules, reads files from disk"""
+    def __init__( self, filename ):
+        self.path = filename
+    def __repr__( self ):
+        return """%s (%s)"""%( self.__class__.__name__, self.path)
+    def get_data( self, path ):
+        with open( path, 'rb' ) as fh:
+            return fh.read()
+
+def read_source_name( filename, lines=10 ):
+    """Get the source filename recorded in a generated module's header
+
+    Only the first few lines of filename are read, the
+    generated header assigns the "source" variable a literal.
+
+    returns the source filename, or None if not found (e.g.
+    the module is compiled or wasn't generated by us)
+    """
+    if os.path.splitext( filename )[1] != '.py':
+        return None
+    try:
+        with open( filename, 'r', encoding='latin-1' ) as fh:
+            for index in range( lines ):
+                line = fh.readline()
+                if line.startswith( 'source = ' ):
+                    try:
+                        return ast.literal_eval( line[len('source = '):].strip() )
+                    except (ValueError, SyntaxError):
+                        return None
+    except (IOError, OSError):
+        pass
+    return None
+
+def get_code( filename ):
+    """Get the code object for the module file (.py or .pyc)"""
+    if os.path.splitext( filename )[1] == '.pyc':
+        with open( filename, 'rb' ) as fh:
+            header = fh.read( 16 )
+            if header[:4] != util.MAGIC_NUMBER:
+                raise ValueError( """%s was compiled by a different Python version"""%( filename, ))
+            return marshal.loads( fh.read() )
+    with open( filename, 'rb' ) as fh:
+        return compile( fh.read(), filename, 'exec', dont_inherit=True )
+
+def load_isolated( filename, moduleName ):
+    """Execute the module file in a new namespace, not registered anywhere
+
+    returns the module's namespace dictionary
+    """
+    namespace = {
+        '__name__': moduleName,
+        '__file__': filename,
+        '__package__': moduleName.rpartition( '.' )[0],
+        '__loader__': IsolatedLoader( filename ),
+        '__builtins__': __builtins__,
+    }
+    exec( get_code( filename ), namespace )
+    return namespace
+
+def iter_resource( namespace, blockSize=BLOCK_SIZE ):
+    """Yield the data of an isolated resource module in blocks"""
+    if 'iter_data' in namespace:
+        for block in namespace['iter_data']( blockSize ):
+            yield block
+        return
+    if 'data' in namespace:
+        data = namespace['data']
+    elif '__getattr__' in namespace:
+        # lazily-decoded data
+        data = namespace['__getattr__']( 'data' )
+    else:
+        raise AttributeError( """Resource module %s has no data"""%( namespace.get( '__name__' ), ))
+    if not isinstance( data, (bytes, bytearray, memoryview) ):
+        raise TypeError( """Resource module %s data is a %s, not bytes"""%(
+            namespace.get( '__name__' ), type(data).__name__,
+        ))
+    view = memoryview( data )
+    for start in range( 0, len(view), blockSize ):
+        yield view[start:start+blockSize]
+
+def write_blocks( destination, blocks, fsync=0 ):
+    """Atomically write the byte blocks to destination
+
+    returns boolean indicating whether destination was replaced
+    """
+    writer = atomic.AtomicFile( destination, 'wb', fsync )
+    with writer as fh:
+        for block in blocks:
+            fh.write( block )
+    return writer.replaced
@@ -0,0 +1,217 @@
+"""Pillow-based image handling, an alternative to wxgenerators
+
+Images are converted to (losslessly optimised) PNG in memory
+with Pillow, no wxPython (or temporary file) is needed to
+generate the modules, and none at all to use them:
+
+    from resourcepackage import imagegenerators
+    generators.update( imagegenerators.generators )
+
+Conversions are cached by the content of the source image in a
+hidden .rpcache directory beside it, so a forced scan doesn't
+re-convert unchanged images.  Caching an image's new conversion
+removes those of its earlier content, and each scan removes the
+conversions of images which are no longer resources, see
+ImageGenerator.prune.  To clear the caches, delete the .rpcache
+directories, or see clear_cache.  Pillow releases the GIL while decoding and encoding,
+so scans run the conversions in threads, see
+SimpleGenerator.threaded.
+
+The generated modules keep the wxgenerators accessors which
+don't need a GUI toolkit, getData() and getStream(), and add
+getImage(), which returns a Pillow Image.
+"""
+import os, io, shutil, hashlib
+from PIL import Image
+from resourcepackage import defaultgenerators, atomic
+
+formats = [
+    '.png', '.jpg', '.ico', '.tif', '.bmp',
+    '.xpm', '.gif', '.pcx', '.pnm', '.iff',
+    '.jpeg', '.tiff', '.webp',
+]
+# name of the (hidden, so never scanned) cache directories
+CACHE_DIRECTORY = '.rpcache'
+
+def cached_source( name ):
+    """Get the source image's name from the cache file name, None if not a cache file
+
+    Cache files are named source.key.png, key being the hex
+    sha256 of the generator's identity and the source content.
+    """
+    base, extension = os.path.splitext( name )
+    source, sep, key = base.rpartition( '.' )
+    if extension != '.png' or not source or len( key ) != 64:
+        return None
+    return source
+
+def clear_cache( directory ):
+    """Remove the conversion cache of the images in directory
+
+    returns boolean indicating whether there was a cache to remove
+    """
+    cache = os.path.join( directory, CACHE_DIRECTORY )
+    if not os.path.isdir( cache ):
+        return 0
+    shutil.rmtree( cache )
+    return 1
+
+HEADER = '''
+### image functions
+originalExtension = %(extension)r
+import io
+def getData( ):
+    """Return the PNG data from the resource as a simple string"""
+    return data
+def getStream( ):
+    """Return the PNG data from the resource as a binary file object"""
+    return io.BytesIO( data )
+def getImage( ):
+    """Return the data from the resource as a PIL.Image (needs Pillow)"""
+    from PIL import Image
+    image = Image.open( getStream() )
+    image.load()
+    return image
+'''
+
+class ImageGenerator( defaultgenerators.SimpleGenerator ):
+    """Converts images to optimised PNG with Pillow
+
+    optimize -- whether to have Pillow search for the smallest
+        PNG encoding (slower, still lossless)
+    useCache -- whether to cache conversions, see CACHE_DIRECTORY
+
+    PNG sources are kept as they are when the conversion is no
+    smaller.  Multi-frame images (e.g. animated GIFs) keep only
+    their first frame, as with wxgenerators.
+    """
+    optimize = 1
+    useCache = 1
+    threaded = 1
+    def __init__( self, encoding=None, optimize=None ):
+        """Initialise the generator with optional encoding and optimisation"""
+        defaultgenerators.SimpleGenerator.__init__( self, encoding )
+        if optimize is not None:
+            self.optimize = optimize
+    def getIdentity( self ):
+        """Get a stable string identifying the output of this generator"""
+        return "%s.%s(encoding=%r, optimize=%r)"%(
+            self.__class__.__module__, self.__class__.__name__,
+            self.encoding, self.optimize,
+        )
+    def getHeader( self, source, destination, package=None ):
+        """Get the header, written before the data variable"""
+        baseName, extension = os.path.splitext( source )
+        source = baseName + '.png'
+        base = defaultgenerators.SimpleGenerator.getHeader(
+            self, source, destination, package
+        )
+        return base + (HEADER%locals())
+
+    def getData( self, source, package=None ):
+        """Get the image as PNG-encoded bytes, from the cache if possible"""
+        with open( source, 'rb' ) as fh:
+            original = fh.read()
+        cache = self.getCachePath( source, original )
+        if cache is not None:
+            try:
+                with open( cache, 'rb' ) as fh:
+                    return fh.read()
+            except (IOError, OSError):
+                pass
+        data = self.convert( original, source, package )
+        if cache is not None:
+            try:
+                if not os.path.isdir( os.path.dirname( cache )):
+                    os.makedirs( os.path.dirname( cache ), exist_ok=True )
+                atomic.write_file( cache, data, getattr( package, 'fsync', 0 ))
+                self.evict( cache )
+            except (IOError, OSError):
+                # e.g. read-only, the cache is only an optimisation
+                pass
+        return data
+    def getCachePath( self, source, original ):
+        """Get the cache filename for the source image's content, or None"""
+        if not self.useCache:
+            return None
+        key = hashlib.sha256( self.getIdentity().encode( 'utf-8' ) + b'\n' + original ).hexdigest()
+        directory, name = os.path.split( source )
+        return os.path.join( directory, CACHE_DIRECTORY, '%s.%s.png'%( name, key ))
+    def evict( self, cache ):
+        """Remove the other cached conversions of the image cached as cache
+
+        returns the number of files removed
+        """
+        directory, current = os.path.split( cache )
+        source = cached_source( current )
+        count = 0
+        for name in os.listdir( directory ):
+            if name != current and cached_source( name ) == source:
+                try:
+                    os.remove( os.path.join( directory, name ))
+                    count += 1
+                except OSError:
+                    pass
+        return count
+    def prune( self, package, sources, directories ):
+        """Remove the cached conversions of images which aren't among sources
+
+        package -- the Package which has been scanned
+        sources -- full paths of the package's images using us
+        directories -- full paths of the package's directories,
+            whose caches are pruned
+
+        Called by Package.scan once its resources are scanned,
+        files in the caches which aren't the conversion of a
+        current image (e.g. of removed images, or left by a
+        failed write) are removed.
+
+        returns the number of files removed
+        """
+        if not self.useCache:
+            return 0
+        current = set( sources )
+        count = 0
+        for directory in directories:
+            cache = os.path.join( directory, CACHE_DIRECTORY )
+            try:
+                names = os.listdir( cache )
+            except OSError:
+                continue
+            for name in names:
+                source = cached_source( name )
+                if source is None or os.path.join( directory, source ) not in current:
+                    try:
+                        os.remove( os.path.join( cache, name ))
+                        count += 1
+                    except OSError:
+                        pass
+        return count
+    def convert( self, original, source, package=None ):
+        """Convert the image bytes original to PNG bytes, in memory"""
+        try:
+            image = Image.open( io.BytesIO( original ))
+            image.load()
+        except (IOError, OSError, ValueError) as err:
+            raise ValueError( """Unable to convert file %s to a png image for %s: %s"""%( source, package, err ))
+        format = image.format
+        if image.mode not in ('1', 'L', 'LA', 'I', 'I;16', 'P', 'RGB', 'RGBA'):
+            # e.g. CMYK, which PNG can't store
+            image = image.convert( 'RGBA' if 'A' in image.mode else 'RGB' )
+        options = {}
+        if image.mode == 'P' and 'transparency' in image.info:
+            options['transparency'] = image.info['transparency']
+        stream = io.BytesIO()
+        image.save( stream, 'PNG', optimize=bool( self.optimize ), **options )
+        data = stream.getvalue()
+        if format == 'PNG' and len( original ) <= len( data ):
+            return original
+        return data
+
+
+GENERATOR = ImageGenerator()
+
+generators = {
+}
+for format in formats:
+    generators[ format ] = GENERATOR
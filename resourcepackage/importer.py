@@ -0,0 +1,213 @@
+"""Import hook serving resource modules straight from the resource files
+
+At design time, rather than generating and writing a module per
+resource (and then compiling each one), a Package can install a
+ResourceFinder on sys.meta_path.  Importing one of the package's
+resource modules then runs the package's generator in memory on
+the current resource file, nothing is written to disk, so an edit
+to a resource is picked up by the next import (or reload).
+
+Recursive packages' subdirectories are served as (empty)
+subpackages, named as scanning would, see the subpackages module.
+
+Generating the real modules for release remains an explicit step,
+see scan.py.
+"""
+import os, io, sys
+from importlib import abc, util
+from resourcepackage import names
+try:
+    import logging
+    log = logging.getLogger( "resourcepackage.importer" )
+except ImportError:
+    log = None
+
+# suffix given to the sidecar file named by served code when the
+# one on disk is stale, so the sidecar is read through get_data
+STALE_SUFFIX = '.rpstale'
+
+class ResourceFinder( abc.MetaPathFinder ):
+    """Finds the resource modules (and subpackages) of a single Package
+
+    The mapping from module names to resource files is
+    recomputed whenever one of the package's directories changes.
+    """
+    def __init__( self, package ):
+        self.package = package
+        self.prefix = package.packageName + '.'
+        # our (relative) directories, and their st_mtime_ns when
+        # names was computed
+        self.directories = ['']
+        self.mtimes = None
+        self.names = {}
+    def __repr__( self ):
+        return """%s (%s)"""%( self.__class__.__name__, self.package.packageName)
+
+    def getTimes( self, directories ):
+        """Get [st_mtime_ns or None] for our (relative) directories"""
+        times = []
+        for directory in directories:
+            try:
+                times.append( os.stat( os.path.join( self.package.directory, directory )).st_mtime_ns )
+            except OSError:
+                times.append( None )
+        return times
+    def getNames( self ):
+        """Get {dotted name below our package: (filename, base, extension)}
+
+        Subpackages (of recursive packages) have None for filename
+        and extension, and their relative directory as base.
+        """
+        mtimes = self.getTimes( self.directories )
+        if mtimes != self.mtimes:
+            if mtimes[0] is None:
+                return {}
+            index = names.NameIndex( self.package )
+            files, directories = self.package.walk()
+            for file, direntry in files:
+                base, ext = self.package.sourceToName( file )
+                if self.package.isResource( file, ext, isFile=1 ):
+                    index.add( file, base, ext )
+            found = {}
+            for file, (base, ext) in index.names.items():
+                fullName = self.package.getModuleName( base )
+                found[fullName[len(self.prefix):]] = (file, base, ext)
+                directory = os.path.dirname( base )
+                while directory:
+                    fullName = self.package.getSubpackage( directory ).packageName
+                    found[fullName[len(self.prefix):]] = (None, directory, None)
+                    directory = os.path.dirname( directory )
+            self.names = found
+            self.directories = [''] + directories
+            self.mtimes = self.getTimes( self.directories )
+        return self.names
+    def find_spec( self, fullname, path=None, target=None ):
+        """Get a spec for fullname if it is one of our resource modules or subpackages"""
+        if not fullname.startswith( self.prefix ):
+            return None
+        try:
+            source, base, extension = self.getNames()[fullname[len(self.prefix):]]
+        except KeyError:
+            return None
+        if source is None:
+            directory = os.path.join( self.package.directory, *base.split( '/' ))
+            return util.spec_from_file_location(
+                fullname, os.path.join( directory, '__init__.py' ),
+                loader = SubpackageLoader( self.package, base ),
+                submodule_search_locations = [directory],
+            )
+        loader = ResourceLoader( self.package, source, base, extension )
+        return util.spec_from_file_location(
+            fullname, loader.destination, loader=loader,
+        )
+
+class SubpackageLoader( abc.Loader ):
+    """Creates the (empty) subpackage for a directory of a recursive package"""
+    def __init__( self, package, directory ):
+        self.package = package
+        self.directory = directory
+    def __repr__( self ):
+        return """%s (%s)"""%( self.__class__.__name__, self.directory)
+    def create_module( self, spec ):
+        """Use the default module creation"""
+        return None
+    def exec_module( self, module ):
+        """Describe the subpackage, it has no code of its own"""
+        module.__doc__ = """Resource subpackage %s (from directory %s)"""%( module.__name__, self.directory )
+
+class ResourceLoader( abc.Loader ):
+    """Executes the generated code for a single resource in memory
+
+    source -- the resource's filename relative to package's
+        directory
+    base -- the resource's (relative) module base name
+    """
+    def __init__( self, package, source, base, extension ):
+        self.package = package.getSubpackage( os.path.dirname( base ))
+        self.source = os.path.join( package.directory, *source.split( '/' ))
+        self.destination = os.path.join( package.directory, *(base + '.py').split( '/' ))
+        self.extension = extension
+        self.generator = package.getGenerator( extension )
+    def __repr__( self ):
+        return """%s (%s)"""%( self.__class__.__name__, self.source)
+
+    def getSidecar( self ):
+        """Get the full path of the sidecar file our generated code reads, or None"""
+        getPayloadName = getattr( self.generator, 'getPayloadName', None )
+        if getPayloadName is None:
+            return None
+        return getPayloadName( self.destination )
+    def isCurrent( self, sidecar ):
+        """Determine whether sidecar holds our resource's current (raw) data
+
+        A sidecar left by a scan (e.g. by MappedGenerator) is
+        current if it is the resource's size and no older than
+        the resource, so an edit since then (other than one
+        preserving size and mtime) isn't masked by it.
+        """
+        try:
+            resource, written = os.stat( self.source ), os.stat( sidecar )
+        except OSError:
+            return 0
+        return resource.st_size == written.st_size and resource.st_mtime_ns <= written.st_mtime_ns
+
+    def get_source( self, fullname ):
+        """Get the generated module code for our resource
+
+        If our generator's sidecar file exists but isn't current,
+        the code is generated to read a sidecar which doesn't, so
+        falls back to get_data, serving the resource file.
+        """
+        destination = self.destination
+        sidecar = self.getSidecar()
+        if sidecar is not None and os.path.exists( sidecar ) and not self.isCurrent( sidecar ):
+            if log:
+                log.debug( """%s is stale, serving %s""", sidecar, self.source )
+            base, extension = os.path.splitext( destination )
+            destination = base + STALE_SUFFIX + extension
+        file = io.StringIO()
+        self.generator.write( file, self.source, destination, self.package )
+        return file.getvalue()
+    def get_data( self, path ):
+        """Read a file for the generated code
+
+        Generated modules fall back to the loader when their
+        sidecar payload can't be opened, we serve the sidecar
+        from the resource file itself.
+        """
+        if os.path.splitext( path )[1] == '.rpblob':
+            return b''.join( self.generator.iterData( self.source, self.package ))
+        with open( path, 'rb' ) as fh:
+            return fh.read()
+    def create_module( self, spec ):
+        """Use the default module creation"""
+        return None
+    def exec_module( self, module ):
+        """Generate our resource's code and execute it in module"""
+        if log:
+            log.debug( """serving %s from %s""", module.__name__, self.source )
+        code = compile( self.get_source( module.__name__ ), self.destination, 'exec' )
+        exec( code, module.__dict__ )
+
+def install( package ):
+    """Install a ResourceFinder for package at the front of sys.meta_path
+
+    Any finder previously installed for the same package name
+    is replaced.
+
+    returns the installed finder
+    """
+    uninstall( package )
+    finder = ResourceFinder( package )
+    sys.meta_path.insert( 0, finder )
+    return finder
+
+def uninstall( package ):
+    """Remove any ResourceFinder for package from sys.meta_path"""
+    sys.meta_path[:] = [
+        finder for finder in sys.meta_path
+        if not (
+            isinstance( finder, ResourceFinder ) and
+            finder.package.packageName == package.packageName
+        )
+    ]
@@ -0,0 +1,83 @@
+"""Advisory cross-process locking of a package directory
+
+Used by Package.scan so that processes importing the same
+design-time package at once (e.g. a pre-forked server pool)
+don't all regenerate the same modules.  The lock is an fcntl
+flock on a lock file in the package directory, on platforms
+without fcntl, or if the lock file can't be created (e.g. a
+read-only install), locking is skipped.
+"""
+import time
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+try:
+    import logging
+    log = logging.getLogger( "resourcepackage.locking" )
+except ImportError:
+    log = None
+
+class LockTimeout( OSError ):
+    """Raised when a PackageLock can't be acquired within its timeout"""
+
+class PackageLock:
+    """Exclusive advisory lock on a package directory
+
+    Usable as a context manager.  The lock is not re-entrant,
+    acquiring it twice in one process blocks until timeout.
+
+    filename -- full path of the lock file
+    timeout -- seconds to wait for the lock, None waits forever
+    interval -- seconds between attempts to take the lock
+    """
+    handle = None
+    waited = 0.0
+    def __init__( self, filename, timeout=None, interval=0.05 ):
+        self.filename = filename
+        self.timeout = timeout
+        self.interval = interval
+    def __repr__( self ):
+        return """%s (%s)"""%( self.__class__.__name__, self.filename)
+    def __enter__( self ):
+        self.acquire()
+        return self
+    def __exit__( self, excType, excValue, traceback ):
+        self.release()
+        return False
+
+    def acquire( self ):
+        """Take the lock, waiting up to timeout seconds
+
+        returns the number of seconds spent waiting
+        """
+        if fcntl is None:
+            return 0.0
+        try:
+            handle = open( self.filename, 'a' )
+        except (IOError, OSError) as err:
+            if log:
+                log.debug( """Unable to open lock file %s, not locking: %s""", self.filename, err )
+            return 0.0
+        start = time.time()
+        while True:
+            try:
+                fcntl.flock( handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB )
+                break
+            except (IOError, OSError):
+                waited = time.time() - start
+                if self.timeout is not None and waited >= self.timeout:
+                    handle.close()
+                    raise LockTimeout( """Unable to lock %s within %ss"""%( self.filename, self.timeout ))
+                time.sleep( self.interval )
+        self.handle = handle
+        self.waited = time.time() - start
+        return self.waited
+    def release( self ):
+        """Release the lock if we hold it"""
+        if self.handle is not None:
+            try:
+                fcntl.flock( self.handle.fileno(), fcntl.LOCK_UN )
+            finally:
+                self.handle.close()
+                self.handle = None
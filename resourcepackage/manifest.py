@@ -0,0 +1,111 @@
+"""Manifest object, persistent record of a package's encoded resources
+
+The manifest lives in the package directory and records, for
+each resource file, the source size, modification time and
+content hash along with the identity of the generator which
+encoded it.  Scanning uses it to decide staleness in a single
+read, re-hashing a file only when its size or mtime changed.
+
+That is a trade-off: an edit which keeps the file's size and
+restores its mtime (cp -p, touch -r, restoring an archive) isn't
+noticed, a forced scan (or Package.rehash) hashes every file.
+"""
+import json, hashlib
+from resourcepackage import atomic
+try:
+    import logging
+    log = logging.getLogger( "resourcepackage.manifest" )
+except ImportError:
+    log = None
+
+# bump when the layout of the manifest file changes
+MANIFEST_VERSION = 1
+
+def hash_file( filename, blockSize=1024*1024 ):
+    """Get the hex content hash of the given file"""
+    digest = hashlib.sha256()
+    with open( filename, 'rb' ) as fh:
+        while True:
+            block = fh.read( blockSize )
+            if not block:
+                break
+            digest.update( block )
+    return digest.hexdigest()
+
+class Manifest:
+    """Persistent {resource filename: entry} mapping for a Package
+
+    Each entry is a dictionary with the keys:
+
+        size -- source file size in bytes
+        mtime -- source file st_mtime_ns
+        hash -- hex sha256 of the source file's content
+        generator -- identity of the generator used to encode it
+        version -- defaultgenerators.ENCODING_VERSION at encode time
+        module -- base name of the generated module
+        deterministic -- present (1) if generated by a
+            deterministic Package, see the reproducible module
+    """
+    def __init__( self, filename ):
+        """Initialise the manifest, does not load it
+
+        filename -- full path to the manifest file
+        """
+        self.filename = filename
+        self.entries = {}
+        self.dirty = 0
+    def __repr__( self ):
+        return """%s (%s)"""%( self.__class__.__name__, self.filename)
+
+    def load( self ):
+        """Load the entries from disk, missing/corrupt files give an empty manifest"""
+        self.entries = {}
+        self.dirty = 0
+        try:
+            with open( self.filename, 'r' ) as fh:
+                content = json.load( fh )
+        except (IOError, OSError):
+            return self
+        except ValueError as err:
+            if log:
+                log.warning( """Ignoring corrupt manifest %s: %s""", self.filename, err )
+            return self
+        if not isinstance( content, dict ) or content.get( 'version' ) != MANIFEST_VERSION:
+            if log:
+                log.info( """Ignoring manifest %s with unknown version""", self.filename )
+            return self
+        self.entries = content.get( 'resources', {} )
+        return self
+    def save( self, fsync=0 ):
+        """Write the entries to disk if they have changed
+
+        returns boolean indicating whether a write occurred
+        """
+        if not self.dirty:
+            return 0
+        with atomic.AtomicFile( self.filename, 'w', fsync ) as fh:
+            json.dump(
+                {'version': MANIFEST_VERSION, 'resources': self.entries},
+                fh, indent=1, sort_keys=True,
+            )
+        self.dirty = 0
+        return 1
+
+    def get( self, name ):
+        """Get the entry for the given resource filename or None"""
+        return self.entries.get( name )
+    def set( self, name, entry ):
+        """Record the entry for the given resource filename"""
+        if self.entries.get( name ) != entry:
+            self.entries[name] = entry
+            self.dirty = 1
+    def remove( self, name ):
+        """Forget the given resource filename"""
+        if name in self.entries:
+            del self.entries[name]
+            self.dirty = 1
+    def prune( self, names ):
+        """Forget all resources not in names"""
+        for name in list( self.entries ):
+            if name not in names:
+                self.remove( name )
@@ -0,0 +1,125 @@
+"""Mapping between resource filenames and module names
+
+A Package maps each resource's filename to the name of its
+module with fileToName (a customisation point), the result is
+then made a valid Python identifier by to_identifier, so a
+resource named "16-open.png" becomes the module _16_open_png
+rather than one which couldn't be imported.
+
+Each scan records the mapping for every resource in a
+NameIndex, which looks names up in either direction without
+recomputing them, and which refuses resources whose modules
+would collide, either exactly or, on case-insensitive
+filesystems, when differing only in case.  The mapping is
+persisted as the "module" of each resource's manifest entry,
+from which NameIndex.fromManifest restores it.
+"""
+import os, re, keyword, unicodedata
+try:
+    import logging
+    log = logging.getLogger( "resourcepackage.names" )
+except ImportError:
+    log = None
+
+def to_identifier( name ):
+    """Get a valid Python identifier for name
+
+    Names which are already identifiers (in the NFKC form Python
+    gives them, see str.isidentifier) are returned unchanged,
+    keywords are suffixed with "_".  Otherwise characters other
+    than ASCII letters, digits and "_" become "_" and a leading
+    digit (or empty name) is prefixed with "_".
+    """
+    if name.isidentifier() and unicodedata.normalize( 'NFKC', name ) == name:
+        if keyword.iskeyword( name ):
+            return name + '_'
+        return name
+    result = re.sub( r'\W', '_', name, flags=re.ASCII )
+    if not result or result[0].isdigit():
+        result = '_' + result
+    if keyword.iskeyword( result ):
+        result = result + '_'
+    return result
+
+def is_case_insensitive( filename ):
+    """Determine whether the existing file filename is on a case-insensitive filesystem
+
+    The filename with the case of its base name swapped is
+    checked for, filenames without cased characters are
+    assumed to be on case-sensitive filesystems.
+    """
+    directory, name = os.path.split( filename )
+    swapped = os.path.join( directory, name.swapcase() )
+    if swapped == filename or not os.path.exists( swapped ):
+        return 0
+    try:
+        return os.path.samefile( filename, swapped )
+    except OSError:
+        return 0
+
+class NameIndex:
+    """Bidirectional {resource filename: (module base, extension)} index
+
+    package -- the Package whose resources are indexed, used in
+        error messages
+
+    Filenames and module bases are relative to the package's
+    directory, with "/" separators, see Package.walk.
+    """
+    def __init__( self, package ):
+        self.package = package
+        self.names = {}
+        self.sources = {}
+        self.folded = {}
+    def __repr__( self ):
+        return """%s (%s, %s resources)"""%( self.__class__.__name__, self.package.packageName, len(self.names))
+    def __len__( self ):
+        return len( self.names )
+    def __contains__( self, source ):
+        return source in self.names
+    def __iter__( self ):
+        return iter( self.names )
+
+    def add( self, source, base, extension ):
+        """Record that resource source generates module base
+
+        raises ValueError if another resource generates the same
+        module, or, on a case-insensitive filesystem, one whose
+        name differs only in case (which is otherwise logged)
+        """
+        other = self.sources.get( base )
+        if other is not None and other != source:
+            raise ValueError(
+                """%s has two data files %s and %s which would generate the same Python module %s"""%(
+                    self.package, source, other, base,
+                )
+            )
+        folded = base.lower()
+        other = self.folded.get( folded )
+        if other is not None and other != base:
+            message = """%s has two data files %s and %s which would generate Python modules %s and %s, differing only in case"""%(
+                self.package, source, self.sources[other], base, other,
+            )
+            if is_case_insensitive( os.path.join( self.package.directory, source )):
+                raise ValueError( message )
+            if log:
+                log.warning( """%s, which can't both be imported on case-insensitive filesystems""", message )
+        self.names[source] = base, extension
+        self.sources[base] = source
+        self.folded.setdefault( folded, base )
+    def getName( self, source ):
+        """Get (module base, extension) for resource source, or None"""
+        return self.names.get( source )
+    def getSource( self, base ):
+        """Get the resource filename generating module base, or None"""
+        return self.sources.get( base )
+
+    @classmethod
+    def fromManifest( cls, package, manifest ):
+        """Restore the index recorded in a loaded manifest.Manifest"""
+        index = cls( package )
+        for source, entry in sorted( manifest.entries.items()):
+            base = entry.get( 'module' )
+            if base is not None:
+                index.add( source, base, os.path.splitext( source )[1].lower() )
+        return index
@@ -1,7 +1,7 @@
 """Package object, manages package-related operations
 """
-import os, stat, types
-from resourcepackage import defaultgenerators
+import os, copy, stat, time
+from resourcepackage import defaultgenerators, manifest, bundle, atomic, locking, bytecode, stats, subpackages, extraction, dedupe, names, catalogue, sharding, planning, reproducible
 try:
     import logging
     log = logging.getLogger( "resourcepackage" )
@@ -20,21 +20,78 @@ class Package:
         packageName,
         directory,
         generators = defaultgenerators.generators,
+        bundle = 0,
+        recursive = 0,
     ):
         """Initialse the Repository
 
         directory -- the package's directory, in which we will
             do all of our work.
+        bundle -- if true, all resources are stored in a single
+            bundle module and blob rather than one module per
+            resource, see the bundle module.
+        recursive -- if true, resources in directories below
+            directory are scanned too, each directory becoming
+            a generated subpackage, see the subpackages module.
         """
+        if bundle and recursive:
+            raise ValueError( """%s can't be both bundled and recursive"""%( packageName, ))
         self.packageName = packageName
         self.directory = directory
         self.generators = generators
+        self.bundle = bundle
+        self.recursive = recursive
     def __repr__( self ):
         return """%s (%s)"""%( self.__class__.__name__, self.packageName)
 
     # all-lowercased extensions and files to ignore
-    ignoreExtensions = [ '.pyc','.pyo',]
-    ignoreFiles = [ '__init__.py', ]
+    ignoreExtensions = [ '.pyc','.pyo','.rpblob', atomic.SUFFIX,]
+    ignoreFiles = [ '__init__.py', '.resourcepackage.json', '.resourcepackage.lock', ]
+    # prefix of support modules (bundles etc.) we generate
+    reservedPrefix = '_rp_'
+
+    # whether to record sources in a manifest file, without
+    # one staleness is decided by comparing modification dates
+    useManifest = 1
+    manifestName = '.resourcepackage.json'
+    # whether every resource is hashed on each scan, rather than
+    # only those whose size or mtime differ from the manifest,
+    # catching edits which preserve both (e.g. cp -p, touch -r)
+    rehash = 0
+    # whether to fsync generated/extracted files, they are always
+    # written to a temporary and atomically moved into place
+    fsync = 0
+    # whether scanning takes a cross-process lock on the directory,
+    # and how many seconds to wait for it (None waits forever)
+    useLock = 1
+    lockName = '.resourcepackage.lock'
+    lockTimeout = 300
+    # None to generate .py modules, or one of bytecode.MODES to
+    # generate compiled modules, see the bytecode module
+    bytecode = None
+    # optional stats.Stats recording the work done by scan and
+    # extract, see the stats module
+    stats = None
+    # whether resources with identical content share a single
+    # module, see the dedupe module
+    dedupe = 0
+    # {module base: full name of its shared module} during a scan
+    _shared = {}
+    # resources larger than this many bytes are split into shard
+    # modules of at most this size, see the sharding module,
+    # None to never split them
+    shardSize = 16*1024*1024
+    # whether scans write the _rp_catalogue module describing
+    # our resources, see the catalogue module
+    useCatalogue = 1
+    # names.NameIndex of our resources from the last scan, see getNameIndex
+    _names = None
+    # whether identical resources give byte-identical generated
+    # files (and times), see the reproducible module
+    deterministic = 0
+    # whether scan does nothing, set on the class by scan.py --plan
+    # so importing a design-time package doesn't scan it first
+    deferScans = 0
 
     def fileToName( self, filename ):
         """Get Python module name and extension from filename
@@ -78,68 +135,867 @@ class Package:
         base = filename.replace(".", "_" )
         base = base.replace(" ", "_" )
         return base, ext
-        
 
-    def isResource( self, file, ext ):
-        """Determine whether we consider this file a resource"""
-        if not os.path.isfile( os.path.join( self.directory, file )):
+    def sourceToName( self, source ):
+        """Get (base, extension) for the resource at relative path source
+
+        source -- the resource's path relative to our directory,
+            with "/" separators, see walk
+
+        The base is fileToName's for the filename, made a valid
+        identifier if it isn't one (see names.to_identifier) and
+        prefixed with the source's directory, so base + ".py" is
+        the path of the resource's module relative to our
+        directory.
+
+        Scanning records the result for each resource in our
+        NameIndex, see getNameIndex.
+        """
+        directory, sep, filename = source.rpartition( '/' )
+        base, ext = self.fileToName( filename )
+        return directory + sep + names.to_identifier( base ), ext
+    def directoryToName( self, directory ):
+        """Get the subpackage name for a directory name, see subpackages"""
+        return subpackages.directory_to_name( directory )
+
+    def isResource( self, file, ext, isFile=None ):
+        """Determine whether we consider this file a resource
+
+        isFile -- (optional) whether file is known to be a
+            regular file, if None, the filesystem is checked
+        """
+        if isFile is None:
+            isFile = os.path.isfile( os.path.join( self.directory, file ))
+        if not isFile:
             return 0
-        file = file.lower()
-        if (
-            ( ext not in self.ignoreExtensions ) and
-            ( file not in self.ignoreFiles ) and
-            ( ext != '.py' )
-        ):
-            return 1
-        return 0
+        extensions, files = self.getIgnored()
+        if ext in extensions or os.path.basename( file ).lower() in files:
+            return 0
+        return 1
+    def getIgnored( self ):
+        """Get frozensets of the (lower-cased) extensions and files to ignore
+
+        Built from ignoreExtensions and ignoreFiles on first use,
+        and again at the start of each scan.
+        """
+        ignored = self.__dict__.get( '_ignored' )
+        if ignored is None:
+            ignored = self._ignored = (
+                frozenset( [ext.lower() for ext in self.ignoreExtensions] + ['.py'] ),
+                frozenset( [file.lower() for file in self.ignoreFiles] ),
+            )
+        return ignored
             
-    def scan( self, force=0 ):
-        """Scan the directory, looking for updated/added resources"""
+    def scan( self, force=0, workers=None, plan=None ):
+        """Scan the directory, looking for updated/added resources
+
+        force -- whether to force update even if dates suggest
+            the modules are already up-to-date.
+        workers -- if more than 1, the number of worker processes
+            across which the generator work is spread, otherwise
+            all files are processed in this process.
+        plan -- a planning.Plan from plan() to carry out, instead
+            of walking and checking the directory again, force is
+            then the plan's
+
+        Files are processed in sorted order, and any errors are
+        logged in that order once all files have been processed,
+        the first error is then re-raised.
+
+        The scan holds the package lock (see acquireLock), so
+        concurrent scans of the package wait for each other,
+        and then find the waited-for scan's work already done.
+
+        With deferScans set, nothing is done.
+
+        returns {filename: scanFile result} for each resource
+        """
+        if self.deferScans:
+            if log:
+                log.info("""scan of %s deferred""", self )
+            return {}
+        if log:
+            log.info("""scan(force=%r, workers=%r) %s""", force, workers, self )
+        if self.stats is not None:
+            self.stats.begin( 'scan' )
+        lock = self.acquireLock()
+        try:
+            return self.scanUnlocked( force, workers, plan )
+        finally:
+            lock.release()
+            if self.stats is not None:
+                self.stats.end()
+
+    def walk( self ):
+        """List our directory (and subdirectories, if recursive)
+
+        Uses os.scandir, whose entries' cached type (and on
+        Windows stat) information saves a syscall per file.
+
+        returns ([(relative filename, os.DirEntry)], [relative
+        directory]) for the files and the subdirectories which
+        would be scanned, paths are relative to our directory
+        with "/" separators
+        """
+        files = []
+        directories = []
+        pending = ['']
+        while pending:
+            relative = pending.pop()
+            with os.scandir( os.path.join( self.directory, relative )) as entries:
+                for entry in entries:
+                    name = relative and relative + '/' + entry.name or entry.name
+                    if entry.is_file():
+                        files.append( (name, entry) )
+                    elif self.recursive and entry.is_dir() and self.isResourceDirectory( name ):
+                        directories.append( name )
+                        pending.append( name )
+        # sorted, so everything derived from the listing is stable
+        files.sort()
+        directories.sort()
+        return files, directories
+    def isResourceDirectory( self, directory ):
+        """Determine whether we scan the (relative) directory when recursive
+
+        Hidden and special (e.g. __pycache__) directories are
+        skipped, as are Python packages which we didn't generate,
+        which are left to manage their own resources.
+        """
+        name = os.path.basename( directory )
+        if name.startswith( '.' ) or name.startswith( '__' ):
+            return 0
+        return subpackages.is_generated(
+            os.path.join( self.directory, directory, '__init__.py' )
+        )
+
+    def plan( self, force=0, estimate=1 ):
+        """Work out what scan( force ) would do, without doing it
+
+        estimate -- whether to estimate the bytes each resource
+            to be generated will take, see planning.Plan.estimate
+
+        Nothing is encoded or written, and the package lock isn't
+        taken.  The plan can be printed (see planning.format_plan)
+        and/or passed to scan, which then uses its listing rather
+        than walking the directory again, unless it finds the plan
+        out of date, see isPlanCurrent.
+
+        returns planning.Plan
+        """
         if log:
-            log.info("""scan(force=%r) %s""", force, self )
-        fileList = os.listdir( self.directory )
-        nonPython = {}
-        python = {}
-        testFileNames = {}
+            log.info("""plan(force=%r) %s""", force, self )
+        plan = self.planUnlocked( force )
+        if estimate:
+            plan.estimate()
+        return plan
+    def planUnlocked( self, force=0 ):
+        """Walk and check our directory for plan, see planning.Plan"""
+        plan = planning.Plan( self, force )
+        plan.files, plan.directories = self.walk()
+        nonPython = plan.resources
+        modules = plan.modules
+        infos = plan.infos
+        self._ignored = None
+        index = plan.index = names.NameIndex( self )
         if log:
             log.debug("""filtering filename-list""" )
-        for file in fileList:
-            base, ext = self.fileToName( file )
+        for file, direntry in plan.files:
+            base, ext = self.sourceToName( file )
             fullName = os.path.join( self.directory, file )
             if log:
                 log.debug("""file=%r, base=%r, ext=%r""", file, base, ext )
-            if self.isResource( file, ext ):
-                if base in testFileNames:
-                    raise ValueError(
-                        """%s has two data files %s and %s which would generate the same Python module %s"""%(
-                            self, file, testFileNames[base]
-                        )
-                    )
-                testFileNames[base] = file
+            if self.isResource( file, ext, isFile=1 ):
+                try:
+                    index.add( file, base, ext )
+                except ValueError as err:
+                    plan.collisions.append( (file, str( err )) )
+                    continue
                 if log:
                     log.debug("""will process""" )
                 nonPython[file] = base, ext, fullName
-            elif ext == '.py':
-                python[base] = file, ext, fullName
+                infos[file] = direntry
+            elif ext in ('.py','.pyc'):
+                modules.add( file )
+            elif not self.isBookkeeping( file, ext ):
+                plan.ignored.append( file )
+        plan.ignored.sort()
+        manifest = plan.manifest = self.loadManifest()
         if log:
-            log.debug("""starting updates, %s files""", len(nonPython) )
-        for file,(base,ext,fullName) in nonPython.items():
-            self.scanFile(
-                file,
-                base,
-                extension=ext,
-                force=force
+            log.debug("""checking %s files""", len(nonPython) )
+        target = None
+        if manifest is not None:
+            plan.removed = sorted([file for file in manifest.entries if file not in nonPython])
+        if self.bundle:
+            target = os.path.join( self.directory, bundle.BUNDLE_MODULE + '.py' )
+        checked = plan.checked
+        for file,(base,ext,fullName) in sorted(nonPython.items()):
+            if self.bundle:
+                exists = (bundle.BUNDLE_MODULE + '.py') in modules
+            else:
+                exists = (base + self.getModuleExtension()) in modules
+            started = time.perf_counter()
+            entry, reason = self.checkFile(
+                file, base, ext, force,
+                manifest = manifest,
+                exists = exists,
+                target = target,
+                info = infos[file].stat(),
+            )
+            checked.append( [file, base, ext, entry, reason, time.perf_counter()-started] )
+        if not self.bundle:
+            plan.blobJobs, plan.shared = self.shareChecked( checked, manifest, modules, force )
+        return plan
+
+    def isBookkeeping( self, file, ext ):
+        """Determine whether file is one of our own files other than modules
+
+        The manifest, the lock, sidecars and atomic temporaries,
+        which plans don't report as ignored.
+        """
+        name = os.path.basename( file )
+        return name in (self.manifestName, self.lockName) or ext in ('.rpblob', atomic.SUFFIX)
+    def isPlanCurrent( self, plan ):
+        """Determine whether plan is still what a scan should do
+
+        The manifest is reloaded and compared with the one the
+        plan was made from, and each planned resource's size and
+        mtime with those planned, so a scan by another process
+        (or an edit) since plan was made is noticed.  Resources
+        added since aren't, they are left to the next scan.
+        """
+        if plan.manifest is not None:
+            current = self.loadManifest()
+            if current is None or current.entries != plan.manifest.entries:
+                return 0
+        for file, base, ext, entry, reason, duration in plan.checked:
+            try:
+                info = os.stat( plan.resources[file][2] )
+            except OSError:
+                return 0
+            if (info.st_size, info.st_mtime_ns) != (entry['size'], entry['mtime']):
+                return 0
+        return 1
+
+    def scanUnlocked( self, force=0, workers=None, plan=None ):
+        """Scan without taking the package lock, see scan
+
+        A plan which is out of date (see isPlanCurrent) is
+        replaced by a new plan, made with the plan's force.
+        """
+        if plan is None:
+            plan = self.planUnlocked( force )
+        elif plan.package is not self:
+            raise ValueError( """%s can't scan %r, planned for another package"""%( self, plan ))
+        elif not self.isPlanCurrent( plan ):
+            if log:
+                log.info("""plan for %s is out of date, planning again""", self )
+            plan = self.planUnlocked( plan.force )
+        if plan.collisions:
+            raise ValueError( plan.collisions[0][1] )
+        fileList, nonPython = plan.files, plan.resources
+        self._names = plan.index
+        self._shared = plan.shared
+        if self.recursive:
+            self.writeSubpackages( nonPython, plan.directories )
+        manifest = plan.manifest
+        removed = plan.removed
+        checked = plan.checked
+        blobJobs = plan.blobJobs
+        results = {}
+        jobs = []
+        records = {}
+        for file, base, ext, entry, reason, duration in checked:
+            if self.stats is not None:
+                records[file] = self.recordCheck( file, entry, reason, duration )
+            if reason is None:
+                results[file] = 0
+                if manifest is not None:
+                    manifest.set( file, entry )
+            else:
+                jobs.append( (file, base, ext, entry) )
+        if log:
+            log.debug("""starting updates, %s files""", len(jobs) )
+        method = 'generateFile'
+        if self.stats is not None:
+            method = 'generateFileTimed'
+        updated, errors = {}, []
+        if self.bundle:
+            if (jobs or removed) and self.stats is None:
+                updated, errors = self.scanBundle( nonPython, jobs, workers )
+            elif jobs or removed:
+                (updated, errors), timings = stats.timed( self.scanBundle, nonPython, jobs, workers )
+                self.recordBundle( timings, errors )
+                self.recordJobs( jobs, records, updated, errors, timed=0 )
+        else:
+            if blobJobs:
+                # the shared modules first, their aliases are useless without them
+                blobs, errors = self.scanJobs( blobJobs, workers, method )
+                if self.stats is not None:
+                    self.recordJobs( blobJobs, self.recordBlobs( blobJobs ), blobs, errors )
+            if not errors:
+                updated, errors = self.scanJobs( jobs, workers, method )
+                if self.stats is not None:
+                    self.recordJobs( jobs, records, updated, errors )
+                self.removeStaleBlobs( fileList, checked )
+            if self.dedupe:
+                self.reportShared( checked )
+        results.update( updated )
+        if manifest is not None:
+            for file, base, ext, entry in jobs:
+                if updated.get( file ):
+                    manifest.set( file, entry )
+            manifest.prune( nonPython )
+            manifest.save( self.fsync )
+        if self.useCatalogue and not errors and (
+            jobs or removed or not self.isCatalogueCurrent( checked )
+        ):
+            self.writeCatalogue( checked )
+        if not errors:
+            self.pruneGenerators( nonPython, plan.directories )
+        if self.deterministic and not errors:
+            self.normaliseTimes(
+                [base for base, ext, fullName in nonPython.values()], plan.directories,
             )
         if log:
             log.debug("""finished updates""")
-    def scanFile( self, source, base=None, extension=None, force=0):
+        if errors:
+            if log:
+                for file, err in errors:
+                    log.error("""Exception while scanning %s: %s""", file, err )
+            raise errors[0][1]
+        return results
+
+    def recordCheck( self, source, entry, reason, duration ):
+        """Get the stats.FileStats for source after checkFile
+
+        Up-to-date resources are recorded immediately, others
+        once they have been generated, see recordJobs.
+        """
+        record = stats.FileStats(
+            'scan', source, entry['module'], entry['generator'],
+            action = reason is None and 'skipped' or 'generated',
+            reason = reason or 'up to date',
+            bytesIn = entry['size'],
+        )
+        record.check = duration
+        if reason is None:
+            self.stats.add( record )
+        return record
+    def recordJobs( self, jobs, records, updated, errors, timed=1 ):
+        """Record the stats for generated jobs
+
+        timed -- whether updated holds (result, stats.Timings)
+            pairs to be unpacked, as returned by generateFileTimed
+        """
+        errors = dict( errors )
+        for file, base, ext, entry in jobs:
+            record = records[file]
+            if file in errors:
+                record.action = 'failed'
+                record.reason = str( errors[file] )
+            elif timed and file in updated:
+                updated[file], timings = updated[file]
+                record.addTimings( timings )
+            self.stats.add( record )
+    def recordBlobs( self, jobs ):
+        """Get {file: stats.FileStats} for the jobs generating shared modules"""
+        return dict([
+            (file, stats.FileStats(
+                'scan', None, base, entry['generator'],
+                action = 'generated', reason = 'shared',
+                # the bytes read are counted against the resources
+                bytesIn = 0,
+            ))
+            for file, base, ext, entry in jobs
+        ])
+    def recordBundle( self, timings, errors ):
+        """Record the stats for writing the bundle
+
+        The bytes read are recorded against each resource's
+        own record, so aren't repeated in the bundle's.
+        """
+        record = stats.FileStats(
+            'scan', None, bundle.BUNDLE_MODULE, 'bundle',
+            action = errors and 'failed' or 'generated',
+            reason = errors and str( errors[0][1] ) or 'bundle',
+        )
+        record.addTimings( timings )
+        self.stats.add( record )
+
+    def writeSubpackages( self, nonPython, directories ):
+        """Write the generated files of our subpackages (recursive only)
+
+        Each directory holding resources (or directories which
+        do) gets a generated __init__.py, and a _rp_subpackages
+        module if any of its subdirectories' names aren't
+        identifiers, we always get a _rp_subpackages module.
+
+        raises ValueError if two resources or subdirectories of
+        a directory would give the same Python name
+        """
+        needed = set([''])
+        for file in nonPython:
+            directory = os.path.dirname( file )
+            while directory not in needed:
+                needed.add( directory )
+                directory = os.path.dirname( directory )
+        names = {}
+        for file, (base, ext, fullName) in nonPython.items():
+            names.setdefault( os.path.dirname( file ), {} )[os.path.basename( base )] = file
+        aliases = {}
+        for directory in sorted( needed ):
+            if not directory:
+                continue
+            parent, name = os.path.split( directory )
+            packageName = self.directoryToName( name )
+            taken = names.setdefault( parent, {} )
+            if packageName in taken:
+                raise ValueError(
+                    """%s has %s and %s which would generate the same Python name %s"""%(
+                        self, directory, taken[packageName], packageName,
+                    )
+                )
+            taken[packageName] = directory
+            if packageName != name:
+                aliases.setdefault( parent, {} )[packageName] = name
+        for directory in sorted( needed ):
+            package = self.getSubpackage( directory )
+            local = dict( sorted( aliases.get( directory, {} ).items()))
+            if directory:
+                subpackages.write_init(
+                    package.directory, package.packageName, directory, local, self.fsync,
+                    self.deterministic,
+                )
+            if local or not directory:
+                subpackages.write_aliases(
+                    package.directory, package.packageName, local, self.fsync,
+                    self.deterministic,
+                )
+        for directory in directories:
+            if directory not in needed and log:
+                log.debug("""directory %r has no resources, not a subpackage""", directory )
+    def getSubpackage( self, directory ):
+        """Get a copy of ourselves for the (relative) subdirectory
+
+        The copy's packageName and directory are those of the
+        subpackage, it is passed to the generators of the
+        subdirectory's resources.
+        """
+        if not directory:
+            return self
+        cache = self.__dict__.setdefault( '_subpackages', {} )
+        package = cache.get( directory )
+        if package is None:
+            package = copy.copy( self )
+            package.__dict__.pop( '_subpackages', None )
+            package.packageName = '.'.join(
+                [self.packageName] + [
+                    self.directoryToName( name )
+                    for name in directory.split( '/' )
+                ]
+            )
+            package.directory = os.path.join( self.directory, directory )
+            cache[directory] = package
+        return package
+    def normaliseTimes( self, bases, directories=() ):
+        """Set the times of the files we generated to the reproducible epoch
+
+        bases -- the (relative) base names of resource modules
+        directories -- further (relative) subdirectories whose
+            support modules are normalised
+
+        Used by deterministic scans, see the reproducible module.
+
+        returns the number of files whose time changed
+        """
+        epoch = reproducible.get_epoch()
+        local = {'': set()}
+        for base in bases:
+            directory, sep, name = base.rpartition( '/' )
+            local.setdefault( directory, set() ).add( name )
+        for directory in directories:
+            local.setdefault( directory, set() )
+        count = 0
+        for directory, modules in sorted( local.items()):
+            if directory:
+                generated = ('__init__.py',)
+            else:
+                generated = (self.manifestName,)
+            count += reproducible.normalise_directory(
+                os.path.join( self.directory, directory ), modules, epoch,
+                both = self.bytecode == 'both',
+                prefix = self.reservedPrefix,
+                names = generated,
+            )
+        if log:
+            log.debug("""normalised the times of %s files to %s""", count, epoch )
+        return count
+    def pruneGenerators( self, nonPython, directories=() ):
+        """Have generators keeping caches prune them to our current resources
+
+        nonPython -- {file: (base, ext, fullName)} for all resources
+        directories -- further (relative) subdirectories scanned
+
+        Generators with a prune( package, sources, directories )
+        method (e.g. imagegenerators.ImageGenerator) are passed
+        the full paths of the resources they generate and of our
+        directories.
+        """
+        sources = {}
+        for file, (base, ext, fullName) in nonPython.items():
+            sources.setdefault( id( self.getGenerator( ext )), [] ).append( fullName )
+        fullDirectories = [self.directory] + [
+            os.path.join( self.directory, directory ) for directory in directories
+        ]
+        seen = set()
+        for extension in sorted( self.generators ):
+            generator = self.getGenerator( extension )
+            if id( generator ) in seen or not hasattr( generator, 'prune' ):
+                continue
+            seen.add( id( generator ))
+            removed = generator.prune( self, sources.get( id( generator ), [] ), fullDirectories )
+            if removed and log:
+                log.info("""%r pruned %s cached files""", generator, removed )
+    def getModuleName( self, base ):
+        """Get the full dotted name of the module with (relative) base name"""
+        directory, sep, name = base.rpartition( '/' )
+        return self.getSubpackage( directory ).packageName + '.' + name
+    def getNameIndex( self ):
+        """Get the names.NameIndex mapping our resources to their modules
+
+        The index built by the last scan is used if there was
+        one, otherwise it is restored from the manifest, or
+        failing that built from a listing of our directory.
+        """
+        if self._names is None:
+            manifest = self.loadManifest()
+            if manifest is not None and manifest.entries:
+                self._names = names.NameIndex.fromManifest( self, manifest )
+            else:
+                index = names.NameIndex( self )
+                for file, direntry in self.walk()[0]:
+                    base, ext = self.sourceToName( file )
+                    if self.isResource( file, ext, isFile=1 ):
+                        index.add( file, base, ext )
+                self._names = index
+        return self._names
+
+    def scanJobs( self, jobs, workers=None, method='generateFile' ):
+        """Run jobs with scanParallel if workers > 1, otherwise scanSerial
+
+        With workers None, jobs whose generators are threaded
+        are run by scanThreaded.
+        """
+        if workers and workers > 1 and len(jobs) > 1:
+            return self.scanParallel( jobs, workers, method )
+        if workers is None:
+            threaded = [
+                job for job in jobs
+                if getattr( self.getGenerator( job[2] ), 'threaded', 0 )
+            ]
+            if len(threaded) > 1:
+                serial = [job for job in jobs if not getattr( self.getGenerator( job[2] ), 'threaded', 0 )]
+                results, errors = self.scanThreaded( threaded, method=method )
+                more, moreErrors = self.scanSerial( serial, method )
+                results.update( more )
+                return results, errors + moreErrors
+        return self.scanSerial( jobs, method )
+    def scanThreaded( self, jobs, threads=None, method='generateFile', arguments=() ):
+        """Process jobs in a thread pool, see scanSerial
+
+        For generators whose work releases the GIL (e.g. image
+        conversion), this avoids the start-up and pickling
+        costs of scanParallel's processes.
+
+        threads -- number of threads, defaults to os.cpu_count()
+        """
+        from concurrent import futures
+        results = {}
+        errors = []
+        with futures.ThreadPoolExecutor( max_workers=threads or os.cpu_count() or 1 ) as executor:
+            submitted = [
+                (file, executor.submit( getattr( self, method ), file, base, ext, *arguments ))
+                for file, base, ext, entry in jobs
+            ]
+            for file, future in submitted:
+                try:
+                    results[file] = future.result()
+                except Exception as err:
+                    errors.append( (file, err) )
+        return results, errors
+
+    def shareChecked( self, checked, manifest, modules, force=0 ):
+        """Decide which checked resources share a module, see the dedupe module
+
+        checked -- list of [file, base, ext, entry, reason, ...]
+            for each resource, each entry gets its "shared" module
+            base name (None if not shared), and the reason of
+            those whose sharing changed becomes "shared"
+        manifest -- the loaded manifest or None
+        modules -- set of the module files present
+
+        returns (jobs, shared) where jobs are the (file, shared
+        base, ext, entry) jobs for the shared modules needing to
+        be (re)generated, and shared is {module base: full name
+        of its shared module}, for _shared during the scan
+        """
+        shared = {}
+        if self.dedupe:
+            shared = dedupe.group( dict([(item[0], item[3]) for item in checked]) )
+        members = {}
+        for item in checked:
+            file, base, ext, entry = item[:4]
+            entry['shared'] = key = shared.get( file )
+            previous = None
+            if manifest is not None:
+                previous = manifest.get( file )
+            if item[4] is None and previous is not None and previous.get( 'shared' ) != key:
+                if log:
+                    log.info("""shared %r -> %r""", file, key )
+                item[4] = 'shared'
+            if key is not None:
+                members.setdefault( key, [] ).append( item )
+        jobs = []
+        extension = self.getModuleExtension()
+        for key, items in sorted( members.items()):
+            if force or (key + extension) not in modules or [
+                item for item in items if item[4] is not None
+            ]:
+                file, base, ext, entry = items[0][:4]
+                jobs.append( (file, key, ext, entry) )
+        return jobs, dict([
+            (item[1], self.packageName + '.' + key)
+            for key, items in members.items()
+            for item in items
+        ])
+    def removeStaleBlobs( self, fileList, checked ):
+        """Remove shared modules (and sidecars) no longer shared by any resource"""
+        current = set([item[3]['shared'] for item in checked])
+        for file, direntry in fileList:
+            if '/' not in file and dedupe.is_blob( file ):
+                if os.path.splitext( file )[0] not in current:
+                    if log:
+                        log.info("""removing unused shared module %r""", file )
+                    os.remove( os.path.join( self.directory, file ))
+    def reportShared( self, checked ):
+        """Log (and record in our stats) the bytes saved by sharing modules
+
+        returns (resources, shared modules, bytes saved)
+        """
+        groups = {}
+        sizes = {}
+        extension = self.getModuleExtension()
+        for file, base, ext, entry, reason, duration in checked:
+            key = entry['shared']
+            if key is None:
+                continue
+            groups.setdefault( key, [] ).append(
+                self.getFileSize( base + extension )
+            )
+            if key not in sizes:
+                sizes[key] = self.getFileSize( key + extension ) + self.getFileSize( key + '.rpblob' )
+        report = dedupe.savings( groups, sizes )
+        if log:
+            log.info("""%s resources share %s modules, saving %s bytes""", *report )
+        if self.stats is not None:
+            self.stats.shared = dict( zip( ('resources','modules','saved'), report ))
+        return report
+    def writeCatalogue( self, checked ):
+        """Write our _rp_catalogue module describing the checked resources
+
+        checked -- list of [file, base, ext, entry, ...] for
+            every resource, see scanUnlocked
+
+        returns boolean indicating whether the module was written
+        """
+        storage = {}
+        if self.bundle:
+            fullModule = os.path.join( self.directory, bundle.BUNDLE_MODULE + '.py' )
+            if os.path.exists( fullModule ):
+                # the bundle's index has the payload sizes and codecs
+                index = extraction.load_isolated(
+                    fullModule, self.packageName + '.' + bundle.BUNDLE_MODULE,
+                )['index']
+                storage = dict([
+                    (base, (length, codec))
+                    for base, (source, offset, length, codec) in index.items()
+                ])
+        resources = {}
+        for item in checked:
+            file, base, ext, entry = item[:4]
+            if self.bundle:
+                stored, codec = storage.get( base, (None, None) )
+            else:
+                stored, codec = self.getStorage( base, ext )
+            name, info = self.describeResource( file, base, entry, stored, codec )
+            resources[name] = info
+        return catalogue.write_catalogue(
+            self.directory, self.packageName, resources, self.bundle, self.fsync,
+            self.deterministic,
+        )
+    def describeResource( self, source, base, entry, stored, codec ):
+        """Get (catalogue name, catalogue metadata) for a resource
+
+        entry -- the resource's manifest entry, see checkFile
+        stored, codec -- see getStorage
+        """
+        moduleName = self.getModuleName( base )
+        return moduleName[len(self.packageName)+1:], {
+            'module': moduleName,
+            'source': source,
+            'size': entry['size'],
+            'stored': stored,
+            'codec': codec,
+            'hash': entry['hash'],
+        }
+    def updateCatalogue( self, source, base, extension, entry ):
+        """Update the catalogue's entry for a single regenerated resource
+
+        Used by scanFile, the catalogue is only updated if it
+        already exists, otherwise the next scan writes it.
+
+        returns boolean indicating whether the module was written
+        """
+        resources = catalogue.read_catalogue( self.directory, self.packageName )
+        if resources is None:
+            return 0
+        stored, codec = self.getStorage( base, extension )
+        name, info = self.describeResource( source, base, entry, stored, codec )
+        resources[name] = info
+        return catalogue.write_catalogue(
+            self.directory, self.packageName, resources, self.bundle, self.fsync,
+            self.deterministic,
+        )
+    def isCatalogueCurrent( self, checked ):
+        """Determine whether our catalogue lists the checked resources as they are
+
+        checked -- list of [file, base, ext, entry, ...] for
+            every resource, see scanUnlocked
+
+        The catalogue's sources, sizes and hashes are compared,
+        so resources added or changed by scanFile (e.g. while
+        watching, see watch) since the catalogue was written
+        have it rewritten by the next scan.
+        """
+        resources = catalogue.read_catalogue( self.directory, self.packageName )
+        if resources is None:
+            return 0
+        recorded = sorted([
+            (info.get( 'source' ), info.get( 'size' ), info.get( 'hash' ))
+            for info in resources.values()
+        ])
+        return recorded == sorted([
+            (item[0], item[3]['size'], item[3]['hash']) for item in checked
+        ])
+    def getStorage( self, base, extension ):
+        """Get (bytes stored, codec) for the module generated for a resource"""
+        fullModuleName = os.path.join( self.directory, base + self.getModuleExtension() )
+        try:
+            return self.getGenerator( extension ).getStorage( fullModuleName )
+        except OSError:
+            return None, None
+    def getFileSize( self, name ):
+        """Get the size of the (relative) file name, 0 if it doesn't exist"""
+        try:
+            return os.path.getsize( os.path.join( self.directory, name ))
+        except OSError:
+            return 0
+
+    def scanSerial( self, jobs, method='generateFile', arguments=() ):
+        """Run method for each (file, base, ext, entry) job in this process
+
+        method -- name of the Package method to call with
+            (file, base, ext) for each job
+        arguments -- further arguments for each call to method
+
+        returns (results, errors) where results is {file: result}
+        and errors is a list of (file, exception) in job order
+        """
+        results = {}
+        errors = []
+        for file, base, ext, entry in jobs:
+            try:
+                results[file] = getattr( self, method )( file, base, ext, *arguments )
+            except Exception as err:
+                errors.append( (file, err) )
+        return results, errors
+
+    def scanParallel( self, jobs, workers=2, method='generateFile', arguments=() ):
+        """Run method for each (file, base, ext, entry) job in a process pool
+
+        The package (and its generators) must be picklable.
+
+        method -- name of the Package method to call with
+            (file, base, ext) for each job
+        arguments -- further arguments for each call to method
+
+        returns (results, errors) where results is {file: result}
+        and errors is a list of (file, exception) in job order
+        """
+        from concurrent import futures
+        if log:
+            log.debug("""dispatching %s files to %s workers""", len(jobs), workers )
+        results = {}
+        errors = []
+        with futures.ProcessPoolExecutor( max_workers=workers ) as pool:
+            pending = [
+                (file, pool.submit( _packageJob, self, method, file, base, ext, arguments ))
+                for file, base, ext, entry in jobs
+            ]
+            for file, future in pending:
+                try:
+                    results[file] = future.result()
+                except Exception as err:
+                    errors.append( (file, err) )
+        return results, errors
+
+    def scanBundle( self, nonPython, jobs, workers=None ):
+        """Rewrite the bundle from every resource in nonPython
+
+        nonPython -- {file: (base, ext, fullName)} for all resources
+        jobs -- the stale (file, base, ext, entry) jobs, reported
+            as updated in the results
+
+        returns (results, errors) as for scanSerial, the bundle
+        is not written if any resource failed
+        """
+        every = [
+            (file, base, ext, None)
+            for file,(base,ext,fullName) in sorted(nonPython.items())
+        ]
+        if workers and workers > 1 and len(every) > 1:
+            payloads, errors = self.scanParallel( every, workers, method='payloadFile' )
+        else:
+            payloads, errors = self.scanSerial( every, method='payloadFile' )
+        if errors:
+            return {}, errors
+        if log:
+            log.info("""writing bundle of %s resources for %s""", len(every), self )
+        bundle.write_bundle(
+            self.directory,
+            self.packageName,
+            [
+                (base, file) + payloads[file]
+                for file, base, ext, entry in every
+            ],
+            fsync = self.fsync,
+            dedupe = self.dedupe,
+            deterministic = self.deterministic,
+        )
+        return dict([(job[0], 1) for job in jobs]), []
+
+    def scanFile( self, source, base=None, extension=None, force=0, manifest=None):
         """Encode/update/scan a single file
 
         source -- full path name of the source-file
         base -- (optional) calculated base module name
         extension -- (optional) calculated lower-cased extension
-        force -- whether to force update even if dates suggest
-            the module is already up-to-date.
+        force -- whether to force update even if the manifest
+            or dates suggest the module is already up-to-date.
+        manifest -- (optional) already-loaded manifest to check
+            and update, if not provided the package lock is taken
+            and the package's manifest is loaded and saved around
+            this call
 
         Note: this does _not_ check to see if there is a filename
         conflict between resources, so potentially it could
@@ -156,29 +1012,182 @@ class Package:
         # different directory from where the files are, but you
         # can specify the filenames as p:\whatever\whenever.gif
         # which in the imagined approach will be more common.
-        source = os.path.basename( source )
-        fullName = os.path.join( self.directory, source )
+        # Recursive packages keep the path below our directory.
+        if self.recursive:
+            source = os.path.relpath(
+                os.path.join( self.directory, source ), self.directory,
+            ).replace( os.sep, '/' )
+        else:
+            source = os.path.basename( source )
+        if self.bundle or self.dedupe:
+            # bundles are always written as a whole, and sharing
+            # depends on the content of every resource
+            return self.scan( force=force ).get( source, 0 )
         if base is None or extension is None:
-            base, extension = self.fileToName( source )
-        moduleName = base + '.py'
-        fullModuleName = os.path.join(self.directory, moduleName)
-        
-        # date-only check, is actually a redundant check for
-        # calls from scan
-        if (not force) and os.path.exists( fullModuleName ):
+            # the last scan's index, if any, already has the names
+            name = self._names is not None and self._names.getName( source )
+            base, extension = name or self.sourceToName( source )
+        lock = None
+        save = 0
+        if manifest is None:
+            lock = self.acquireLock()
+            manifest = self.loadManifest()
+            save = 1
+        try:
+            started = time.perf_counter()
+            entry, reason = self.checkFile( source, base, extension, force, manifest )
+            record = None
+            if self.stats is not None:
+                record = self.recordCheck( source, entry, reason, time.perf_counter()-started )
+            if reason is not None:
+                if record is None:
+                    self.generateFile( source, base, extension )
+                else:
+                    try:
+                        result, timings = self.generateFileTimed( source, base, extension )
+                    except Exception as err:
+                        record.action = 'failed'
+                        record.reason = str( err )
+                        raise
+                    else:
+                        record.addTimings( timings )
+                    finally:
+                        self.stats.add( record )
+            if manifest is not None:
+                manifest.set( source, entry )
+                if save:
+                    manifest.save( self.fsync )
+            if self.useCatalogue and reason is not None:
+                self.updateCatalogue( source, base, extension, entry )
+            if self.deterministic and reason is not None:
+                self.normaliseTimes( [base] )
+        finally:
+            if lock is not None:
+                lock.release()
+        if log:
+            log.debug("""scanFile %r finished""", source )
+        return int( reason is not None )
+
+    def checkFile( self, source, base, extension, force=0, manifest=None, exists=None, target=None, info=None ):
+        """Decide whether the module for source needs to be (re)generated
+
+        source -- base filename of the resource in our directory
+        base -- calculated base module name
+        extension -- calculated lower-cased extension
+        force -- whether to regenerate regardless
+        manifest -- (optional) loaded manifest, if None, only
+            modification dates are compared
+        exists -- (optional) whether the module already exists,
+            if None, the filesystem is checked
+        target -- (optional) full path of the generated file,
+            defaults to the resource's module
+        info -- (optional) os.stat result for the source, if
+            already known
+
+        The source is only hashed when there is no manifest entry
+        for it, or its size or mtime differ from the manifest (or,
+        with no manifest, when dedupe needs its content hash), so
+        an edit preserving both size and mtime goes unnoticed
+        unless force or our rehash attribute is set.
+
+        returns (entry, reason) where entry is the manifest entry
+        describing the current source and reason is one of
+        "new", "refresh", "force" or "generator" when the
+        module must be generated, or None when it is up to date
+        """
+        fullName = os.path.join( self.directory, source )
+        moduleName = base + self.getModuleExtension()
+        fullModuleName = target or os.path.join(self.directory, moduleName)
+        if exists is None:
+            exists = os.path.exists( fullModuleName )
+        if info is None:
+            info = os.stat( fullName )
+        entry = {
+            'size': info.st_size,
+            'mtime': info.st_mtime_ns,
+            'generator': self.getGenerator( extension ).getIdentity(),
+            'version': defaultgenerators.ENCODING_VERSION,
+            'module': base,
+            'bytecode': self.bytecode,
+        }
+        if self.deterministic:
+            entry['deterministic'] = 1
+        previous = None
+        if manifest is not None:
+            previous = manifest.get( source )
+        if manifest is None and not self.dedupe:
+            # no manifest, no need to hash
+            entry['hash'] = None
+        elif previous and not (force or self.rehash) and (
+            previous.get('size') == entry['size'] and previous.get('mtime') == entry['mtime']
+        ):
+            entry['hash'] = previous.get('hash')
+        else:
+            entry['hash'] = self.hashFile( fullName )
+        if force:
+            reason = 'force'
+        elif not exists:
+            reason = 'new'
+        elif previous is None:
+            # no manifest, or no record of this file in it,
+            # trust the dates (this once)
             if self.compareDates( fullName, fullModuleName ):
-                if log:
-                    log.info("""file %r up to date""", moduleName )
-                return 0
+                reason = None
             else:
-                if log:
-                    log.info("""refresh %r -> %r""", source, moduleName)
-        elif force:
-            if log:
-                log.info("""force %r -> %r""", source, moduleName)
+                reason = 'refresh'
+        elif [previous.get(key) for key in ('generator','version','module','bytecode')] != [
+            entry['generator'], entry['version'], entry['module'], entry['bytecode'],
+        ] or previous.get('deterministic', 0) != entry.get('deterministic', 0):
+            reason = 'generator'
+        elif previous.get('hash') != entry['hash']:
+            reason = 'refresh'
         else:
-            if log:
-                log.info("""new %r -> %r""", source, moduleName)
+            reason = None
+        if log:
+            if reason is None:
+                log.info("""file %r up to date""", moduleName )
+            else:
+                log.info("""%s %r -> %r""", reason, source, moduleName)
+        return entry, reason
+
+    def generateFile( self, source, base, extension ):
+        """Unconditionally generate the module for source
+
+        source -- filename of the resource relative to our directory
+        base -- calculated base module name
+        extension -- calculated lower-cased extension
+
+        If _shared maps base to a shared module, only an alias
+        of that module is written, see the dedupe module.
+        Resources larger than shardSize are written as shard
+        modules behind a front module, see the sharding module.
+
+        returns 1
+        """
+        fullName = os.path.join( self.directory, source )
+        fullModuleName = os.path.join(self.directory, base + '.py')
+        # the generators see the package the module is in
+        package = self.getSubpackage( os.path.dirname( base ))
+        shared = self._shared.get( base )
+        if shared is not None:
+            if self.bytecode == 'sourceless':
+                fullModuleName = os.path.join(self.directory, base + '.pyc')
+            replaced = dedupe.write_alias(
+                fullName, fullModuleName, package, shared, self.fsync,
+                compiled = self.bytecode == 'sourceless',
+            )
+            if self.bytecode == 'sourceless':
+                self.removeStale( base + '.py', base + '.pyc' )
+            else:
+                self.removeStale( base + '.pyc', base + '.py' )
+                if self.bytecode == 'both' and (
+                    replaced != 0 or not os.path.isfile( bytecode.cache_path( fullModuleName ))
+                ):
+                    bytecode.write_cached( fullModuleName, self.deterministic )
+            # the payload lives with the shared module
+            self.removeStale( base + '.rpblob', shared )
+            self.removeShards( base )
+            return 1
         # okay, one way or another we want to generate our
         # little Python file for this resource.  By default,
         # we're going to just dump the contents to a string.
@@ -186,16 +1195,141 @@ class Package:
         generator = self.getGenerator( extension )
         if log:
             log.debug("""generator %r""", generator )
-        generator( fullName, fullModuleName, self )
-        if log:
-            log.debug("""scanFile %r finished""", source )
+        if self.shardSize and sharding.can_shard( generator ) and os.path.getsize( fullName ) > self.shardSize:
+            fullModuleName = os.path.join(self.directory, base + self.getModuleExtension())
+            replaced = sharding.write_sharded(
+                generator, fullName, fullModuleName, package,
+                self.shardSize, self.fsync, self.bytecode,
+            )
+            if self.bytecode == 'sourceless':
+                self.removeStale( base + '.py', base + '.pyc' )
+            else:
+                self.removeStale( base + '.pyc', base + '.py' )
+            if replaced == 0 and log:
+                log.info("""%r unchanged, not rewritten""", os.path.basename( fullModuleName ))
+            return 1
+        self.removeShards( base )
+        if self.bytecode == 'sourceless':
+            fullModuleName = os.path.join(self.directory, base + '.pyc')
+            replaced = bytecode.write_sourceless( generator, fullName, fullModuleName, package, self.fsync )
+            # a .py module would be imported in preference to ours
+            self.removeStale( base + '.py', base + '.pyc' )
+        else:
+            replaced = generator( fullName, fullModuleName, package )
+            self.removeStale( base + '.pyc', base + '.py' )
+            if self.bytecode == 'both' and (
+                replaced != 0 or not os.path.isfile( bytecode.cache_path( fullModuleName ))
+            ):
+                bytecode.write_cached( fullModuleName, self.deterministic )
+        if replaced == 0 and log:
+            log.info("""%r unchanged, not rewritten""", os.path.basename( fullModuleName ))
         return 1
 
+    def removeStale( self, name, replacement ):
+        """Remove module file name left over from another bytecode mode"""
+        stale = os.path.join( self.directory, name )
+        if os.path.isfile( stale ):
+            if log:
+                log.info("""removing %r, replaced by %r""", name, replacement )
+            os.remove( stale )
+    def removeShards( self, base ):
+        """Remove any shard modules left from when base's resource was sharded"""
+        directory, sep, name = base.rpartition( '/' )
+        removed = sharding.remove_shards( os.path.join( self.directory, directory ), name )
+        if removed and log:
+            log.info("""removed %s shards of %r""", removed, base )
+    def generateFileTimed( self, source, base, extension ):
+        """generateFile, returning (result, stats.Timings) for the call"""
+        return stats.timed( self.generateFile, source, base, extension )
+
+    def getModuleExtension( self ):
+        """Get the extension of the modules we generate"""
+        if self.bytecode == 'sourceless':
+            return '.pyc'
+        return '.py'
+
+    def payloadFile( self, source, base, extension ):
+        """Get the (payload, codec) for storing source in a bundle"""
+        fullName = os.path.join( self.directory, source )
+        return self.getGenerator( extension ).getPayload( fullName, self )
+
+    def hashFile( self, fullName ):
+        """Get the content hash recorded in the manifest for fullName"""
+        return manifest.hash_file( fullName )
+
+    def acquireLock( self ):
+        """Take the cross-process scan lock on our directory
+
+        Time spent waiting for another process is logged.
+
+        returns the acquired locking.PackageLock, raises
+        locking.LockTimeout if not acquired in lockTimeout
+        """
+        lock = locking.PackageLock(
+            os.path.join( self.directory, self.lockName ),
+            self.lockTimeout,
+        )
+        if self.useLock:
+            waited = lock.acquire()
+            if log:
+                if waited >= 0.1:
+                    log.info("""waited %.3fs for scan lock on %s""", waited, self )
+                else:
+                    log.debug("""waited %.3fs for scan lock on %s""", waited, self )
+        return lock
+
+    def loadManifest( self ):
+        """Load our manifest, or return None if useManifest is false"""
+        if not self.useManifest:
+            return None
+        return manifest.Manifest(
+            os.path.join( self.directory, self.manifestName )
+        ).load()
+
+    def install( self ):
+        """Serve our resource modules from the resource files via an import hook
+
+        Nothing is generated or written, each import of a
+        resource module runs its generator in memory on the
+        current resource file, see the importer module.
+
+        returns the installed importer.ResourceFinder
+        """
+        from resourcepackage import importer
+        return importer.install( self )
+    def uninstall( self ):
+        """Remove any import hook installed by install"""
+        from resourcepackage import importer
+        importer.uninstall( self )
+    def watch( self, callback=None, stop=None, debounce=0.2, interval=1.0, polling=0, initial=1 ):
+        """Rescan resources as they change, until stop is set
+
+        callback -- optional callable, called with the full names
+            of the modules regenerated by each update, e.g.
+            watcher.reload_modules
+        stop -- optional threading.Event ending the watch,
+            without one we watch forever
+        debounce -- seconds without further changes before the
+            changed resources are scanned
+        interval -- seconds between polls, where inotify isn't
+            available (or polling is true)
+        initial -- whether to scan the whole package once the
+            watch has started
+
+        See the watcher module.
+        """
+        from resourcepackage import watcher
+        watcher.Watcher(
+            self, callback, debounce=debounce, interval=interval, polling=polling,
+        ).run( stop, initial )
+
     def getGenerator( self, extension="" ):
         """Get a file-type-specific generator, or the default"""
         for ext in [ extension, "" ]:
             obj = self.generators.get( ext )
             if obj:
+                if self.deterministic:
+                    return reproducible.fixed_generator( obj )
                 return obj
         raise KeyError( """%s class has no default "generate" object (key "")!!!"""%(self.__class__))
     
@@ -223,17 +1357,25 @@ class Package:
             return 0
         return firstTime <= secondTime
     ### Extracting back to disk files
-    def isEncodedResource (self, file, ext ):
+    def isEncodedResource (self, file, ext, isFile=None ):
         """Determine whether we consider this file an encoded resource module
+
+        isFile -- (optional) whether file is known to be a
+            regular file, if None, the filesystem is checked
         """
-        if not os.path.isfile( os.path.join( self.directory, file )):
+        if isFile is None:
+            isFile = os.path.isfile( os.path.join( self.directory, file ))
+        if not isFile:
             return 0
-        if ext != '.py' or file == "__init__.py":
+        name = os.path.basename( file )
+        if ext not in ('.py','.pyc') or os.path.splitext( name )[0] == "__init__":
+            return 0
+        if name.startswith( self.reservedPrefix ):
             return 0
         ## OK, so it is definitely a python file...
         ## for now, we will consider that sufficient...
         return 1
-    def extract( self, force=0 ):
+    def extract( self, force=0, workers=None ):
         """Extract encoded files to disk files
 
         for each python source file other than __init__.py, we
@@ -243,54 +1385,232 @@ class Package:
         if module.source doesn't exist, or is older,
         or force is true, then we write the file, otherwise
         we skip the file.
+
+        workers -- if more than 1, the number of worker processes
+            across which the modules are extracted
+
+        Modules are not imported, see extractFile.  Bundled
+        packages are extracted from the bundle, see extractBundle.
+
+        returns {module filename: extractFile result}
         """
         if log:
-            log.info("""scan(force=%r) %s""", force, self )
-        fileList = filter ( self.isEncodedResource, os.listdir( self.directory ))
-        for file in fileList:
-            self.extractFile (file, force)
+            log.info("""extract(force=%r, workers=%r) %s""", force, workers, self )
+        self._recorded = None
+        if self.stats is not None:
+            self.stats.begin( 'extract' )
+        try:
+            if self.bundle:
+                return self.extractBundle( force )
+            fileList, directories = self.walk()
+            # resolved once, worker processes get it with their copy
+            self.getNameIndex()
+            jobs = []
+            for file, direntry in sorted( fileList ):
+                base, ext = os.path.splitext( file )
+                if self.isEncodedResource( file, ext, isFile=1 ):
+                    jobs.append( (file, base, ext, None) )
+            if workers and workers > 1 and len(jobs) > 1:
+                results, errors = self.scanParallel( jobs, workers, 'extractJob', (force,) )
+            else:
+                results, errors = self.scanSerial( jobs, 'extractJob', (force,) )
+            for file, base, ext, entry in jobs:
+                if file in results:
+                    results[file], record = results[file]
+                    if record is not None:
+                        self.stats.add( record )
+            if errors:
+                if log:
+                    for file, err in errors:
+                        log.error("""Exception while extracting %s: %s""", file, err )
+                raise errors[0][1]
+            return results
+        finally:
+            if self.stats is not None:
+                self.stats.end()
 
     def extractFile( self, module, force = 0 ):
-        """Extract a single file from source (python module) to destination"""
-        # first question, should we do anything
-        fullModule = os.path.join( self.directory, module)
-        ### Need to import the module to do anything...
-        base, ext = self.fileToName( module )
+        """Extract a single file from source (python module) to destination
+
+        module -- filename of the module relative to our directory
+
+        The module is executed in isolation, see the extraction
+        module, so it is neither imported nor left in memory.
+        Errors are logged rather than raised.
+
+        returns 1 if the resource file was written, 0 if it was
+        up to date, None on error
+        """
+        base, ext = os.path.splitext( module )
+        self._recorded = None
+        result, record = self.extractJob( module, base, ext, force )
+        if record is not None:
+            self.stats.add( record )
+        return result
+    def extractJob( self, module, base, ext, force=0 ):
+        """extractFile for scanSerial/scanParallel
+
+        returns (result, stats.FileStats or None)
+        """
+        record = None
+        if self.stats is not None:
+            record = stats.FileStats( 'extract', module, base )
         try:
-            moduleObject = self.importModule(base)
+            result = self.extractModule( module, base, force, record )
         except Exception as err:
             if log:
                 log.error( """Exception while attempting to extract module %s, %s""", module, err)
-            return
-        if hasattr( moduleObject, "data") and hasattr( moduleObject, "source"):
-            fullDestination = os.path.join( self.directory, moduleObject.source)
-            if force or not self.compareDates( fullModule, fullDestination):
-                # okay, should write to the resource file...
+            if record is not None:
+                record.action = 'failed'
+                record.reason = str( err )
+            result = None
+        return result, record
+    def extractModule( self, module, base, force=0, record=None ):
+        """Extract a single module, see extractFile
+
+        record -- optional stats.FileStats to fill in
+
+        The source's name is looked up in our NameIndex (or read
+        from the module's header), so an up-to-date resource is
+        skipped without executing the module.
+        """
+        fullModule = os.path.join( self.directory, module )
+        directory = os.path.dirname( module )
+        moduleName = self.getModuleName( base )
+        source = self.getNameIndex().getSource( base )
+        if source is not None:
+            source = os.path.basename( source )
+        else:
+            source = extraction.read_source_name( fullModule )
+        if source is not None and not self.isExtractionStale( fullModule, directory, source, force, record ):
+            return 0
+        started = time.perf_counter()
+        namespace = extraction.load_isolated( fullModule, moduleName )
+        source = namespace.get( 'source' )
+        shared = namespace.get( 'shared' )
+        if isinstance( shared, str ) and dedupe.is_blob( shared.rpartition( '.' )[2] ):
+            # alias, the data is in the shared module at our top
+            sharedBase = shared.rpartition( '.' )[2]
+            fullModule = os.path.join( self.directory, sharedBase + os.path.splitext( module )[1] )
+            namespace = dict( extraction.load_isolated( fullModule, shared ), source=source )
+        if not isinstance( source, str ):
+            raise AttributeError( """Resource module %s does not define a "source" attribute, cannot extract"""%( module, ))
+        if not self.isExtractionStale( fullModule, directory, source, force, record ):
+            return 0
+        fullDestination = os.path.join( self.directory, directory, source )
+        # okay, should write to the resource file...
+        if log:
+            log.info( """extract %s -> %s""", module, source)
+        blocks = extraction.iter_resource( namespace )
+        if record is None:
+            extraction.write_blocks( fullDestination, blocks, self.fsync )
+            return 1
+        record.read = time.perf_counter() - started
+        record.bytesIn = os.path.getsize( fullModule )
+        result, timings = stats.timed( extraction.write_blocks, fullDestination, blocks, self.fsync )
+        record.addTimings( timings )
+        record.action = 'extracted'
+        return 1
+    def isExtractionStale( self, fullModule, directory, source, force=0, record=None ):
+        """Decide whether the resource source needs extracting from fullModule
+
+        directory -- the module's directory relative to ours
+
+        The resource is extracted if it is older than the module,
+        or, for modules written by a deterministic scan (whose
+        times are the reproducible epoch, see the reproducible
+        module), if its content's hash isn't the one recorded for
+        it (see getRecordedHash).
+        """
+        fullDestination = os.path.join( self.directory, directory, source )
+        relative = directory and directory + '/' + source or source
+        if record is not None:
+            record.source = relative
+        if force:
+            reason = 'force'
+        elif not self.compareDates( fullModule, fullDestination ):
+            reason = 'refresh'
+        elif reproducible.is_reproducible( fullModule ) and (
+            self.getRecordedHash( relative ) != self.hashFile( fullDestination )
+        ):
+            reason = 'content'
+        else:
+            reason = None
+        if reason is None and log:
+            log.info( """resource file %s up-to-date""", fullDestination)
+        if record is not None:
+            record.reason = reason or 'up to date'
+        return reason is not None
+
+    # {resource filename: content hash} for getRecordedHash, reset
+    # by each extract
+    _recorded = None
+    def getRecordedHash( self, source ):
+        """Get the content hash recorded for the (relative) resource source
+
+        The hashes are read from our manifest, or, failing that
+        (the manifest is left out of distributions), from our
+        catalogue, once per extract.
+
+        returns the hex hash, or None if not recorded
+        """
+        if self._recorded is None:
+            recorded = {}
+            resources = catalogue.read_catalogue( self.directory, self.packageName )
+            for info in (resources or {}).values():
+                recorded[info.get( 'source' )] = info.get( 'hash' )
+            manifest = self.loadManifest()
+            if manifest is not None:
+                for file, entry in manifest.entries.items():
+                    if entry.get( 'hash' ):
+                        recorded[file] = entry['hash']
+            self._recorded = recorded
+        return self._recorded.get( source )
+
+    def extractBundle( self, force=0 ):
+        """Extract every resource of our bundle
+
+        The bundle's index module is executed in isolation and
+        each resource read and decoded in turn.
+
+        returns {resource filename: 1 if written, 0 if up to date}
+        """
+        fullModule = os.path.join( self.directory, bundle.BUNDLE_MODULE + '.py' )
+        namespace = extraction.load_isolated(
+            fullModule, self.packageName + '.' + bundle.BUNDLE_MODULE,
+        )
+        results = {}
+        for name, (source, offset, length, codec) in sorted( namespace['index'].items()):
+            record = None
+            if self.stats is not None:
+                record = stats.FileStats( 'extract', source, name, bytesIn=length )
+            results[source] = 0
+            if self.isExtractionStale( fullModule, '', source, force, record ):
                 if log:
-                    log.info( """extract %s -> %s""", module, moduleObject.source)
-                if isinstance( moduleObject.data, types.StringType ):
-                    fileHandle = open( fullDestination, 'wb')
-                    try:
-                        fileHandle.write( moduleObject.data )
-                    finally:
-                        fileHandle.close ()
-                    return 1
+                    log.info( """extract %s -> %s""", name, source)
+                fullDestination = os.path.join( self.directory, source )
+                if record is None:
+                    extraction.write_blocks( fullDestination, [namespace['load']( name )], self.fsync )
                 else:
-                    if log:
-                        log.error( """module %s data attribute is not a string, is a %s""", module,type(moduleObject.data))
-            else:
-                if log:
-                    log.info( """resource file %s up-to-date""", fullDestination)
-                
-        else:
-            if log:
-                log.error( """Resource module %s does not define "data" and "source" attributes, cannot extract""", module)
-            
+                    result, timings = stats.timed(
+                        lambda: extraction.write_blocks( fullDestination, [namespace['load']( name )], self.fsync )
+                    )
+                    record.addTimings( timings )
+                    record.action = 'extracted'
+                results[source] = 1
+            if record is not None:
+                self.stats.add( record )
+        return results
+
     def importModule(self, baseName):
         """Import the given module from our package and return the module object"""
         moduleName = self.packageName.split('.')+[baseName]
         return __import__( '.'.join(moduleName), {}, {}, moduleName)
 
+def _packageJob( package, method, file, base, ext, arguments=() ):
+    """Process-pool entry point for Package.scanParallel"""
+    return getattr( package, method )( file, base, ext, *arguments )
+
 ##
 ##if log:
 ##	log.setLevel( logging.WARN )
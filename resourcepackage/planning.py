@@ -0,0 +1,181 @@
+"""Planning (dry runs) of Package scans
+
+Package.plan works out what Package.scan would do, without
+encoding (or writing) anything:
+
+    plan = package.plan()
+    print( planning.format_plan( plan ))
+    package.scan( plan=plan )
+
+The plan lists each resource the scan would generate ("new",
+"refresh", "force", "generator" or "shared", see
+Package.checkFile) or skip as up to date, the files which
+aren't resources, and the resources whose module names
+collide (which make the scan fail).  The bytes the generated
+modules will take are estimated by generating code for small
+samples of each resource, see SimpleGenerator.estimateSize.
+
+A plan holds the directory listing and checks it was made
+from, so scanning it doesn't walk the directory again, it is
+a snapshot though, so should be scanned promptly.
+"""
+import json
+try:
+    import logging
+    log = logging.getLogger( "resourcepackage.planning" )
+except ImportError:
+    log = None
+
+class Plan:
+    """What a scan of a Package would do, see Package.plan
+
+    force -- whether the plan regenerates every resource
+    files -- [(relative filename, os.DirEntry)] from Package.walk
+    directories -- relative subdirectories from Package.walk
+    resources -- {filename: (base, ext, fullName)} for resources
+    infos -- {filename: os.DirEntry} for resources
+    modules -- set of the module (.py/.pyc) files present
+    index -- the names.NameIndex of the resources
+    manifest -- the loaded manifest or None
+    checked -- [filename, base, ext, entry, reason, seconds]
+        for each resource, reason None if up to date
+    blobJobs -- jobs generating the dedupe shared modules
+    shared -- {module base: full name of its shared module} for
+        the resources sharing a dedupe module
+    removed -- manifest entries whose resources are gone
+    collisions -- [(filename, message)] for resources whose
+        module names collide with another's
+    ignored -- filenames which aren't resources or modules
+    estimates -- {filename: estimated bytes generated} for the
+        resources to be generated, see estimate
+    """
+    def __init__( self, package, force=0 ):
+        self.package = package
+        self.force = force
+        self.files = []
+        self.directories = []
+        self.resources = {}
+        self.infos = {}
+        self.modules = set()
+        self.index = None
+        self.manifest = None
+        self.checked = []
+        self.blobJobs = []
+        self.shared = {}
+        self.removed = []
+        self.collisions = []
+        self.ignored = []
+        self.estimates = {}
+    def __repr__( self ):
+        return """%s (%s, %s resources, %s to generate)"""%(
+            self.__class__.__name__, self.package.packageName,
+            len(self.checked), len(self.getJobs()),
+        )
+
+    def getJobs( self ):
+        """Get the (file, base, ext, entry) jobs for resources to be generated"""
+        return [
+            (file, base, ext, entry)
+            for file, base, ext, entry, reason, duration in self.checked
+            if reason is not None
+        ]
+    def estimate( self ):
+        """Estimate the bytes generated for each resource to be generated
+
+        returns the estimates dictionary
+        """
+        for file, base, ext, entry in self.getJobs():
+            generator = self.package.getGenerator( ext )
+            try:
+                self.estimates[file] = generator.estimateSize( self.resources[file][2], self.package )
+            except (IOError, OSError, ValueError) as err:
+                if log:
+                    log.warning( """Unable to estimate %s: %s""", file, err )
+                self.estimates[file] = None
+        return self.estimates
+    def getActions( self ):
+        """Get a JSON-compatible description of each resource's planned action"""
+        actions = []
+        for file, base, ext, entry, reason, duration in self.checked:
+            actions.append( {
+                'source': file,
+                'module': base,
+                'action': reason is None and 'skip' or 'generate',
+                'reason': reason or 'up to date',
+                'size': entry['size'],
+                'generator': entry['generator'],
+                'estimate': self.estimates.get( file ),
+            } )
+        return actions
+    def summary( self ):
+        """Get a JSON-compatible dictionary aggregating the plan"""
+        actions = self.getActions()
+        generate = [action for action in actions if action['action'] == 'generate']
+        reasons = {}
+        for action in actions:
+            reasons[action['reason']] = reasons.get( action['reason'], 0 ) + 1
+        estimates = [action['estimate'] for action in generate if action['estimate'] is not None]
+        return {
+            'package': self.package.packageName,
+            'force': bool( self.force ),
+            'resources': len(actions),
+            'generate': len(generate),
+            'skip': len(actions) - len(generate),
+            'reasons': reasons,
+            'removed': len(self.removed),
+            'collisions': len(self.collisions),
+            'ignored': len(self.ignored),
+            'bytesIn': sum([action['size'] for action in generate]),
+            'estimate': estimates and sum( estimates ) or None,
+        }
+    def asDict( self ):
+        """Get a JSON-compatible dictionary of the whole plan"""
+        return {
+            'summary': self.summary(),
+            'resources': self.getActions(),
+            'removed': list( self.removed ),
+            'collisions': [
+                {'source': file, 'error': message}
+                for file, message in self.collisions
+            ],
+            'ignored': list( self.ignored ),
+        }
+
+def format_plan( plan ):
+    """Format plan as a plain-text table"""
+    lines = [
+        '%-32s %-9s %-10s %10s %10s  %s'%(
+            'source', 'action', 'reason', 'size', 'estimate', 'module',
+        ),
+    ]
+    for action in plan.getActions():
+        estimate = action['estimate']
+        lines.append( '%-32s %-9s %-10s %10d %10s  %s'%(
+            action['source'][:32], action['action'], action['reason'][:10],
+            action['size'], estimate is not None and '%d'%( estimate, ) or '',
+            action['module'],
+        ))
+    for file in plan.removed:
+        lines.append( '%-32s %-9s'%( file[:32], 'removed' ))
+    for file, message in plan.collisions:
+        lines.append( '%-32s %-9s %s'%( file[:32], 'collision', message ))
+    for file in plan.ignored:
+        lines.append( '%-32s %-9s'%( file[:32], 'ignored' ))
+    summary = plan.summary()
+    lines.append(
+        '%(resources)s resources: %(generate)s to generate (%(bytesIn)s bytes), %(skip)s up to date, '
+        '%(removed)s removed, %(collisions)s collisions, %(ignored)s ignored'%summary
+    )
+    if summary['estimate'] is not None:
+        lines.append( 'estimated output %(estimate)s bytes'%summary )
+    return '\n'.join( lines )
+
+def format_json( plan ):
+    """Format plan as JSON"""
+    return json.dumps( plan.asDict(), indent=1, sort_keys=True )
+
+# name: formatting function, for scan.py's --plan option
+FORMATS = {
+    'table': format_plan,
+    'json': format_json,
+}
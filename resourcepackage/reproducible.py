@@ -0,0 +1,165 @@
+"""Deterministic (reproducible) output for Package.deterministic
+
+With a Package's deterministic attribute set, identical resources
+produce byte-identical packages, so build caches and wheel diffs
+only see real changes:
+
+    headers record the encoding version (see get_version) rather
+        than the resourcepackage release which wrote them
+    AutoGenerators without explicit candidates only try the
+        standard library's codecs, see fixed_generator
+    the modification times of the files a scan generates are set
+        to the SOURCE_DATE_EPOCH (see get_epoch), and the compiled
+        modules of "both" mode (see the bytecode module) are
+        checked by hash rather than by the source's timestamp
+
+As the generated files' times no longer say when they were
+generated, extraction compares the content of existing resource
+files with the hashes recorded for them instead, see
+is_reproducible and Package.isExtractionStale.
+
+Resources are always processed (and listed in the generated
+modules) in sorted order.  Staleness is decided by the manifest,
+without one every module looks older than its resource, so is
+regenerated (but not rewritten, see the atomic module) by each
+scan.
+"""
+import os, copy, struct
+from resourcepackage import defaultgenerators, bytecode
+
+# used when SOURCE_DATE_EPOCH isn't set, 1980-01-01, the
+# earliest time a zip file (and so a wheel) can record
+DEFAULT_EPOCH = 315532800
+# the codecs AutoGenerator tries in deterministic mode, those
+# of the standard library, available wherever Python is
+STANDARD_CODECS = ('bz2', 'lzma', 'zlib')
+# module file extensions whose times we normalise
+EXTENSIONS = ('.py', '.pyc', '.rpblob')
+
+def get_epoch( environ=None ):
+    """Get the time (seconds) given to generated files
+
+    The SOURCE_DATE_EPOCH environment variable (see
+    reproducible-builds.org) if set to an integer, otherwise
+    DEFAULT_EPOCH
+    """
+    if environ is None:
+        environ = os.environ
+    try:
+        return int( environ['SOURCE_DATE_EPOCH'] )
+    except (KeyError, ValueError):
+        return DEFAULT_EPOCH
+
+def get_version( deterministic=0 ):
+    """Get the version recorded in the headers of generated modules"""
+    if deterministic:
+        return 'encoding %s'%( defaultgenerators.ENCODING_VERSION, )
+    import resourcepackage
+    return resourcepackage.__version__
+
+_fixed = {}
+def fixed_generator( generator ):
+    """Get generator with a compression configuration independent of the environment
+
+    An AutoGenerator without explicit candidates tries every
+    registered codec, which depends on the optional packages
+    installed, so is replaced by a copy trying only the
+    available STANDARD_CODECS.  Other generators are returned
+    unchanged.
+    """
+    if not isinstance( generator, defaultgenerators.AutoGenerator ) or generator.candidates is not None:
+        return generator
+    fixed = _fixed.get( generator )
+    if fixed is None:
+        fixed = _fixed[generator] = copy.copy( generator )
+        fixed.candidates = tuple([
+            codec for codec in STANDARD_CODECS if codec in defaultgenerators.CODECS
+        ])
+    return fixed
+
+def set_time( filename, epoch ):
+    """Set the access and modification times of filename to epoch
+
+    returns boolean indicating whether the modification time changed
+    """
+    info = os.stat( filename )
+    if int( info.st_mtime ) == epoch and info.st_mtime_ns % 1000000000 == 0:
+        return 0
+    os.utime( filename, (epoch, epoch) )
+    return 1
+
+def is_reproducible( filename, lines=5 ):
+    """Determine whether the generated module filename was written deterministically
+
+    Its modification time is the epoch (the current get_epoch or
+    DEFAULT_EPOCH), or, for .py modules, its header records the
+    encoding version (see get_version).
+    """
+    try:
+        mtime = int( os.stat( filename ).st_mtime )
+    except OSError:
+        return 0
+    if mtime in (get_epoch(), DEFAULT_EPOCH):
+        return 1
+    if os.path.splitext( filename )[1] != '.py':
+        return 0
+    marker = '# written by resourcepackage: %r'%( get_version( 1 ), )
+    with open( filename, 'r', encoding='latin-1' ) as fh:
+        for index in range( lines ):
+            if fh.readline().rstrip( '\n' ) == marker:
+                return 1
+    return 0
+
+def is_hash_based( filename ):
+    """Determine whether the .pyc filename is checked by hash (PEP 552)"""
+    with open( filename, 'rb' ) as fh:
+        header = fh.read( 8 )
+    return len( header ) == 8 and bool( struct.unpack( '<I', header[4:8] )[0] & 1 )
+
+def normalise_module( filename, epoch, both=0 ):
+    """Set the times of the generated module filename (and its compiled form)
+
+    A timestamp-checked __pycache__ file of a module whose time
+    is changed is removed, as it would be wrongly considered up
+    to date if the module changed again without changing size,
+    or with both, replaced by one checked by hash.
+
+    returns boolean indicating whether the module's time changed
+    """
+    changed = set_time( filename, epoch )
+    if os.path.splitext( filename )[1] != '.py':
+        return changed
+    cached = bytecode.cache_path( filename )
+    if os.path.isfile( cached ) and not is_hash_based( cached ):
+        if both:
+            bytecode.write_cached( filename, deterministic=1 )
+        elif changed:
+            os.remove( cached )
+    if os.path.isfile( cached ):
+        set_time( cached, epoch )
+    return changed
+
+def normalise_directory( directory, bases, epoch, both=0, prefix='_rp_', names=() ):
+    """Set the times of the files generated in directory
+
+    bases -- the names of the resource modules in directory
+    both -- whether the modules' compiled forms should be
+        checked by hash, see normalise_module
+    prefix -- the prefix of support modules, see
+        Package.reservedPrefix
+    names -- other generated files (e.g. the manifest or a
+        subpackage's __init__.py)
+
+    returns the number of files whose time changed
+    """
+    count = 0
+    with os.scandir( directory ) as entries:
+        for entry in entries:
+            if not entry.is_file():
+                continue
+            base, extension = os.path.splitext( entry.name )
+            if entry.name in names or extension in EXTENSIONS and (
+                base in bases or base.startswith( prefix )
+            ):
+                count += normalise_module( entry.path, epoch, both )
+    return count
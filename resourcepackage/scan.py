@@ -1,7 +1,7 @@
 #!/usr/bin/env python
 """Script for scanning/updating resources into a resource package"""
 
-usage = """scan.py [-f] packageName [filenames, ...]
+usage = """scan.py [-f] [-j workers] [-b mode] [--stats format] [--deterministic] [--plan format] [--watch [--poll]] packageName [filenames, ...]
 
 packageName -- dotted Python package name for the package
     to be scanned.  If the Python package __init__.py
@@ -18,35 +18,94 @@ filenames -- optional list of individual files to be
     and any existing module should be ignored, and the
     embedding/encoding/updating should always occur.
 
+-j workers -- number of worker processes across which
+    the encoding work is spread, by default all files
+    are processed in the scanning process.
+
+-b mode -- emit compiled modules, mode is one of:
+    sourceless -- write only a .pyc per resource
+    both -- write the .py and its compiled __pycache__ file
+
+--stats format -- report per-file bytes, ratios, timings and
+    skip reasons once finished, format is "table" or "json"
+
+--deterministic -- generate byte-identical files from identical
+    resources, with modification times set to SOURCE_DATE_EPOCH
+    (if set), see resourcepackage.reproducible
+
+--plan format -- don't scan, print what a scan would do
+    instead, which resources are new, stale, up to date,
+    colliding or ignored, with estimates of the bytes
+    generated, format is "table" or "json"
+
+--watch -- once scanned, keep running, rescanning resources
+    as they change until interrupted (Ctrl-C)
+
+--poll -- with --watch, poll the resources for changes even
+    where inotify is available
+
 Note:
     Because the scanning process needs to import the
     package, any automatic scanning done by your __init__.py
     may cause modules to be updated from their resources
-    before scan.py starts working.
+    before scan.py starts working.  With --plan, scans are
+    deferred (see Package.deferScans) while it is imported.
 
 """
-import os, string
+import os, getopt
+from resourcepackage import stats, planning, package
 
-def main( packageName, filenames=(), force=0):
-    """Perform the actual extraction"""
-    packageModule = __import__(
-        packageName, {}, {},
-        string.split(packageName, '.')
-    )
+def main( packageName, filenames=(), force=0, workers=None, bytecode=None, statsFormat=None, watch=0, polling=0, planFormat=None, deterministic=0):
+    """Perform the actual scanning"""
+    if planFormat is not None:
+        # the plan should see the package as it is, not as
+        # scanned by a design-time __init__.py on import
+        package.Package.deferScans = 1
+    try:
+        packageModule = __import__(
+            packageName, {}, {},
+            packageName.split('.')
+        )
+    finally:
+        package.Package.deferScans = 0
     if not hasattr( packageModule, 'package' ):
         # build the default package object...
-        from resourcepackage import package
         packageObject = package.Package(
             packageModule.__name__,
             directory = os.path.dirname( os.path.abspath(packageModule.__file__) ),
         )
     else:
         packageObject = packageModule.package
-    if filenames:
-        for filename in filenames:
-            packageObject.scanFile( source = filename, force=force )
-    else:
-        packageObject.scan( force=force )
+    if bytecode is not None:
+        packageObject.bytecode = bytecode
+    if deterministic:
+        packageObject.deterministic = 1
+    if planFormat is not None:
+        print( planning.FORMATS[planFormat]( packageObject.plan( force=force )))
+        return
+    if statsFormat is not None:
+        packageObject.stats = stats.Stats()
+    try:
+        if filenames:
+            if statsFormat is not None:
+                packageObject.stats.begin( 'scan' )
+            try:
+                for filename in filenames:
+                    packageObject.scanFile( source = filename, force=force )
+            finally:
+                if statsFormat is not None:
+                    packageObject.stats.end()
+        else:
+            packageObject.scan( force=force, workers=workers )
+    finally:
+        if statsFormat is not None:
+            print( stats.FORMATS[statsFormat]( packageObject.stats ))
+    if watch:
+        packageObject.stats = None
+        try:
+            packageObject.watch( polling=polling, initial=0 )
+        except KeyboardInterrupt:
+            pass
 
 if __name__ == "__main__":
     import sys
@@ -59,18 +118,59 @@ if __name__ == "__main__":
         logging.basicConfig()
     except ImportError:
         log = None
+    try:
+        options, arguments = getopt.getopt( arguments, 'fj:b:', ['stats=','deterministic','plan=','watch','poll'] )
+    except getopt.GetoptError as err:
+        print(usage)
+        print('ERR:', err)
+        sys.exit( 1 )
+    force = 0
+    workers = None
+    bytecode = None
+    statsFormat = None
+    watch = 0
+    polling = 0
+    planFormat = None
+    deterministic = 0
+    for option, value in options:
+        if option == '-f':
+            force = 1
+        elif option == '-j':
+            workers = int( value )
+        elif option == '-b':
+            from resourcepackage.bytecode import MODES
+            if value not in MODES:
+                print(usage)
+                print('ERR: unknown bytecode mode', value)
+                sys.exit( 1 )
+            bytecode = value
+        elif option == '--stats':
+            if value not in stats.FORMATS:
+                print(usage)
+                print('ERR: unknown stats format', value)
+                sys.exit( 1 )
+            statsFormat = value
+        elif option == '--deterministic':
+            deterministic = 1
+        elif option == '--plan':
+            if value not in planning.FORMATS:
+                print(usage)
+                print('ERR: unknown plan format', value)
+                sys.exit( 1 )
+            planFormat = value
+        elif option == '--watch':
+            watch = 1
+        elif option == '--poll':
+            polling = 1
     if arguments:
-        # do we have a force...
-        force = arguments[0] == '-f'
-        if force:
-            del arguments[0]
-        if arguments:
-            packageName = arguments[0]
-            modules = arguments[1:]
-            main( packageName, modules, force=force )
-        else:
-            print(usage)
-            print('ERR: arguments received', sys.argv[1:])
+        packageName = arguments[0]
+        modules = arguments[1:]
+        main(
+            packageName, modules, force=force, workers=workers,
+            bytecode=bytecode, statsFormat=statsFormat,
+            watch=watch, polling=polling, planFormat=planFormat,
+            deterministic=deterministic,
+        )
     else:
         print(usage)
             
\ No newline at end of file
@@ -19,6 +19,9 @@ else:
             ## import specialised generators here, such as for wxPython
             #from resourcepackage import wxgenerators
             #generators.update( wxgenerators.generators )
+            ## or, without wxPython, Pillow-based image handling
+            #from resourcepackage import imagegenerators
+            #generators.update( imagegenerators.generators )
         except ImportError:
             pass
         else:
@@ -26,11 +29,39 @@ else:
                 packageName = __name__,
                 directory = os.path.dirname( os.path.abspath(__file__) ),
                 generators = generators,
-            )
-            package.scan(
                 ### CUSTOMISATION POINT
-                ## force true -> always re-loads from external files, otherwise
-                ## only reloads if the file is newer than the generated .py file.
-                # force = 1, 
+                ## bundle true -> store all resources in a single _rp_bundle
+                ## module and blob instead of one module per resource
+                # bundle = 1,
+                ## recursive true -> directories below this one holding resources
+                ## become generated subpackages, see resourcepackage.subpackages
+                # recursive = 1,
             )
+            ### CUSTOMISATION POINT
+            ## true -> serve the resources straight from the resource files
+            ## through an import hook, no modules are generated, run scan.py
+            ## to generate them for release
+            serveFromSource = 0
+            if serveFromSource:
+                package.install()
+            else:
+                package.scan(
+                    ### CUSTOMISATION POINT
+                    ## force true -> always re-loads from external files, otherwise
+                    ## only reloads if the file's content differs from that recorded
+                    ## in the package manifest (or, with no manifest entry, if the
+                    ## file is newer than the generated .py file).
+                    # force = 1, 
+                )
+                if package.deferScans:
+                    # being planned by scan.py --plan, not scanned, so
+                    # the support modules below may not exist yet
+                    pass
+                else:
+                    if package.bundle:
+                        # your release __init__.py needs this line too
+                        from ._rp_bundle import __getattr__, __dir__
+                    if package.recursive:
+                        # your release __init__.py needs this line too
+                        from . import _rp_subpackages
         
\ No newline at end of file
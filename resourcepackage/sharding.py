@@ -0,0 +1,259 @@
+"""Sharded modules for very large resources
+
+A resource larger than its Package's shardSize is split into
+numbered shard modules (_rp_shard_<module>_0000, ...) each
+holding at most shardSize bytes, behind a small front module
+with the resource's usual name.  The front module's data is
+assembled from the shards on first access, while
+
+    for chunk in module.iter_chunks():
+        ...
+    header = module.read( 0, 512 )
+
+load only the shards needed, one at a time and without keeping
+them imported, so a large resource can be streamed without
+ever being held in memory whole.
+
+Each shard is compiled separately, bounding the compiler's
+memory use by the shard size, and a shard whose bytes are
+unchanged is not rewritten (see the atomic module), so it
+keeps its compiled form.  Shards are fixed-size slices of the
+resource, so an edit which changes the resource's size
+rewrites the shards from the edit onwards.
+
+Only generators storing the resource's bytes (optionally
+compressed by a fixed codec) can be sharded, see can_shard.
+"""
+import os, io, copy, time
+from resourcepackage import defaultgenerators, atomic, bytecode, stats, reproducible
+
+SHARD_PREFIX = '_rp_shard_'
+# the encodings writing the data as a single literal, others
+# are replaced by "bytes" in shards
+SINGLE_LITERAL = ('bytes', 'base64', 'base85')
+
+SHARD = '''# -*- coding: ISO-8859-1 -*-
+"""Shard %(index)s of resource %(module)s (from file %(source)s)"""
+# written by resourcepackage: %(resourcepackagev)r
+'''
+
+FRONT = '''# -*- coding: ISO-8859-1 -*-
+"""Resource %(module)s (from file %(source)s)"""
+# written by resourcepackage: %(resourcepackagev)r
+source = %(source)r
+package = %(packagen)r
+# the data is split across shard modules, loaded as needed
+length = %(length)r
+# (shard module name, offset, length)
+shards = %(shards)r
+import os
+from importlib import util
+# drop data assembled by a previous load when reloaded
+globals().pop( 'data', None )
+def _load( index ):
+    """Get the data of the index'th shard, without keeping its module"""
+    name = shards[index][0]
+    fullName = __name__.rpartition( '.' )[0] + '.' + name
+    spec = None
+    for extension in ('.py', '.pyc'):
+        filename = os.path.join( os.path.dirname( __file__ ), name + extension )
+        if os.path.isfile( filename ):
+            spec = util.spec_from_file_location( fullName, filename )
+            break
+    if spec is None:
+        # e.g. zip-imported
+        spec = util.find_spec( fullName )
+    module = util.module_from_spec( spec )
+    spec.loader.exec_module( module )
+    return module.data
+def iter_chunks( ):
+    """Yield the data a shard at a time"""
+    for index in range( len( shards )):
+        yield _load( index )
+def iter_data( chunkSize=65536 ):
+    """Yield the data as bytes, in chunks of at most chunkSize"""
+    for chunk in iter_chunks():
+        view = memoryview( chunk )
+        for offset in range( 0, len(view), chunkSize ):
+            yield bytes( view[offset:offset+chunkSize] )
+def read( offset, size=-1 ):
+    """Read size bytes (to the end if negative) starting at offset"""
+    if size < 0:
+        end = length
+    else:
+        end = min( offset + size, length )
+    pieces = []
+    for index, (name, start, count) in enumerate( shards ):
+        if start + count <= offset or start >= end:
+            continue
+        view = memoryview( _load( index ))
+        pieces.append( view[max( offset - start, 0 ):end - start] )
+    return b''.join( pieces )
+def __getattr__( name ):
+    """Assemble the data from the shards on first access"""
+    if name == 'data':
+        data = globals()['data'] = b''.join( iter_chunks() )
+        return data
+    raise AttributeError( "module %%r has no attribute %%r"%%( __name__, name ))
+'''
+
+def can_shard( generator ):
+    """Determine whether generator's modules hold the resource's bytes
+
+    Generators which transform the data (e.g. image
+    conversion), choose a codec per resource (AutoGenerator) or
+    store it elsewhere (MappedGenerator) can't be sharded.
+    """
+    cls = generator.__class__
+    simple, compressed = defaultgenerators.SimpleGenerator, defaultgenerators.CompressedGenerator
+    return (
+        cls.getData in (simple.getData, compressed.getData) and
+        cls.iterData in (simple.iterData, compressed.iterData) and
+        cls.getDataRepr in (simple.getDataRepr, compressed.getDataRepr) and
+        cls.writeDataRepr in (simple.writeDataRepr, compressed.writeDataRepr)
+    )
+
+def shard_name( module, index ):
+    """Get the module name of the index'th shard of module"""
+    return '%s%s_%04d'%( SHARD_PREFIX, module, index )
+
+def iter_range( filename, offset, length, blockSize=1024*1024 ):
+    """Yield length bytes of filename from offset, in blocks of at most blockSize
+
+    Reads are timed when there are stats.current() Timings.
+    """
+    timings = stats.current()
+    with open( filename, 'rb' ) as fh:
+        fh.seek( offset )
+        while length > 0:
+            start = time.perf_counter()
+            block = fh.read( min( blockSize, length ))
+            if timings is not None:
+                timings.read += time.perf_counter() - start
+                timings.bytesRead += len( block )
+            if not block:
+                break
+            length -= len( block )
+            yield block
+
+def iter_compressed( blocks, codec ):
+    """Yield the blocks compressed with the named codec"""
+    codec = defaultgenerators.get_codec( codec )
+    if codec.compressor is None:
+        yield codec.compress( b''.join( blocks ))
+        return
+    compressor = codec.compressor()
+    for block in blocks:
+        block = compressor.compress( block )
+        if block:
+            yield block
+    block = compressor.flush()
+    if block:
+        yield block
+
+def write_body( file, generator, blocks ):
+    """Write the code assigning the blocks' data (compressed, as generator does) to file"""
+    file.write( generator.getEncodingImports() )
+    if isinstance( generator, defaultgenerators.CompressedGenerator ):
+        file.write( """import %s\n"""%( defaultgenerators.get_codec( generator.codec ).module, ))
+        generator.writeCompressedRepr( file, iter_compressed( blocks, generator.codec ), generator.codec )
+    else:
+        file.write( """data = """ )
+        for piece in defaultgenerators.iter_encoded( blocks, generator.encoding ):
+            file.write( piece )
+        file.write( """\n""" )
+    file.write( """### end\n""" )
+
+def write_module( destination, write, fsync=0, mode=None, deterministic=0 ):
+    """Write a module with write(file), as source or compiled for mode
+
+    destination -- full path of the module, a .pyc when mode is
+        "sourceless", see bytecode.MODES
+    write -- callable writing the module's code to a text file
+    deterministic -- see the reproducible module
+
+    returns boolean indicating whether destination was replaced
+    """
+    if mode == 'sourceless':
+        file = io.StringIO()
+        write( file )
+        moduleSource = os.path.splitext( destination )[0] + '.py'
+        code = bytecode.compile_module( file.getvalue(), moduleSource, deterministic )
+        return atomic.write_file( destination, bytecode.pyc_data( code ), fsync )
+    writer = atomic.AtomicFile( destination, 'w', fsync )
+    with writer as file:
+        write( file )
+    if mode == 'both' and (writer.replaced or not os.path.isfile( bytecode.cache_path( destination ))):
+        bytecode.write_cached( destination, deterministic )
+    return writer.replaced
+
+def write_sharded( generator, source, destination, package, shardSize, fsync=0, mode=None ):
+    """Write the front and shard modules for source
+
+    generator -- the generator for source, see can_shard
+    source -- full path of the resource file
+    destination -- full path of the front module, the shards
+        are written beside it with the same extension
+    package -- the Package (or subpackage) the module is in
+    shardSize -- the maximum bytes of the resource in each shard
+    mode -- None or one of bytecode.MODES
+
+    Shards left over from a previous, larger, version of the
+    resource are removed.
+
+    returns boolean indicating whether any module was replaced
+    """
+    if generator.encoding not in SINGLE_LITERAL or (mode == 'sourceless' and generator.encoding != 'bytes'):
+        # a shard's chained "repr" literals are too deeply nested to
+        # compile, and sourceless, as for bytecode.write_sourceless,
+        # the source's size doesn't matter
+        generator = copy.copy( generator )
+        generator.encoding = 'bytes'
+    directory, extension = os.path.dirname( destination ), os.path.splitext( destination )[1]
+    module = os.path.splitext( os.path.basename( destination ))[0]
+    length = os.path.getsize( source )
+    deterministic = getattr( package, 'deterministic', 0 )
+    resourcepackagev = reproducible.get_version( deterministic )
+    packagen = package.packageName
+    shards = []
+    replaced = 0
+    for index, offset in enumerate( range( 0, length, shardSize )):
+        count = min( shardSize, length - offset )
+        name = shard_name( module, index )
+        header = SHARD%{
+            'index': index, 'module': module, 'source': os.path.basename( source ),
+            'resourcepackagev': resourcepackagev,
+        }
+        def write( file, header=header, offset=offset, count=count ):
+            file.write( header )
+            write_body( file, generator, iter_range( source, offset, count, generator.blockSize ))
+        if write_module( os.path.join( directory, name + extension ), write, fsync, mode, deterministic ):
+            replaced = 1
+        # left over from another bytecode mode, it would be loaded instead
+        stale = os.path.join( directory, name + (extension == '.py' and '.pyc' or '.py') )
+        if os.path.isfile( stale ):
+            os.remove( stale )
+        shards.append( (name, offset, count) )
+    remove_shards( directory, module, len(shards) )
+    source = os.path.basename( source )
+    text = FRONT % locals()
+    if write_module( destination, lambda file: file.write( text ), fsync, mode, deterministic ):
+        replaced = 1
+    return replaced
+
+def remove_shards( directory, module, keep=0 ):
+    """Remove the shard modules of module from index keep on
+
+    returns the number of shards removed
+    """
+    index = keep
+    while True:
+        found = 0
+        for extension in ('.py', '.pyc'):
+            filename = os.path.join( directory, shard_name( module, index ) + extension )
+            if os.path.isfile( filename ):
+                os.remove( filename )
+                found = 1
+        if not found:
+            return index - keep
+        index += 1
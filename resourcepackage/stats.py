@@ -0,0 +1,292 @@
+"""Instrumentation of scanning and extraction
+
+Set a Stats instance as a Package's stats attribute to have
+scan(), scanFile(), extract() and extractFile() record a
+FileStats for each resource they consider:
+
+    package.stats = stats.Stats()
+    package.scan()
+    print( stats.format_table( package.stats ))
+
+The time spent generating a module is split into reading the
+resource (timed in defaultgenerators.iter_file), writing the
+generated files (timed in atomic.AtomicFile) and encoding,
+which is whatever remains.  The split is made by activating a
+Timings object for the duration of the work, see activate,
+so it works within worker processes too.
+"""
+import time, json, threading
+try:
+    import logging
+    log = logging.getLogger( "resourcepackage.stats" )
+except ImportError:
+    log = None
+
+PHASES = ('check', 'read', 'encode', 'write')
+
+class FileStats:
+    """Record of the processing of a single resource
+
+    operation -- "scan" or "extract"
+    source -- resource filename
+    module -- module base name
+    generator -- identity of the generator (scan only)
+    action -- "generated", "extracted", "skipped" or "failed"
+    reason -- why the action was taken, e.g. Package.checkFile's
+        reasons, "up to date", or the error message
+    bytesIn -- size of the data read (resource or module)
+    bytesOut -- size of the data written
+    check, read, encode, write -- seconds spent in each phase
+    """
+    def __init__(
+        self, operation, source, module=None, generator=None,
+        action='skipped', reason=None, bytesIn=0, bytesOut=0,
+    ):
+        self.operation = operation
+        self.source = source
+        self.module = module
+        self.generator = generator
+        self.action = action
+        self.reason = reason
+        self.bytesIn = bytesIn
+        self.bytesOut = bytesOut
+        self.check = self.read = self.encode = self.write = 0.0
+    def __repr__( self ):
+        return """%s (%s %s %s)"""%( self.__class__.__name__, self.operation, self.source or self.module, self.action)
+
+    @property
+    def ratio( self ):
+        """Ratio of bytes out to bytes in, None if nothing was written"""
+        if not self.bytesOut or not self.bytesIn:
+            return None
+        return float( self.bytesOut ) / self.bytesIn
+    @property
+    def total( self ):
+        """Total seconds spent on this resource"""
+        return self.check + self.read + self.encode + self.write
+    def addTimings( self, timings ):
+        """Add the read/encode/write split of a Timings to ours"""
+        self.read += timings.read
+        self.write += timings.write
+        self.encode += timings.getEncode()
+        self.bytesOut += timings.bytesWritten
+    def asDict( self ):
+        """Get a JSON-compatible dictionary describing the record"""
+        return dict([
+            (key, getattr( self, key ))
+            for key in (
+                'operation','source','module','generator','action',
+                'reason','bytesIn','bytesOut','ratio',
+            ) + PHASES
+        ])
+
+class Timings:
+    """Accumulated read and write times during a unit of work
+
+    total -- seconds for the whole unit of work, the time not
+        spent reading or writing is taken to be encoding
+    """
+    def __init__( self ):
+        self.read = 0.0
+        self.write = 0.0
+        self.bytesRead = 0
+        self.bytesWritten = 0
+        self.total = 0.0
+    def __repr__( self ):
+        return """%s (read=%.6f, write=%.6f, total=%.6f)"""%(
+            self.__class__.__name__, self.read, self.write, self.total,
+        )
+    def getEncode( self ):
+        """Seconds spent neither reading nor writing"""
+        return max( self.total - self.read - self.write, 0.0 )
+
+_local = threading.local()
+
+def current( ):
+    """Get the Timings active in this thread, or None"""
+    return getattr( _local, 'timings', None )
+
+class activate:
+    """Context manager making timings the current() Timings
+
+    The total time of the with block is added to timings.total
+    """
+    def __init__( self, timings ):
+        self.timings = timings
+    def __enter__( self ):
+        self.previous = current()
+        _local.timings = self.timings
+        self.start = time.perf_counter()
+        return self.timings
+    def __exit__( self, excType, excValue, traceback ):
+        self.timings.total += time.perf_counter() - self.start
+        _local.timings = self.previous
+        return False
+
+def timed( function, *args ):
+    """Call function(*args) with a fresh Timings active
+
+    returns (result, Timings), exceptions propagate
+    """
+    timings = Timings()
+    with activate( timings ):
+        result = function( *args )
+    return result, timings
+
+class TimedFile:
+    """Wrapper for an open file timing and counting its writes"""
+    def __init__( self, file, timings ):
+        self.file = file
+        self.timings = timings
+    def __getattr__( self, name ):
+        return getattr( self.file, name )
+    def write( self, data ):
+        start = time.perf_counter()
+        result = self.file.write( data )
+        self.timings.write += time.perf_counter() - start
+        self.timings.bytesWritten += len( data )
+        return result
+
+def timed_file( file ):
+    """Wrap file in a TimedFile if there are current() Timings"""
+    timings = current()
+    if timings is None:
+        return file
+    return TimedFile( file, timings )
+
+class Stats:
+    """Collects FileStats for a Package's scans and extractions
+
+    callback -- optional callable, called with each FileStats
+        as it is recorded
+
+    begin() clears the records, end() logs (and returns) the
+    summary of those recorded since.
+    """
+    def __init__( self, callback=None ):
+        self.callback = callback
+        self.files = []
+        self.operation = None
+        self.started = None
+        self.wall = 0.0
+        self.shared = None
+    def __repr__( self ):
+        return """%s (%s files)"""%( self.__class__.__name__, len(self.files))
+    def __getstate__( self ):
+        # copies sent to worker processes only need to exist,
+        # their work is timed and returned by the worker job
+        return {}
+    def __setstate__( self, state ):
+        self.__init__()
+
+    def begin( self, operation ):
+        """Start recording a new scan or extract"""
+        self.files = []
+        self.operation = operation
+        self.started = time.perf_counter()
+        self.wall = 0.0
+        self.shared = None
+    def end( self ):
+        """Finish the operation started by begin, log and return summary()"""
+        if self.started is not None:
+            self.wall = time.perf_counter() - self.started
+            self.started = None
+        summary = self.summary()
+        if log:
+            log.info(
+                """%s: %s files, %s generated/extracted, %s skipped, %s failed, %s -> %s bytes in %.3fs""",
+                summary['operation'], summary['files'],
+                summary['actions'].get( 'generated', 0 ) + summary['actions'].get( 'extracted', 0 ),
+                summary['actions'].get( 'skipped', 0 ), summary['actions'].get( 'failed', 0 ),
+                summary['bytesIn'], summary['bytesOut'], summary['wall'],
+            )
+        return summary
+    def add( self, record ):
+        """Record a FileStats"""
+        self.files.append( record )
+        if self.callback is not None:
+            self.callback( record )
+        return record
+
+    def summary( self ):
+        """Get a JSON-compatible dictionary aggregating our records"""
+        actions = {}
+        reasons = {}
+        result = {
+            'operation': self.operation,
+            'files': len(self.files),
+            'bytesIn': 0,
+            'bytesOut': 0,
+            'wall': self.wall,
+            'actions': actions,
+            'reasons': reasons,
+            # resources, modules and bytes saved by Package.dedupe
+            'shared': self.shared,
+        }
+        for phase in PHASES:
+            result[phase] = 0.0
+        for record in self.files:
+            actions[record.action] = actions.get( record.action, 0 ) + 1
+            reason = record.reason if record.action != 'failed' else 'error'
+            reasons[str(reason)] = reasons.get( str(reason), 0 ) + 1
+            result['bytesIn'] += record.bytesIn
+            if record.action in ('generated','extracted'):
+                result['bytesOut'] += record.bytesOut
+            for phase in PHASES:
+                result[phase] += getattr( record, phase )
+        written = [
+            record for record in self.files
+            if record.action in ('generated','extracted')
+        ]
+        bytesIn = sum([record.bytesIn for record in written])
+        result['ratio'] = bytesIn and float( result['bytesOut'] ) / bytesIn or None
+        return result
+    def asDict( self ):
+        """Get a JSON-compatible dictionary of our records and summary"""
+        return {
+            'summary': self.summary(),
+            'files': [record.asDict() for record in self.files],
+        }
+
+def format_table( stats ):
+    """Format the records and summary of stats as a plain-text table"""
+    lines = [
+        '%-24s %-9s %-10s %10s %10s %6s %8s %8s %8s %8s  %s'%(
+            'source','action','reason','in','out','ratio',
+            'check', 'read', 'encode', 'write', 'generator',
+        ),
+    ]
+    def line( name, action, reason, bytesIn, bytesOut, ratio, record, generator ):
+        return '%-24s %-9s %-10s %10d %10d %6s %8.2f %8.2f %8.2f %8.2f  %s'%(
+            name[:24], action, reason[:10], bytesIn, bytesOut,
+            ratio is not None and '%.3f'%( ratio, ) or '',
+            record['check']*1000, record['read']*1000,
+            record['encode']*1000, record['write']*1000,
+            generator or '',
+        )
+    for record in stats.files:
+        lines.append( line(
+            record.source or record.module, record.action, str(record.reason),
+            record.bytesIn, record.bytesOut, record.ratio,
+            record.asDict(), record.generator,
+        ))
+    summary = stats.summary()
+    lines.append( line(
+        'total (%s)'%( summary['operation'], ), '%s files'%( summary['files'], ),
+        '', summary['bytesIn'], summary['bytesOut'], summary['ratio'],
+        summary, '%.3fs wall'%( summary['wall'], ),
+    ))
+    if summary['shared']:
+        lines.append( '%(resources)s resources share %(modules)s modules, saving %(saved)s bytes'%summary['shared'] )
+    lines.append( 'times in ms' )
+    return '\n'.join( lines )
+
+def format_json( stats ):
+    """Format the records and summary of stats as JSON"""
+    return json.dumps( stats.asDict(), indent=1, sort_keys=True )
+
+# name: formatting function, for the --stats options of the scripts
+FORMATS = {
+    'table': format_table,
+    'json': format_json,
+}
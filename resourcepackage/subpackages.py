@@ -0,0 +1,119 @@
+"""Generated subpackages for recursively-scanned packages
+
+A recursive Package treats each directory below it holding
+resources as a subpackage, writing the subpackage's
+__init__.py for it.  Directory names which aren't Python
+identifiers (e.g. icons/16) are mapped to identifiers by
+directory_to_name (icons._16), and the parent package imports
+these through its _rp_subpackages module, which loads the
+subpackage from the real directory:
+
+    from mypackage.resources.icons._16 import open_png
+
+The top-level package's __init__.py imports its own
+_rp_subpackages module with:
+
+    from . import _rp_subpackages
+"""
+import os
+from resourcepackage import atomic, names, reproducible
+
+SUBPACKAGES_MODULE = '_rp_subpackages'
+# first line of the __init__.py files we generate, those
+# without it belong to the user and are left alone
+MARKER = '# generated by resourcepackage, changes will be overwritten\n'
+
+INIT = MARKER + '''"""Resource subpackage %(packagen)s (from directory %(source)s)"""
+# written by resourcepackage: %(resourcepackagev)r
+'''
+IMPORT = '''from . import %s
+'''%( SUBPACKAGES_MODULE, )
+
+ALIASES = MARKER + '''"""Subpackages of %(packagen)s from non-identifier directory names"""
+# written by resourcepackage: %(resourcepackagev)r
+import os, sys
+from importlib import util
+directories = %(directories)r
+def load( name ):
+    """Import (if necessary) and return the named subpackage"""
+    fullName = __package__ + '.' + name
+    module = sys.modules.get( fullName )
+    if module is None:
+        path = os.path.join( os.path.dirname( __file__ ), directories[name] )
+        spec = util.spec_from_file_location(
+            fullName, os.path.join( path, '__init__.py' ),
+            submodule_search_locations = [path],
+        )
+        module = util.module_from_spec( spec )
+        sys.modules[fullName] = module
+        try:
+            spec.loader.exec_module( module )
+        except BaseException:
+            del sys.modules[fullName]
+            raise
+    setattr( sys.modules[__package__], name, module )
+    return module
+for _name in sorted( directories ):
+    load( _name )
+'''
+
+def directory_to_name( name ):
+    """Get the Python package name for the directory name"""
+    return names.to_identifier( name )
+
+def is_generated( filename ):
+    """Determine whether filename was written by us (or doesn't exist)"""
+    try:
+        with open( filename, 'r' ) as fh:
+            return fh.readline() == MARKER
+    except (IOError, OSError):
+        return not os.path.exists( filename )
+
+def write_text( filename, text, fsync=0 ):
+    """Write text to filename unless it already holds exactly text
+
+    The existing content is compared first, so an unchanged
+    file costs a read rather than a temporary file and rename.
+
+    returns boolean indicating whether filename was written
+    """
+    try:
+        with open( filename, 'r', encoding='utf-8' ) as fh:
+            if fh.read() == text:
+                return 0
+    except (IOError, OSError, ValueError):
+        pass
+    return atomic.write_file( filename, text.encode( 'utf-8' ), fsync )
+
+def write_init( directory, packageName, source, aliases, fsync=0, deterministic=0 ):
+    """Write the __init__.py of a generated subpackage
+
+    directory -- full path of the subpackage's directory
+    packageName -- full dotted name of the subpackage
+    source -- the directory's path relative to the top package
+    aliases -- {name: directory name} of subpackages with
+        non-identifier directory names, see write_aliases
+    deterministic -- whether to omit the resourcepackage
+        release from the module, see the reproducible module
+
+    returns boolean indicating whether a file was written
+    """
+    packagen = packageName
+    resourcepackagev = reproducible.get_version( deterministic )
+    text = INIT % locals()
+    if aliases:
+        text += IMPORT
+    return write_text( os.path.join( directory, '__init__.py' ), text, fsync )
+
+def write_aliases( directory, packageName, aliases, fsync=0, deterministic=0 ):
+    """Write the _rp_subpackages module importing aliased subpackages
+
+    returns boolean indicating whether a file was written
+    """
+    packagen = packageName
+    resourcepackagev = reproducible.get_version( deterministic )
+    directories = aliases
+    return write_text(
+        os.path.join( directory, SUBPACKAGES_MODULE + '.py' ),
+        ALIASES % locals(), fsync,
+    )
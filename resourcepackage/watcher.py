@@ -0,0 +1,322 @@
+"""Rescanning a design-time package as its resources change
+
+A long-running application can have its resource package kept
+up to date without restarting (and without re-scanning the
+whole package on each check):
+
+    import threading
+    from resourcepackage import watcher
+    stop = threading.Event()
+    threading.Thread(
+        target = package.watch,
+        kwargs = dict( callback=watcher.reload_modules, stop=stop ),
+        daemon = True,
+    ).start()
+
+On Linux the package directory (and, if recursive, its
+subdirectories) are watched with inotify, elsewhere (or if
+inotify is unavailable) the size and modification time of the
+resources are polled.  Changes are debounced, so an editor's
+series of writes produces a single update, and only the
+changed resources are passed to Package.scanFile.  Removed
+resources and new or removed directories need a full
+Package.scan, as do bundled and deduplicated packages.
+
+The callback is called with the full names of the regenerated
+modules, reload_modules reloads those already imported.
+"""
+import os, sys, time, select, struct, importlib
+try:
+    import ctypes, ctypes.util
+except ImportError:
+    ctypes = None
+try:
+    import logging
+    log = logging.getLogger( "resourcepackage.watcher" )
+except ImportError:
+    log = None
+
+# inotify constants, from <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+# struct inotify_event, followed by len bytes of name
+EVENT = struct.Struct( 'iIII' )
+
+def load_inotify( ):
+    """Get the C library if it provides inotify, otherwise None"""
+    if ctypes is None or not sys.platform.startswith( 'linux' ):
+        return None
+    try:
+        libc = ctypes.CDLL( ctypes.util.find_library( 'c' ) or 'libc.so.6', use_errno=True )
+    except OSError:
+        return None
+    if not hasattr( libc, 'inotify_init1' ):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+class PollingWatcher:
+    """Detects changed resources by comparing (size, mtime) snapshots
+
+    Each wait() lists the package with Package.walk, whose
+    os.scandir entries make this a stat per resource.
+    """
+    def __init__( self, package ):
+        self.package = package
+        self.snapshot = self.getSnapshot()
+    def __repr__( self ):
+        return """%s (%s)"""%( self.__class__.__name__, self.package.packageName)
+    def getSnapshot( self ):
+        """Get {relative path: (size, mtime)} of resources and directories"""
+        snapshot = {}
+        files, directories = self.package.walk()
+        for file, entry in files:
+            base, ext = self.package.sourceToName( file )
+            if self.package.isResource( file, ext, isFile=1 ):
+                info = entry.stat()
+                snapshot[file] = info.st_size, info.st_mtime_ns
+        for directory in directories:
+            snapshot[directory] = None
+        return snapshot
+    def wait( self, timeout ):
+        """Wait timeout seconds, returning the set of changed relative paths"""
+        time.sleep( timeout )
+        snapshot = self.getSnapshot()
+        changed = set([
+            path for path in set( snapshot ) | set( self.snapshot )
+            if snapshot.get( path, 0 ) != self.snapshot.get( path, 0 )
+        ])
+        self.snapshot = snapshot
+        return changed
+    def close( self ):
+        """Release our resources (none for polling)"""
+
+class InotifyWatcher:
+    """Detects changed files with Linux inotify
+
+    libc -- the C library, see load_inotify
+
+    Every directory the package would scan is watched,
+    watches are added for new directories as they appear.
+    """
+    def __init__( self, package, libc ):
+        self.package = package
+        self.libc = libc
+        self.watches = {}
+        self.fd = libc.inotify_init1( IN_NONBLOCK | IN_CLOEXEC )
+        if self.fd < 0:
+            raise OSError( ctypes.get_errno(), """inotify_init1 failed""" )
+        try:
+            self.addWatches()
+        except Exception:
+            self.close()
+            raise
+    def __repr__( self ):
+        return """%s (%s)"""%( self.__class__.__name__, self.package.packageName)
+    def addWatches( self ):
+        """Watch any of the package's directories not yet watched"""
+        directories = ['']
+        if self.package.recursive:
+            directories.extend( self.package.walk()[1] )
+        watched = set( self.watches.values() )
+        for directory in directories:
+            if directory in watched:
+                continue
+            path = os.path.join( self.package.directory, directory )
+            wd = self.libc.inotify_add_watch( self.fd, os.fsencode( path ), WATCH_MASK )
+            if wd < 0:
+                error = ctypes.get_errno()
+                if not directory:
+                    raise OSError( error, """Unable to watch %s"""%( path, ))
+                # e.g. removed since it was listed
+                if log:
+                    log.info( """Unable to watch %s: %s""", path, os.strerror( error ))
+                continue
+            self.watches[wd] = directory
+    def wait( self, timeout ):
+        """Wait up to timeout seconds for events, returning the set of changed relative paths
+
+        A queue overflow is reported as a change of the package
+        directory itself ('').
+        """
+        readable = select.select( [self.fd], [], [], timeout )[0]
+        if not readable:
+            return set()
+        changed = set()
+        directories = 0
+        while True:
+            try:
+                buffer = os.read( self.fd, 65536 )
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len( buffer ):
+                wd, mask, cookie, length = EVENT.unpack_from( buffer, offset )
+                name = buffer[offset+EVENT.size:offset+EVENT.size+length].rstrip( b'\0' )
+                offset += EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    changed.add( '' )
+                    continue
+                if mask & IN_IGNORED:
+                    self.watches.pop( wd, None )
+                    continue
+                directory = self.watches.get( wd )
+                if directory is None or not name:
+                    continue
+                name = os.fsdecode( name )
+                changed.add( directory and directory + '/' + name or name )
+                if mask & IN_ISDIR:
+                    directories = 1
+        if directories and self.package.recursive:
+            self.addWatches()
+        return changed
+    def close( self ):
+        """Stop watching, closing the inotify descriptor"""
+        if self.fd is not None and self.fd >= 0:
+            os.close( self.fd )
+        self.fd = None
+
+def get_watcher( package, polling=0 ):
+    """Get an InotifyWatcher for package, or a PollingWatcher if unavailable"""
+    if not polling:
+        libc = load_inotify()
+        if libc is not None:
+            try:
+                return InotifyWatcher( package, libc )
+            except OSError as err:
+                if log:
+                    log.warning( """inotify unavailable, polling instead: %s""", err )
+    return PollingWatcher( package )
+
+class Watcher:
+    """Keeps a Package's modules up to date as its resources change
+
+    package -- the Package to watch
+    callback -- optional callable, called with the list of full
+        module names regenerated by each update
+    debounce -- seconds without further changes before an
+        update is made
+    interval -- seconds between polls (or, with inotify, between
+        checks of the stop event)
+    polling -- if true, poll even where inotify is available
+    """
+    def __init__( self, package, callback=None, debounce=0.2, interval=1.0, polling=0 ):
+        self.package = package
+        self.callback = callback
+        self.debounce = debounce
+        self.interval = interval
+        self.polling = polling
+    def __repr__( self ):
+        return """%s (%s)"""%( self.__class__.__name__, self.package.packageName)
+
+    def run( self, stop=None, initial=1 ):
+        """Watch until stop (a threading.Event) is set, or forever
+
+        initial -- if true, scan the whole package once changes
+            are being watched, so changes made before watching
+            started are picked up too
+        """
+        watching = get_watcher( self.package, self.polling )
+        if log:
+            log.info( """watching %s with %s""", self.package, watching.__class__.__name__ )
+        try:
+            if initial:
+                self.update( set( [''] ))
+            while stop is None or not stop.is_set():
+                changed = watching.wait( self.interval )
+                if not changed:
+                    continue
+                while True:
+                    more = watching.wait( self.debounce )
+                    if not more:
+                        break
+                    changed.update( more )
+                self.update( changed )
+        finally:
+            watching.close()
+    def update( self, changed ):
+        """Regenerate the modules for the changed relative paths
+
+        Errors are logged rather than raised, so the watch
+        continues once the resource is fixed.
+
+        returns the list of full names of the regenerated modules
+        """
+        files, rescan = self.classify( changed )
+        if not files and not rescan:
+            return []
+        package = self.package
+        updated = []
+        try:
+            if rescan or package.bundle or package.dedupe:
+                results = package.scan()
+                updated = sorted([file for file, result in results.items() if result])
+            else:
+                for file in files:
+                    try:
+                        if package.scanFile( file ):
+                            updated.append( file )
+                    except Exception:
+                        if log:
+                            log.exception( """Unable to update %s""", file )
+        except Exception:
+            if log:
+                log.exception( """Unable to scan %s""", package )
+        if package.bundle:
+            from resourcepackage import bundle
+            modules = updated and [package.packageName + '.' + bundle.BUNDLE_MODULE] or []
+        else:
+            modules = [
+                package.getModuleName( package.sourceToName( file )[0] )
+                for file in updated
+            ]
+        if modules and self.callback is not None:
+            self.callback( modules )
+        return modules
+    def classify( self, changed ):
+        """Split changed paths into (resources to scanFile, whether to scan)"""
+        package = self.package
+        files = []
+        rescan = 0
+        for path in sorted( changed ):
+            fullName = os.path.join( package.directory, path )
+            if os.path.isdir( fullName ):
+                if not path or (package.recursive and package.isResourceDirectory( path )):
+                    rescan = 1
+                continue
+            base, ext = package.sourceToName( path )
+            if not package.isResource( path, ext, isFile=1 ):
+                continue
+            if os.path.isfile( fullName ):
+                files.append( path )
+            elif not os.path.exists( fullName ):
+                # removed (or a removed directory), the manifest
+                # (and subpackages) need updating
+                rescan = 1
+        return files, rescan
+
+def reload_modules( names ):
+    """Reload those of the named modules already imported
+
+    Suitable as a Watcher callback.
+
+    returns the list of reloaded modules
+    """
+    reloaded = []
+    for name in names:
+        module = sys.modules.get( name )
+        if module is not None:
+            if log:
+                log.info( """reloading %s""", name )
+            reloaded.append( importlib.reload( module ))
+    return reloaded
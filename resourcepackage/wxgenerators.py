@@ -14,13 +14,13 @@ HEADER = '''
 ### wxPython specific functions
 originalExtension = %(extension)r
 from wxPython.wx import wxImageFromStream, wxBitmapFromImage, wxEmptyIcon
-import cStringIO
+import io
 def getData( ):
     """Return the data from the resource as a simple string"""
     return data
 def getImage( ):
     """Return the data from the resource as a wxImage"""
-    stream = cStringIO.StringIO(data)
+    stream = io.BytesIO(data)
     return wxImageFromStream(stream)
 def getBitmap( ):
     """Return the data from the resource as a wxBitmap"""
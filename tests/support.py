@@ -0,0 +1,66 @@
+"""Shared fixture for tests working on a temporary resource package"""
+import os, sys, shutil, tempfile, importlib, unittest
+from resourcepackage import package
+
+class PackageTestCase( unittest.TestCase ):
+    """Base for tests needing a resource package on disk
+
+    Each test gets the empty package packageName (holding only
+    an empty __init__.py) in a temporary directory on sys.path,
+    which is removed, along with any of the package's modules
+    the test imported, afterwards.
+    """
+    packageName = 'rptest'
+    def setUp( self ):
+        self.root = tempfile.mkdtemp()
+        self.directory = os.path.join( self.root, self.packageName )
+        os.mkdir( self.directory )
+        self.writeFile( '__init__.py', b'' )
+        sys.path.insert( 0, self.root )
+        importlib.invalidate_caches()
+    def tearDown( self ):
+        sys.path.remove( self.root )
+        self.forgetModules()
+        shutil.rmtree( self.root )
+
+    def getPackage( self, **named ):
+        """Get a package.Package for our directory, named sets its attributes"""
+        resources = package.Package( self.packageName, directory=self.directory )
+        for key, value in named.items():
+            setattr( resources, key, value )
+        return resources
+    def path( self, name ):
+        """Get the full path of the (relative) file name in our package"""
+        return os.path.join( self.directory, *name.split( '/' ))
+    def writeFile( self, name, data ):
+        """Write data (bytes) to the (relative) file name, returns its full path"""
+        fullName = self.path( name )
+        if not os.path.isdir( os.path.dirname( fullName )):
+            os.makedirs( os.path.dirname( fullName ))
+        with open( fullName, 'wb' ) as fh:
+            fh.write( data )
+        return fullName
+    def readFile( self, name ):
+        """Read the bytes of the (relative) file name"""
+        with open( self.path( name ), 'rb' ) as fh:
+            return fh.read()
+    def listFiles( self, prefix='' ):
+        """List the names of the files in our directory starting with prefix"""
+        return sorted([
+            name for name in os.listdir( self.directory )
+            if name.startswith( prefix ) and os.path.isfile( self.path( name ))
+        ])
+    def getImported( self ):
+        """List the names of our package's modules in sys.modules"""
+        return sorted([
+            name for name in sys.modules
+            if name == self.packageName or name.startswith( self.packageName + '.' )
+        ])
+    def forgetModules( self ):
+        """Remove our package's modules from sys.modules, so they're imported afresh"""
+        for name in self.getImported():
+            del sys.modules[name]
+        importlib.invalidate_caches()
+    def importResource( self, name ):
+        """Import and return our package's module name"""
+        return importlib.import_module( self.packageName + '.' + name )
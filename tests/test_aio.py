@@ -0,0 +1,113 @@
+"""Tests of the asyncio helpers, see resourcepackage.aio"""
+import os, asyncio, threading, unittest
+from concurrent import futures
+import support
+from resourcepackage import aio, defaultgenerators
+
+class CountingExecutor( futures.ThreadPoolExecutor ):
+    """Thread pool recording the functions submitted to it"""
+    def __init__( self ):
+        futures.ThreadPoolExecutor.__init__( self, max_workers=4 )
+        self.submitted = []
+    def submit( self, function, *arguments, **named ):
+        self.submitted.append( getattr( function, '__name__', function ))
+        return futures.ThreadPoolExecutor.submit( self, function, *arguments, **named )
+
+class AioTests( support.PackageTestCase ):
+    packageName = 'rpaiotest'
+    def setUp( self ):
+        super().setUp()
+        self.data = os.urandom( 200000 )
+        self.writeFile( 'small.txt', b'small' )
+        self.writeFile( 'big.dat', self.data )
+        self.writeFile( 'copy.dat', self.data )
+        self.executor = CountingExecutor()
+        self.addCleanup( self.executor.shutdown )
+    def scan( self, compressed=1, **named ):
+        """Scan our package with (compressing) single-literal generators"""
+        if compressed:
+            generator = defaultgenerators.CompressedGenerator( encoding='bytes' )
+        else:
+            generator = defaultgenerators.SimpleGenerator( encoding='bytes' )
+        self.getPackage( generators={'': generator}, **named ).scan()
+    def runLoop( self, coroutine ):
+        """Run coroutine to completion in a new event loop"""
+        return asyncio.run( coroutine )
+    def collect( self, name, chunkSize=aio.CHUNK_SIZE ):
+        """Get the list of chunks iter_data yields for our resource name"""
+        async def collect():
+            return [
+                chunk async for chunk in aio.iter_data(
+                    self.packageName + '.' + name, chunkSize, self.executor,
+                )
+            ]
+        return self.runLoop( collect() )
+
+    def test_get_data( self ):
+        """Concurrent loads of a resource share one executor job"""
+        self.scan()
+        name = self.packageName + '.big_dat'
+        async def load():
+            return await asyncio.gather(*[
+                aio.get_data( name, self.executor ) for index in range( 5 )
+            ])
+        results = self.runLoop( load() )
+        self.assertEqual( results, [self.data]*5 )
+        self.assertEqual( self.executor.submitted, ['load_data'] )
+        # loaded, so no further jobs
+        self.assertEqual( self.runLoop( aio.get_data( name, self.executor )), self.data )
+        self.assertEqual( self.executor.submitted, ['load_data'] )
+    def test_iter_streamed( self ):
+        """Compressed resources are streamed as bytes, without loading the data"""
+        self.scan()
+        chunks = self.collect( 'big_dat', 50000 )
+        self.assertEqual( set( map( type, chunks )), set( [bytes] ))
+        self.assertEqual( b''.join( chunks ), self.data )
+        self.assertTrue( max( map( len, chunks )) <= 50000 )
+        self.assertNotIn( 'data', vars( self.importResource( 'big_dat' )))
+        self.assertEqual( self.executor.submitted[0], 'open_chunks' )
+    def test_iter_loaded( self ):
+        """Loaded and plain resources are sliced, as bytes"""
+        self.scan( compressed=0 )
+        chunks = self.collect( 'big_dat', 50000 )
+        self.assertEqual( set( map( type, chunks )), set( [bytes] ))
+        self.assertEqual( b''.join( chunks ), self.data )
+        self.assertEqual( self.collect( 'small_txt' ), [b'small'] )
+    def test_iter_sharded( self ):
+        """Sharded resources are streamed as bytes"""
+        self.scan( shardSize=64*1024 )
+        chunks = self.collect( 'big_dat', 50000 )
+        self.assertEqual( set( map( type, chunks )), set( [bytes] ))
+        self.assertEqual( b''.join( chunks ), self.data )
+    def test_iter_alias( self ):
+        """Dedupe aliases' shared modules are imported in the executor"""
+        self.scan( dedupe=1 )
+        loop = []
+        imported = []
+        original = aio.import_resource
+        def import_resource( name ):
+            imported.append( threading.current_thread() )
+            return original( name )
+        aio.import_resource = import_resource
+        try:
+            async def collect():
+                loop.append( threading.current_thread() )
+                return [chunk async for chunk in aio.iter_data(
+                    self.packageName + '.copy_dat', executor=self.executor,
+                )]
+            chunks = self.runLoop( collect() )
+        finally:
+            aio.import_resource = original
+        self.assertEqual( b''.join( chunks ), self.data )
+        self.assertEqual( set( map( type, chunks )), set( [bytes] ))
+        self.assertTrue( imported )
+        self.assertNotIn( loop[0], imported )
+    def test_missing( self ):
+        """Unknown resources raise ImportError"""
+        self.scan()
+        self.assertRaises(
+            ImportError, self.runLoop, aio.get_data( self.packageName + '.nothere', self.executor ),
+        )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+"""Tests of atomic file replacement, see resourcepackage.atomic"""
+import os, unittest
+import support
+from resourcepackage import atomic
+
+class AtomicTests( support.PackageTestCase ):
+    packageName = 'rpatomictest'
+
+    def test_write( self ):
+        """A new file is written, and left alone when rewritten unchanged"""
+        target = self.path( 'out.bin' )
+        self.assertEqual( atomic.write_file( target, b'content' ), 1 )
+        os.utime( target, (1, 1) )
+        self.assertEqual( atomic.write_file( target, b'content', fsync=1 ), 0 )
+        self.assertEqual( os.stat( target ).st_mtime, 1 )
+        self.assertEqual( atomic.write_file( target, b'changed' ), 1 )
+        self.assertEqual( self.readFile( 'out.bin' ), b'changed' )
+        self.assertEqual( self.listFiles( '.' ), [] )
+    def test_abort( self ):
+        """An exception while writing leaves the destination untouched"""
+        target = self.writeFile( 'out.bin', b'original' )
+        try:
+            with atomic.AtomicFile( target, 'wb' ) as fh:
+                fh.write( b'partial' )
+                raise RuntimeError( 'failed' )
+        except RuntimeError:
+            pass
+        self.assertEqual( self.readFile( 'out.bin' ), b'original' )
+        self.assertEqual( self.listFiles( '.' ), [] )
+    def test_keeps_mode( self ):
+        """A replaced file keeps its permissions"""
+        target = self.writeFile( 'out.bin', b'original' )
+        os.chmod( target, 0o640 )
+        atomic.write_file( target, b'changed' )
+        self.assertEqual( os.stat( target ).st_mode & 0o7777, 0o640 )
+    def test_new_mode( self ):
+        """A new file gets its directory's permissions without execute bits"""
+        os.chmod( self.directory, 0o750 )
+        target = self.path( 'out.bin' )
+        atomic.write_file( target, b'content' )
+        self.assertEqual( os.stat( target ).st_mode & 0o7777, 0o640 )
+    def test_temporary_ignored( self ):
+        """Left-over temporaries aren't taken for resources"""
+        self.writeFile( '.a.txt.x' + atomic.SUFFIX, b'partial' )
+        self.writeFile( 'a.txt', b'content' )
+        self.assertEqual( self.getPackage().scan(), {'a.txt': 1} )
+
+if __name__ == "__main__":
+    unittest.main()
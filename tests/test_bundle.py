@@ -0,0 +1,58 @@
+"""Tests of bundled packages, see resourcepackage.bundle"""
+import os, unittest
+import support
+from resourcepackage import bundle
+
+class BundleTests( support.PackageTestCase ):
+    packageName = 'rpbundletest'
+    def setUp( self ):
+        super().setUp()
+        self.writeFile( 'a.txt', b'first '*100 )
+        self.writeFile( 'b.txt', b'second' )
+        self.resources = self.getPackage( bundle=1 )
+    def fromImport( self, name ):
+        """from <our package> import name"""
+        return getattr( __import__( self.packageName, fromlist=[name] ), name )
+    def release( self ):
+        """Give the package the __init__.py of a released bundled package"""
+        self.writeFile( '__init__.py', b'from ._rp_bundle import __getattr__, __dir__\n' )
+
+    def test_single_archive( self ):
+        """Every resource is stored in the one bundle module and blob"""
+        self.assertEqual( self.resources.scan(), {'a.txt': 1, 'b.txt': 1} )
+        self.assertEqual( self.listFiles( '_rp_bundle' ), ['_rp_bundle.py', '_rp_bundle.rpblob'] )
+        self.assertFalse( os.path.exists( self.path( 'a_txt.py' )))
+        self.assertEqual( self.resources.scan(), {'a.txt': 0, 'b.txt': 0} )
+    def test_lazy_access( self ):
+        """Importing one resource creates only its module"""
+        self.resources.scan()
+        self.release()
+        module = self.fromImport( 'b_txt' )
+        self.assertEqual( module.data, b'second' )
+        self.assertEqual( module.source, 'b.txt' )
+        self.assertNotIn( self.packageName + '.a_txt', self.getImported() )
+        self.assertIn( 'a_txt', dir( __import__( self.packageName )))
+        self.assertEqual( self.fromImport( 'a_txt' ).data, b'first '*100 )
+    def test_missing( self ):
+        """Unknown resources raise AttributeError"""
+        self.resources.scan()
+        self.release()
+        package = self.importResource( '_rp_bundle' )
+        self.assertRaises( AttributeError, package.getModule, 'c_txt' )
+        self.assertRaises( AttributeError, self.fromImport, 'c_txt' )
+    def test_dedupe( self ):
+        """With dedupe, identical payloads are stored once"""
+        self.writeFile( 'c.txt', b'first '*100 )
+        self.resources.dedupe = 1
+        self.resources.scan()
+        index = self.importResource( bundle.BUNDLE_MODULE ).index
+        self.assertEqual( index['a_txt'][1:], index['c_txt'][1:] )
+    def test_extract( self ):
+        """Extracting a bundle writes back each resource"""
+        self.resources.scan()
+        os.remove( self.path( 'a.txt' ))
+        self.assertEqual( self.resources.extract(), {'a.txt': 1, 'b.txt': 0} )
+        self.assertEqual( self.readFile( 'a.txt' ), b'first '*100 )
+
+if __name__ == "__main__":
+    unittest.main()
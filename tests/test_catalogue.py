@@ -0,0 +1,54 @@
+"""Tests of the generated resource catalogue, see resourcepackage.catalogue"""
+import unittest
+import support
+from resourcepackage import catalogue, watcher
+
+class CatalogueTests( support.PackageTestCase ):
+    packageName = 'rpcataloguetest'
+    def setUp( self ):
+        super().setUp()
+        self.writeFile( 'a.txt', b'first' )
+        self.resources = self.getPackage()
+        self.resources.scan()
+    def getCatalogue( self ):
+        """Import our (fresh) catalogue module"""
+        self.forgetModules()
+        return self.importResource( catalogue.CATALOGUE_MODULE )
+
+    def test_catalogue( self ):
+        """The catalogue describes the resources without importing them"""
+        module = self.getCatalogue()
+        self.assertEqual( module.names(), ['a_txt'] )
+        info = module.info( 'a_txt' )
+        self.assertEqual( (info['source'], info['size']), ('a.txt', 5) )
+        self.assertEqual( info['hash'], self.resources.hashFile( self.path( 'a.txt' )))
+        self.assertEqual( self.getImported(), [self.packageName, self.packageName + '.' + catalogue.CATALOGUE_MODULE] )
+        self.assertEqual( module.open( 'a_txt' ).read(), b'first' )
+    def test_scan_file( self ):
+        """Resources added or changed with scanFile are catalogued"""
+        self.writeFile( 'b.txt', b'second' )
+        self.resources.scanFile( 'b.txt' )
+        self.assertEqual( self.getCatalogue().names(), ['a_txt', 'b_txt'] )
+        self.writeFile( 'b.txt', b'second edit' )
+        self.resources.scanFile( 'b.txt' )
+        self.assertEqual( self.getCatalogue().info( 'b_txt' )['size'], 11 )
+        self.assertEqual( self.resources.scan(), {'a.txt': 0, 'b.txt': 0} )
+        self.assertEqual( self.getCatalogue().names(), ['a_txt', 'b_txt'] )
+    def test_watch( self ):
+        """Resources added while watching are catalogued"""
+        self.writeFile( 'b.txt', b'second' )
+        updated = watcher.Watcher( self.resources ).update( set( ['b.txt'] ))
+        self.assertEqual( updated, [self.packageName + '.b_txt'] )
+        self.assertEqual( self.getCatalogue().names(), ['a_txt', 'b_txt'] )
+    def test_stale( self ):
+        """A scan rewrites a catalogue which doesn't match the resources"""
+        self.resources.useCatalogue = 0
+        self.writeFile( 'b.txt', b'second' )
+        self.resources.scanFile( 'b.txt' )
+        self.assertEqual( self.getCatalogue().names(), ['a_txt'] )
+        self.resources.useCatalogue = 1
+        self.assertEqual( self.resources.scan(), {'a.txt': 0, 'b.txt': 0} )
+        self.assertEqual( self.getCatalogue().names(), ['a_txt', 'b_txt'] )
+
+if __name__ == "__main__":
+    unittest.main()
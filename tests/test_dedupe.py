@@ -0,0 +1,22 @@
+"""Tests of resources sharing modules, see resourcepackage.dedupe"""
+import os, unittest
+import support
+
+class DedupeExtractTests( support.PackageTestCase ):
+    packageName = 'rpdedupetest'
+    def setUp( self ):
+        super().setUp()
+        for name in ('first.txt', 'second.txt'):
+            self.writeFile( name, b'shared content '*100 )
+        self.package = self.getPackage( dedupe=1 )
+        self.package.scan()
+
+    def test_extract_alias_isolated( self ):
+        """Extracting an alias doesn't import its shared module"""
+        os.remove( self.path( 'first.txt' ))
+        self.assertEqual( self.package.extractFile( 'first_txt.py' ), 1 )
+        self.assertEqual( self.readFile( 'first.txt' ), b'shared content '*100 )
+        self.assertEqual( self.getImported(), [] )
+
+if __name__ == "__main__":
+    unittest.main()
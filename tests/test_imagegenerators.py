@@ -0,0 +1,68 @@
+"""Tests of the Pillow image generator, see resourcepackage.imagegenerators"""
+import io, os, unittest
+import support
+from resourcepackage import defaultgenerators
+try:
+    from PIL import Image
+    from resourcepackage import imagegenerators
+except ImportError:
+    imagegenerators = None
+
+@unittest.skipIf( imagegenerators is None, 'Pillow is not installed' )
+class ImageGeneratorTests( support.PackageTestCase ):
+    packageName = 'rpimagetest'
+    def setUp( self ):
+        super().setUp()
+        self.writeImage( 'red.bmp', 'red' )
+        self.resources = self.getPackage( generators=dict(
+            defaultgenerators.generators, **imagegenerators.generators
+        ))
+    def writeImage( self, name, colour ):
+        """Write a small BMP image of colour to (relative) name"""
+        stream = io.BytesIO()
+        Image.new( 'RGB', (8, 8), colour ).save( stream, 'BMP' )
+        return self.writeFile( name, stream.getvalue() )
+    def getCache( self, directory='' ):
+        """List the files in the (relative) directory's conversion cache"""
+        try:
+            return sorted( os.listdir( self.path( directory + imagegenerators.CACHE_DIRECTORY )))
+        except OSError:
+            return []
+
+    def test_convert( self ):
+        """Images are converted to PNG, and the conversion cached"""
+        self.resources.scan()
+        module = self.importResource( 'red_bmp' )
+        self.assertEqual( module.getData()[:8], b'\x89PNG\r\n\x1a\n' )
+        self.assertEqual( module.getImage().getpixel( (0, 0) ), (255, 0, 0) )
+        cache = self.getCache()
+        self.assertEqual( [imagegenerators.cached_source( name ) for name in cache], ['red.bmp'] )
+    def test_edit_evicts( self ):
+        """Caching an edited image's conversion removes the earlier one"""
+        self.resources.scan()
+        before = self.getCache()
+        self.writeImage( 'red.bmp', 'blue' )
+        self.resources.scan()
+        after = self.getCache()
+        self.assertEqual( len( after ), 1 )
+        self.assertNotEqual( before, after )
+    def test_prune( self ):
+        """Scans remove the conversions of images which are gone"""
+        self.writeImage( 'green.bmp', 'green' )
+        self.writeFile( imagegenerators.CACHE_DIRECTORY + '/stray.png', b'old' )
+        self.resources.scan()
+        self.assertEqual( len( self.getCache() ), 2 )
+        os.remove( self.path( 'green.bmp' ))
+        self.resources.scan()
+        self.assertEqual(
+            [imagegenerators.cached_source( name ) for name in self.getCache()], ['red.bmp'],
+        )
+    def test_clear( self ):
+        """clear_cache removes a directory's cache"""
+        self.resources.scan()
+        self.assertEqual( imagegenerators.clear_cache( self.directory ), 1 )
+        self.assertEqual( self.getCache(), [] )
+        self.assertEqual( imagegenerators.clear_cache( self.directory ), 0 )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+"""Tests of serving resources from source, see resourcepackage.importer"""
+import os, importlib, unittest
+import support
+from resourcepackage import defaultgenerators
+
+class ImporterTests( support.PackageTestCase ):
+    packageName = 'rpimportertest'
+    def install( self, **named ):
+        """Install our package's import hook, removed after the test"""
+        resources = self.getPackage( **named )
+        resources.install()
+        self.addCleanup( resources.uninstall )
+        return resources
+
+    def test_serve( self ):
+        """Resources are served without writing anything, edits seen on reload"""
+        self.writeFile( 'a.txt', b'first' )
+        self.install()
+        module = self.importResource( 'a_txt' )
+        self.assertEqual( module.data, b'first' )
+        self.assertEqual( self.listFiles( 'a_' ), [] )
+        self.writeFile( 'a.txt', b'second edit' )
+        self.assertEqual( importlib.reload( module ).data, b'second edit' )
+    def test_new_resource( self ):
+        """Resources added after installing are found"""
+        self.install()
+        self.assertRaises( ImportError, self.importResource, 'b_txt' )
+        self.writeFile( 'b.txt', b'added' )
+        self.assertEqual( self.importResource( 'b_txt' ).data, b'added' )
+    def test_recursive( self ):
+        """Recursive packages' subdirectories are served as subpackages"""
+        self.writeFile( 'icons/16/open.png', b'png data' )
+        self.install( recursive=1 )
+        self.assertEqual( self.importResource( 'icons._16.open_png' ).data, b'png data' )
+        self.assertEqual( os.listdir( self.path( 'icons/16' )), ['open.png'] )
+        self.writeFile( 'icons/16/close.png', b'more' )
+        self.assertEqual( self.importResource( 'icons._16.close_png' ).data, b'more' )
+    def test_stale_sidecar( self ):
+        """A mapped sidecar older than an edit to its resource isn't used"""
+        generators = {'': defaultgenerators.MAPPED}
+        self.writeFile( 'a.dat', b'scanned' )
+        self.getPackage( generators=generators ).scan()
+        self.forgetModules()
+        self.writeFile( 'a.dat', b'edited since' )
+        os.utime( self.path( 'a_dat.rpblob' ), (1, 1) )
+        self.install( generators=generators )
+        self.assertEqual( bytes( self.importResource( 'a_dat' ).data ), b'edited since' )
+    def test_current_sidecar( self ):
+        """A mapped sidecar matching its resource is mapped"""
+        generators = {'': defaultgenerators.MAPPED}
+        self.writeFile( 'a.dat', b'scanned' )
+        self.getPackage( generators=generators ).scan()
+        self.forgetModules()
+        # same size and newer, so taken to be the resource's
+        self.writeFile( 'a_dat.rpblob', b'SCANNED' )
+        self.install( generators=generators )
+        self.assertEqual( bytes( self.importResource( 'a_dat' ).data ), b'SCANNED' )
+
+if __name__ == "__main__":
+    unittest.main()
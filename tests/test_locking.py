@@ -0,0 +1,66 @@
+"""Tests of the cross-process scan lock, see resourcepackage.locking"""
+import os, sys, time, subprocess, unittest
+import support
+from resourcepackage import locking
+
+HOLD = '''import sys, time
+from resourcepackage import locking
+with locking.PackageLock( sys.argv[1] ):
+    print( 'locked', flush=True )
+    time.sleep( float( sys.argv[2] ))
+'''
+
+@unittest.skipIf( locking.fcntl is None, 'no fcntl, locking is skipped' )
+class LockingTests( support.PackageTestCase ):
+    packageName = 'rplocktest'
+    def setUp( self ):
+        super().setUp()
+        self.writeFile( 'a.txt', b'content' )
+        self.resources = self.getPackage()
+        self.lockName = self.path( self.resources.lockName )
+    def holdLock( self, seconds ):
+        """Start a process holding our package's lock for seconds, once it has it"""
+        environment = dict( os.environ )
+        environment['PYTHONPATH'] = os.pathsep.join( [p for p in sys.path if p] )
+        process = subprocess.Popen(
+            [sys.executable, '-c', HOLD, self.lockName, str( seconds )],
+            stdout=subprocess.PIPE, env=environment,
+        )
+        self.addCleanup( process.wait )
+        self.addCleanup( process.kill )
+        self.addCleanup( process.stdout.close )
+        self.assertEqual( process.stdout.readline().strip(), b'locked' )
+        return process
+
+    def test_exclusive( self ):
+        """A held lock can't be taken until released"""
+        first = locking.PackageLock( self.lockName )
+        first.acquire()
+        try:
+            second = locking.PackageLock( self.lockName, timeout=0.1 )
+            self.assertRaises( locking.LockTimeout, second.acquire )
+        finally:
+            first.release()
+        with locking.PackageLock( self.lockName, timeout=0.1 ) as second:
+            self.assertIsNotNone( second.handle )
+    def test_scan_waits( self ):
+        """A scan waits for another process holding the lock"""
+        self.holdLock( 0.5 )
+        started = time.time()
+        self.assertEqual( self.resources.scan(), {'a.txt': 1} )
+        self.assertGreater( time.time() - started, 0.2 )
+    def test_scan_timeout( self ):
+        """A scan which can't take the lock within lockTimeout fails, writing nothing"""
+        self.holdLock( 2 )
+        self.resources.lockTimeout = 0.1
+        self.assertRaises( locking.LockTimeout, self.resources.scan )
+        self.assertFalse( os.path.exists( self.path( 'a_txt.py' )))
+    def test_unlocked( self ):
+        """With useLock false, scans don't wait"""
+        self.holdLock( 2 )
+        self.resources.useLock = 0
+        self.resources.lockTimeout = 0.1
+        self.assertEqual( self.resources.scan(), {'a.txt': 1} )
+
+if __name__ == "__main__":
+    unittest.main()
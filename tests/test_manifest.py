@@ -0,0 +1,53 @@
+"""Tests of staleness decided by the manifest, see resourcepackage.manifest"""
+import os, unittest
+import support
+
+class ManifestTests( support.PackageTestCase ):
+    packageName = 'rpmanifesttest'
+    def setUp( self ):
+        super().setUp()
+        self.writeFile( 'a.txt', b'first' )
+        self.resources = self.getPackage()
+        self.resources.scan()
+    def preservingEdit( self ):
+        """Change a.txt's content keeping its size and mtime"""
+        info = os.stat( self.path( 'a.txt' ))
+        self.writeFile( 'a.txt', b'other' )
+        os.utime( self.path( 'a.txt' ), ns=(info.st_atime_ns, info.st_mtime_ns) )
+
+    def test_unchanged( self ):
+        """Resources unchanged since the last scan aren't regenerated"""
+        self.assertEqual( self.resources.scan(), {'a.txt': 0} )
+    def test_touched( self ):
+        """A resource whose mtime changed is rehashed, but not regenerated"""
+        os.utime( self.path( 'a.txt' ), (1, 1) )
+        self.assertEqual( self.resources.scan(), {'a.txt': 0} )
+    def test_edited( self ):
+        """A resource whose content changed is regenerated"""
+        self.writeFile( 'a.txt', b'second edit' )
+        self.assertEqual( self.resources.scan(), {'a.txt': 1} )
+        self.assertEqual( self.importResource( 'a_txt' ).data, b'second edit' )
+    def test_preserved_missed( self ):
+        """An edit preserving size and mtime isn't noticed by default"""
+        self.preservingEdit()
+        self.assertEqual( self.resources.scan(), {'a.txt': 0} )
+    def test_preserved_rehash( self ):
+        """With rehash set, an edit preserving size and mtime is noticed"""
+        self.preservingEdit()
+        self.resources.rehash = 1
+        self.assertEqual( self.resources.scan(), {'a.txt': 1} )
+        self.assertEqual( self.importResource( 'a_txt' ).data, b'other' )
+        self.resources.rehash = 0
+        self.assertEqual( self.resources.scan(), {'a.txt': 0} )
+    def test_preserved_force( self ):
+        """A forced scan records the new content's hash"""
+        self.preservingEdit()
+        self.resources.scan( force=1 )
+        self.assertEqual( self.importResource( 'a_txt' ).data, b'other' )
+        self.assertEqual(
+            self.resources.loadManifest().get( 'a.txt' )['hash'],
+            self.resources.hashFile( self.path( 'a.txt' )),
+        )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""Tests of resource module naming, see resourcepackage.names"""
+import os, unittest
+import support
+from resourcepackage import names
+
+class IdentifierTests( unittest.TestCase ):
+    def test_identifiers( self ):
+        """Non-identifiers are mapped, identifiers kept"""
+        self.assertEqual( names.to_identifier( '16-open_png' ), '_16_open_png' )
+        self.assertEqual( names.to_identifier( 'open_png' ), 'open_png' )
+        self.assertEqual( names.to_identifier( 'class' ), 'class_' )
+        self.assertEqual( names.to_identifier( 'caf\xe9_png' ), 'caf\xe9_png' )
+        self.assertEqual( names.to_identifier( '' ), '_' )
+
+class NameIndexTests( support.PackageTestCase ):
+    packageName = 'rpnamestest'
+
+    def test_mapped( self ):
+        """Resources with non-identifier names get importable modules"""
+        self.writeFile( '16-open.png', b'data' )
+        resources = self.getPackage()
+        resources.scan()
+        self.assertEqual( self.importResource( '_16_open_png' ).data, b'data' )
+        index = resources.getNameIndex()
+        self.assertEqual( index.getName( '16-open.png' ), ('_16_open_png', '.png') )
+        self.assertEqual( index.getSource( '_16_open_png' ), '16-open.png' )
+    def test_from_manifest( self ):
+        """A new Package restores the index from the manifest"""
+        self.writeFile( '16-open.png', b'data' )
+        self.getPackage().scan()
+        index = self.getPackage().getNameIndex()
+        self.assertEqual( index.getSource( '_16_open_png' ), '16-open.png' )
+    def test_collision( self ):
+        """Resources generating the same module are refused"""
+        self.writeFile( 'a.txt', b'first' )
+        self.writeFile( 'a txt', b'second' )
+        resources = self.getPackage()
+        self.assertRaises( ValueError, resources.scan )
+        self.assertEqual( len( resources.plan( estimate=0 ).collisions ), 1 )
+    def test_case_collision( self ):
+        """Names differing only in case are refused only where they'd clash"""
+        self.writeFile( 'a.txt', b'lower' )
+        upper = self.writeFile( 'A.txt', b'upper' )
+        resources = self.getPackage()
+        if names.is_case_insensitive( upper ):
+            self.assertRaises( ValueError, resources.scan )
+            return
+        with self.assertLogs( 'resourcepackage.names', 'WARNING' ):
+            resources.scan()
+        self.assertEqual( self.importResource( 'a_txt' ).data, b'lower' )
+        self.assertEqual( self.importResource( 'A_txt' ).data, b'upper' )
+
+if __name__ == "__main__":
+    unittest.main()
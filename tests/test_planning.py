@@ -0,0 +1,67 @@
+"""Tests of scan plans (dry runs), see resourcepackage.planning"""
+import io, os, json, shutil, contextlib, unittest
+import support
+from resourcepackage import scan, planning, package
+
+class PlanningTests( support.PackageTestCase ):
+    packageName = 'rpplantest'
+    def setUp( self ):
+        super().setUp()
+        self.writeFile( 'a.txt', b'first '*1000 )
+        self.writeFile( 'b.txt', b'second' )
+        self.writeFile( 'notes.py', b'' )
+        self.resources = self.getPackage()
+
+    def test_plan( self ):
+        """A plan lists the work without doing any"""
+        self.resources.scan()
+        self.writeFile( 'b.txt', b'second edit' )
+        self.writeFile( 'c.txt', b'third' )
+        plan = self.resources.plan()
+        actions = dict([(action['source'], action['reason']) for action in plan.getActions()])
+        self.assertEqual( actions, {'a.txt': 'up to date', 'b.txt': 'refresh', 'c.txt': 'new'} )
+        self.assertEqual( sorted( plan.estimates ), ['b.txt', 'c.txt'] )
+        self.assertEqual( self.listFiles( 'c_' ), [] )
+        self.assertEqual( self.resources.scan( plan=plan ), {'a.txt': 0, 'b.txt': 1, 'c.txt': 1} )
+        self.assertEqual( self.importResource( 'c_txt' ).data, b'third' )
+    def test_bookkeeping( self ):
+        """The package's manifest and lock aren't reported as ignored"""
+        self.writeFile( 'README', b'' )
+        self.resources.scan()
+        self.resources.ignoreFiles = self.resources.ignoreFiles + ['readme']
+        plan = self.resources.plan( estimate=0 )
+        self.assertEqual( plan.ignored, ['README'] )
+        self.assertEqual( json.loads( planning.format_json( plan ))['ignored'], ['README'] )
+    def test_stale_plan( self ):
+        """A plan overtaken by another scan is made again"""
+        plan = self.resources.plan()
+        self.assertEqual( len( plan.getJobs() ), 2 )
+        # e.g. another process
+        self.getPackage().scan()
+        with self.assertLogs( 'resourcepackage', 'INFO' ) as logs:
+            self.assertEqual( self.resources.scan( plan=plan ), {'a.txt': 0, 'b.txt': 0} )
+        self.assertTrue( [line for line in logs.output if 'planning again' in line] )
+    def test_edited_plan( self ):
+        """A plan whose resources changed since is made again"""
+        self.resources.scan()
+        plan = self.resources.plan()
+        self.writeFile( 'b.txt', b'second edit' )
+        self.assertEqual( self.resources.scan( plan=plan ), {'a.txt': 0, 'b.txt': 1} )
+        self.assertEqual( self.importResource( 'b_txt' ).data, b'second edit' )
+    def test_plan_design_time( self ):
+        """scan.py --plan doesn't let the design-time __init__.py scan first"""
+        template = os.path.join( os.path.dirname( package.__file__ ), 'scanning__init__.py' )
+        shutil.copy( template, self.path( '__init__.py' ))
+        output = io.StringIO()
+        with contextlib.redirect_stdout( output ):
+            scan.main( self.packageName, planFormat='json' )
+        summary = json.loads( output.getvalue() )['summary']
+        self.assertEqual( (summary['generate'], summary['skip']), (2, 0) )
+        self.assertEqual( self.listFiles( 'a_' ), [] )
+        # while importing the package normally scans it
+        self.forgetModules()
+        self.importResource( 'a_txt' )
+        self.assertEqual( self.listFiles( 'a_' ), ['a_txt.py'] )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+"""Tests of deterministic scans, see resourcepackage.reproducible"""
+import os, shutil, unittest
+import support
+from resourcepackage import reproducible, package
+
+class ReproducibleTests( support.PackageTestCase ):
+    packageName = 'rpreproducibletest'
+    def setUp( self ):
+        super().setUp()
+        self.writeFile( 'b.txt', b'second '*100 )
+        self.writeFile( 'a.txt', b'first' )
+        self.resources = self.getPackage( deterministic=1, bytecode='both' )
+        self.resources.scan()
+    def getGenerated( self, directory ):
+        """Get {name: (bytes, mtime)} of the generated files in directory"""
+        generated = {}
+        for root, directories, files in os.walk( directory ):
+            for name in files:
+                if name.endswith( '.txt' ) or name.startswith( '.resourcepackage' ) or name == '__init__.py':
+                    # resources and bookkeeping
+                    continue
+                fullName = os.path.join( root, name )
+                with open( fullName, 'rb' ) as fh:
+                    generated[os.path.relpath( fullName, directory )] = (
+                        fh.read(), int( os.stat( fullName ).st_mtime ),
+                    )
+        return generated
+
+    def test_identical( self ):
+        """The same resources give byte-identical files with fixed times"""
+        other = os.path.join( self.root, 'other', self.packageName )
+        os.makedirs( other )
+        for name in ('a.txt', 'b.txt', '__init__.py'):
+            shutil.copy( self.path( name ), os.path.join( other, name ))
+        os.utime( os.path.join( other, 'a.txt' ), (1234567890, 1234567890) )
+        resources = package.Package( self.packageName, directory=other )
+        resources.deterministic = 1
+        resources.bytecode = 'both'
+        resources.scan()
+        first, second = self.getGenerated( self.directory ), self.getGenerated( other )
+        self.assertEqual( first, second )
+        self.assertIn( 'a_txt.py', first )
+        self.assertTrue( [name for name in first if name.endswith( '.pyc' )] )
+        epoch = reproducible.get_epoch()
+        self.assertEqual( set([mtime for data, mtime in first.values()]), set( [epoch] ))
+        self.assertTrue( reproducible.is_reproducible( self.path( 'a_txt.py' )))
+    def test_hash_based( self ):
+        """Compiled modules are checked by hash"""
+        cached = [
+            os.path.join( self.directory, '__pycache__', name )
+            for name in os.listdir( self.path( '__pycache__' ))
+            if name.startswith( 'a_txt.' )
+        ]
+        self.assertEqual( len( cached ), 1 )
+        self.assertTrue( reproducible.is_hash_based( cached[0] ))
+        self.assertEqual( self.importResource( 'a_txt' ).data, b'first' )
+    def test_extract( self ):
+        """Extraction compares content, as the modules' times are the epoch"""
+        self.assertEqual( self.resources.extract(), {'a_txt.py': 0, 'b_txt.py': 0} )
+        self.writeFile( 'a.txt', b'edited' )
+        os.remove( self.path( self.resources.manifestName ))
+        self.assertEqual( self.resources.extract(), {'a_txt.py': 1, 'b_txt.py': 0} )
+        self.assertEqual( self.readFile( 'a.txt' ), b'first' )
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+"""Tests of resources split into shard modules, see resourcepackage.sharding"""
+import os, unittest
+import support
+from resourcepackage import defaultgenerators
+
+class ShardingTests( support.PackageTestCase ):
+    packageName = 'rpshardtest'
+    def setUp( self ):
+        super().setUp()
+        self.data = os.urandom( 4*1024*1024 )
+        self.writeFile( 'big.dat', self.data )
+
+    def test_import_sharded( self ):
+        """Several MB sharded with the default generators compile and import"""
+        self.getPackage( shardSize=1024*1024 ).scan()
+        self.assertEqual( len( self.listFiles( '_rp_shard_big_dat_' )), 4 )
+        module = self.importResource( 'big_dat' )
+        self.assertEqual( module.read( 1024*1024 - 10, 20 ), self.data[1024*1024-10:1024*1024+10] )
+        self.assertEqual( module.data, self.data )
+    def test_iter_data( self ):
+        """iter_data yields bytes, as compressed modules' iter_data does"""
+        generators = {'': defaultgenerators.CompressedGenerator()}
+        self.getPackage( shardSize=1024*1024, generators=generators ).scan()
+        chunks = list( self.importResource( 'big_dat' ).iter_data( 1000*1000 ))
+        self.assertEqual( set( map( type, chunks )), set( [bytes] ))
+        self.assertEqual( b''.join( chunks ), self.data )
+        self.assertTrue( max( map( len, chunks )) <= 1000*1000 )
+
+if __name__ == "__main__":
+    unittest.main()